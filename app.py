@@ -26,6 +26,8 @@ from osiris.apis import api
 from osiris.exceptions import OCError
 from osiris.exceptions import OCAuthenticationError
 
+from osiris.ingestion import start_ingestion
+
 from osiris.response import bad_request
 
 from thoth.common.openshift import OpenShift
@@ -42,6 +44,12 @@ app.logger.setLevel(
 api.init_app(app)
 
 
+@app.before_first_request
+def start_ingestion_workers():
+    """Start ingestion of build hooks, in each of the worker processes serving the API."""
+    start_ingestion()
+
+
 @app.before_first_request
 def check_configuration():
     """Check client configuration."""
@@ -1,6 +1,7 @@
 """Osiris: Build log aggregator."""
 
 import os
+import tempfile
 import urllib3
 
 from osiris import __about__
@@ -29,6 +30,92 @@ DEFAULT_LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 DEFAULT_OC_LOG_LEVEL = os.getenv('OC_LOG_LEVEL', 6)
 DEFAULT_OC_PROJECT = os.getenv('OC_PROJECT', None)
 
+# directory for durable local state (ingestion queue, collector checkpoints), has to be on a persistent volume
+DEFAULT_DATA_DIR = os.getenv('OSIRIS_DATA_DIR', None)
+# directory for local indexes rebuilt from the bucket by the reconciliation (build and log search)
+DEFAULT_INDEX_DIR = os.getenv('OSIRIS_INDEX_DIR', DEFAULT_DATA_DIR or os.path.join(tempfile.gettempdir(), 'osiris'))
+
+DEFAULT_RESULTS_PER_PAGE = int(os.getenv('OSIRIS_RESULTS_PER_PAGE', 20))
+DEFAULT_MAX_RESULTS_PER_PAGE = int(os.getenv('OSIRIS_MAX_RESULTS_PER_PAGE', 100))
+
+# concurrent retrieval of multiple documents
+DEFAULT_FETCH_WORKERS = int(os.getenv('OSIRIS_FETCH_WORKERS', 8))
+DEFAULT_FETCH_TIMEOUT = float(os.getenv('OSIRIS_FETCH_TIMEOUT', 10))
+
+# compression codec of stored build logs (identity, gzip or zstd, which requires the zstandard package)
+DEFAULT_LOG_CODEC = os.getenv('OSIRIS_LOG_CODEC', 'gzip')
+# size (in bytes) of independently compressed build log blocks
+DEFAULT_LOG_BLOCK_SIZE = int(os.getenv('OSIRIS_LOG_BLOCK_SIZE', 1024 * 1024))
+# number of lines between build log line index checkpoints
+DEFAULT_LOG_LINE_INTERVAL = int(os.getenv('OSIRIS_LOG_LINE_INTERVAL', 1000))
+# size (in bytes) of chunks build logs are streamed in
+DEFAULT_LOG_CHUNK_SIZE = int(os.getenv('OSIRIS_LOG_CHUNK_SIZE', 64 * 1024))
+# size (in bytes) of parts streamed uploads are stored in, at least 5 MiB
+DEFAULT_UPLOAD_PART_SIZE = max(int(os.getenv('OSIRIS_UPLOAD_PART_SIZE', 8 * 1024 * 1024)), 5 * 1024 * 1024)
+# age (in seconds) of unfinished build log upload sessions they are aborted after
+DEFAULT_UPLOAD_SESSION_TTL = int(os.getenv('OSIRIS_UPLOAD_SESSION_TTL', 24 * 3600))
+# time (in seconds) replaced build log objects are kept for, so that reads started before finish
+DEFAULT_LOG_VERSION_TTL = int(os.getenv('OSIRIS_LOG_VERSION_TTL', 3600))
+# interval (in seconds) the build log of a running build is made readable in
+DEFAULT_LOG_PUBLISH_INTERVAL = float(os.getenv('OSIRIS_LOG_PUBLISH_INTERVAL', 10))
+# follow build logs of running builds, at most OSIRIS_LOG_FOLLOWERS at once
+DEFAULT_FOLLOW_LOGS = os.getenv('OSIRIS_FOLLOW_LOGS', '0').lower() in ('1', 'true', 'yes')
+DEFAULT_LOG_FOLLOWERS = int(os.getenv('OSIRIS_LOG_FOLLOWERS', 16))
+# time (in seconds) build completion waits for the follower to store the build log
+DEFAULT_LOG_FOLLOWER_WAIT = float(os.getenv('OSIRIS_LOG_FOLLOWER_WAIT', 30))
+
+# asynchronous ingestion of build hooks, queued in OSIRIS_DATA_DIR (ingested within the request if disabled)
+DEFAULT_INGESTION_QUEUE = os.getenv('OSIRIS_INGESTION_QUEUE', '1' if DEFAULT_DATA_DIR else '0') in ('1', 'true', 'yes')
+DEFAULT_INGESTION_WORKERS = int(os.getenv('OSIRIS_INGESTION_WORKERS', 4))
+DEFAULT_INGESTION_MAX_ATTEMPTS = int(os.getenv('OSIRIS_INGESTION_MAX_ATTEMPTS', 5))
+DEFAULT_INGESTION_RETRY_DELAY = float(os.getenv('OSIRIS_INGESTION_RETRY_DELAY', 5))
+# time (in seconds) claimed jobs are leased for, the lease is renewed while the job is being processed
+DEFAULT_INGESTION_LEASE = float(os.getenv('OSIRIS_INGESTION_LEASE', 300))
+# time (in seconds) jobs failed by all of the attempts are kept in the queue for
+DEFAULT_INGESTION_FAILED_RETENTION = float(os.getenv('OSIRIS_INGESTION_FAILED_RETENTION', 7 * 24 * 3600))
+# drop redelivered build hooks matching the content of the last processed ones
+DEFAULT_DEDUP = os.getenv('OSIRIS_DEDUP', '1').lower() in ('1', 'true', 'yes')
+DEFAULT_DEDUP_MAX_FINGERPRINTS = int(os.getenv('OSIRIS_DEDUP_MAX_FINGERPRINTS', 100000))
+# size (in bytes) of the cache of build information documents and build logs, 0 disables it
+DEFAULT_CACHE_SIZE = int(os.getenv('OSIRIS_CACHE_SIZE', 64 * 1024 * 1024))
+# time (in seconds) builds which have not been stored yet are remembered as missing for
+DEFAULT_CACHE_NOT_FOUND_TTL = float(os.getenv('OSIRIS_CACHE_NOT_FOUND_TTL', 5))
+# time (in seconds) concurrent reads of the same object wait for the one in flight
+DEFAULT_SINGLE_FLIGHT_TIMEOUT = float(os.getenv('OSIRIS_SINGLE_FLIGHT_TIMEOUT', 10))
+# window (in seconds) updates of a build are merged within before written, 0 disables it
+DEFAULT_WRITE_BEHIND_WINDOW = float(os.getenv('OSIRIS_WRITE_BEHIND_WINDOW', 5))
+# maximum number of build events accepted by a single batch request
+DEFAULT_MAX_BATCH_SIZE = int(os.getenv('OSIRIS_MAX_BATCH_SIZE', 10000))
+
+# full-text index of build log lines, searched for at most OSIRIS_LOG_SEARCH_TIMEOUT seconds
+DEFAULT_LOG_SEARCH = os.getenv('OSIRIS_LOG_SEARCH', '1').lower() in ('1', 'true', 'yes')
+DEFAULT_LOG_SEARCH_TIMEOUT = float(os.getenv('OSIRIS_LOG_SEARCH_TIMEOUT', 2))
+
+# watch based build collector
+# comma separated namespaces to watch builds in, OC_PROJECT if not set
+DEFAULT_COLLECTOR_NAMESPACES = os.getenv('OSIRIS_COLLECTOR_NAMESPACES', None)
+# window (in seconds) build phase changes are collapsed in
+DEFAULT_COLLECTOR_DEBOUNCE = float(os.getenv('OSIRIS_COLLECTOR_DEBOUNCE', 10))
+DEFAULT_COLLECTOR_WATCH_TIMEOUT = int(os.getenv('OSIRIS_COLLECTOR_WATCH_TIMEOUT', 300))
+# public URL of the API, used to link build logs of collected builds
+DEFAULT_API_URL = os.getenv('OSIRIS_API_URL', None)
+
+# in-process Bloom filter of stored builds, enable only if there is a single writer
+DEFAULT_BLOOM_FILTER = os.getenv('OSIRIS_BLOOM_FILTER', '0').lower() in ('1', 'true', 'yes')
+DEFAULT_BLOOM_CAPACITY = int(os.getenv('OSIRIS_BLOOM_CAPACITY', 1000000))
+
+# layout of build information document keys: flat (<prefix><hash>) or date (<prefix>yyyy/mm/dd/<hash>)
+DEFAULT_KEY_LAYOUT = os.getenv('OSIRIS_KEY_LAYOUT', 'flat')
+# number of document partitions remembered by the date layout
+DEFAULT_KEY_LAYOUT_CACHE_SIZE = int(os.getenv('OSIRIS_KEY_LAYOUT_CACHE_SIZE', 100000))
+
+# number of characters of document ids index segments are keyed by (16^n segments)
+DEFAULT_INDEX_SEGMENT_KEY_LENGTH = int(os.getenv('OSIRIS_INDEX_SEGMENT_KEY_LENGTH', 3))
+# attempts of conditional writes of shared objects (index segments, manifest) before giving up
+DEFAULT_CONDITIONAL_WRITE_ATTEMPTS = int(os.getenv('OSIRIS_CONDITIONAL_WRITE_ATTEMPTS', 10))
+# interval (in seconds) of the build information index reconciliation, 0 disables it
+DEFAULT_RECONCILIATION_INTERVAL = int(os.getenv('OSIRIS_RECONCILIATION_INTERVAL', 3600))
+
 
 # OpenShift client
 
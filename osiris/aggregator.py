@@ -1,53 +1,251 @@
-
 """Build aggregator."""
 
+import bisect
 import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 
 from boto3.resources.factory import ServiceResource
+from botocore.exceptions import ClientError
 from botocore.paginate import Paginator
 
-from typing import Tuple, Union
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Set, Tuple, Union
 
+from thoth.storages.exceptions import NotFoundError
 from thoth.storages.result_base import ResultStorageBase
 
-from osiris import DEFAULT_OC_LOG_LEVEL
-from osiris import get_oc_client
-
-from osiris.schema.build import BuildLog
+from osiris import DEFAULT_BLOOM_CAPACITY
+from osiris import DEFAULT_BLOOM_FILTER
+from osiris import DEFAULT_FETCH_TIMEOUT
+from osiris import DEFAULT_FETCH_WORKERS
+from osiris import DEFAULT_INDEX_DIR
+from osiris import DEFAULT_LOG_CODEC
+from osiris import DEFAULT_RECONCILIATION_INTERVAL
+
+from osiris.bloom import BloomFilter
+from osiris.buffer import WriteBehindBuffer, merge_stored_build_doc
+from osiris.cache import ObjectCache
+from osiris.fetch import FetchResult, fetch_concurrently
+from osiris.index import BuildInfoIndex, StaleIndexError, decode_cursor, encode_cursor
+from osiris.layout import KeyLayout
+from osiris.logsearch import LogSearchIndex, open_log_search_index
+from osiris.logstore import BuildLogStore
+from osiris.metrics import register_metric
+from osiris.objects import ObjectStore
+from osiris.search import BuildSearchIndex
+from osiris.upload import UploadSessions
+
+from osiris.schema.build import BuildLog, LazyBuildLog
 from osiris.schema.build import BuildInfo, BuildInfoSchema
 from osiris.schema.build import BuildInfoPagination
 
-# TODO: logging
+
+_LOGGER = logging.getLogger(__name__)
 
 
 class _BuildLogsAggregator(ResultStorageBase):
 
     RESULT_TYPE = 'build_aggregator'
 
-    __PAGINATION_TOKEN__ = None
-    __PAGINATION_COUNT__ = 0
-    __COUNT__ = 0
-
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args,
+                 fetch_workers: int = DEFAULT_FETCH_WORKERS,
+                 log_codec: str = DEFAULT_LOG_CODEC,
+                 **kwargs):
 
         super(_BuildLogsAggregator, self).__init__(*args, **kwargs)
 
-    def count(self):
-        """Get total number of documents in the Ceph storage."""
+        # local copy of the index queryable by namespace, status and time
+        self.search_index = BuildSearchIndex(os.path.join(DEFAULT_INDEX_DIR, 'search.sqlite'))
+        # full-text index of build log lines, None if disabled or not supported by SQLite
+        self.log_search: Optional[LogSearchIndex] = open_log_search_index(
+            os.path.join(DEFAULT_INDEX_DIR, 'logs.sqlite'))
+
+        # parsed build information documents and build logs, revalidated on each access
+        self.cache = ObjectCache()
+        self.objects = ObjectStore(self.ceph, self.cache)
+        self.layout = KeyLayout(self.objects)
+        self.index = BuildInfoIndex(self.objects)
+        # changes of the index manifest are written once per flush of the buffer
+        self.write_buffer = WriteBehindBuffer(self.store_build_data, after_flush=self.index.flush_manifest)
+        self.logs = BuildLogStore(self.objects, self.log_search, log_codec)
+        self.uploads = UploadSessions(self.ceph)
+
+        # fast negative answers to existence checks, valid only if this process is the only writer
+        self.bloom: Optional[BloomFilter] = BloomFilter(DEFAULT_BLOOM_CAPACITY) if DEFAULT_BLOOM_FILTER else None
+
+        self._executor = ThreadPoolExecutor(max_workers=fetch_workers,
+                                            thread_name_prefix='osiris-fetch')
+
+        self._reconciliation_thread: Optional[threading.Thread] = None
+        self._reconciliation_stopped = threading.Event()
+
+    @staticmethod
+    def get_build_document_id(build_id: str) -> str:
+        """Get id of the document the given build is stored under."""
+        return hashlib.sha256(build_id.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get_index_entry(build_doc: dict) -> dict:
+        """Get compact build information entry stored in the index."""
+        return {
+            field: build_doc[field] for field in BuildInfoSchema().fields
+            if field in build_doc
+        }
+
+    def iter_document_ids(self) -> Generator[str, None, None]:
+        """Iterate over ids of build information documents in the Ceph storage.
+
+        Only top level objects are listed, auxiliary objects (like the index
+        or the date partitions, which have pointers at the top level) are stored
+        under nested prefixes.
+        """
         # noinspection PyProtectedMember
-        return sum(
-            1 for _ in
-            self.ceph._s3.Bucket(self.ceph.bucket)  # pylint: disable=protected-access
-                .objects
-                .filter(Prefix=self.prefix)
-                .all()
+        resource: ServiceResource = self.ceph._s3  # pylint: disable=protected-access
+
+        paginator: Paginator = resource.meta.client.get_paginator('list_objects_v2')
+        page_iterator = paginator.paginate(
+            Bucket=self.ceph.bucket,
+            Prefix=self.ceph.prefix,
+            Delimiter='/'
         )
 
+        for page_content in page_iterator:
+            for obj in page_content.get('Contents', []):
+                _, key = obj['Key'].rsplit('/', 1)
+
+                yield key
+
+    def count(self) -> int:
+        """Get total number of documents in the Ceph storage.
+
+        The number is taken from the build information index manifest,
+        the bucket is listed only until the index is built (see `reconcile_index`).
+        """
+        manifest: dict = self.index.retrieve_manifest()
+
+        if self.index.exists(manifest):
+            return self.index.count(manifest)
+
+        return sum(1 for _ in self.iter_document_ids())
+
     def connect(self):
 
         super().connect()
 
-        _BuildLogsAggregator.__COUNT__ = self.count()
+        self.start_reconciliation()
+
+    def reconcile_index(self):
+        """Reconcile build information index with the documents stored in Ceph.
+
+        Only the bucket listing is retrieved, documents are retrieved
+        only if they are missing in the index. The local search index
+        is rebuilt from the reconciled index afterwards.
+        """
+        started_at: float = time.time()
+        document_ids: Set[str] = set(self.iter_document_ids())
+
+        self.index.reconcile(document_ids, self._retrieve_index_entries)
+        self.search_index.rebuild(self.index.iter_entries(), started_at)
+
+        if self.bloom is not None:
+            self.bloom.populate(document_id for document_id in document_ids if len(document_id) == 64)
+
+    def retrieve_document(self, document_id: str) -> dict:
+        """Retrieve build information document in any of the key layouts.
+
+        :raises NotFoundError: In case there is no such document.
+        """
+        return self.ceph.retrieve_document(self.layout.get_key(document_id))
+
+    def fetch_documents(self,
+                        document_ids: Iterable[str],
+                        fetch: Callable[[str], Any] = None,
+                        timeout: float = DEFAULT_FETCH_TIMEOUT) -> List[FetchResult]:
+        """Retrieve multiple documents from Ceph concurrently.
+
+        See `fetch_concurrently` for ordering and error reporting.
+        """
+        return fetch_concurrently(document_ids,
+                                  fetch or self.retrieve_document,
+                                  executor=self._executor,
+                                  timeout=timeout)
+
+    def _retrieve_index_entries(self, document_ids: Set[str]) -> Dict[str, Optional[dict]]:
+        """Retrieve index entries of the given documents, None if no longer stored, failed retrievals are skipped."""
+        entries: Dict[str, Optional[dict]] = {}
+
+        for result in self.fetch_documents(sorted(document_ids)):
+            if result.ok:
+                entries[result.key] = self.get_index_entry(result.value)
+            elif isinstance(result.error, NotFoundError):
+                entries[result.key] = None
+            else:
+                _LOGGER.warning("Failed to retrieve document %r: %s", result.key, result.error)
+
+        return entries
+
+    def start_reconciliation(self, interval: int = DEFAULT_RECONCILIATION_INTERVAL):
+        """Start periodic reconciliation of the build information index in background.
+
+        The local build log search index is reconciled with the stored build logs and abandoned
+        build log upload sessions and multipart uploads of build logs older than the upload
+        session TTL, as well as replaced build logs, are collected along the way.
+        Reconciliation runs immediately if the index has not been created yet
+        (e.g. deployments which did not use the index before) or the local search indexes are empty.
+        """
+        if interval <= 0 or self._reconciliation_thread is not None:
+            return
+
+        def _reconcile():
+            # noinspection PyBroadException
+            try:
+                delay = interval if (self.index.exists() and self.search_index.count() and self.bloom is None and
+                                     (self.log_search is None or self.log_search.count())) else 0
+            except Exception:
+                delay = 0
+
+            while not self._reconciliation_stopped.wait(delay):
+                delay = interval
+
+                # noinspection PyBroadException
+                try:
+                    self.reconcile_index()
+                except Exception as exc:
+                    _LOGGER.warning("Build information index reconciliation failed: %s", exc)
+
+                # noinspection PyBroadException
+                try:
+                    self.logs.reconcile_log_search()
+                except Exception as exc:
+                    _LOGGER.warning("Build log search index reconciliation failed: %s", exc)
+
+                # noinspection PyBroadException
+                try:
+                    self.uploads.collect_garbage()
+                    # streamed build log writes interrupted by a restart
+                    self.uploads.abort_stale_uploads(self.logs.PREFIX)
+                except Exception as exc:
+                    _LOGGER.warning("Garbage collection of build log upload sessions failed: %s", exc)
+
+                # noinspection PyBroadException
+                try:
+                    self.logs.purge_replaced_build_logs()
+                except Exception as exc:
+                    _LOGGER.warning("Garbage collection of replaced build logs failed: %s", exc)
+
+        self._reconciliation_thread = threading.Thread(
+            target=_reconcile, name='index-reconciliation', daemon=True)
+        self._reconciliation_thread.start()
+
+    def stop_reconciliation(self):
+        """Stop periodic reconciliation of the build information index."""
+        self._reconciliation_stopped.set()
 
     def purge_build_data(self, prefix: str = None):
         """Purge build log documents stored in Ceph bucket.
@@ -61,115 +259,390 @@ class _BuildLogsAggregator(ResultStorageBase):
                       .all() \
                       .delete()
 
-        self.__COUNT__ = 0
-        self.__PAGINATION_TOKEN__ = None
+        self.cache.clear()
+        self.layout.clear()
+        self.search_index.clear()
+
+        if self.log_search is not None:
+            self.log_search.clear()
+
+    def submit_build_data(self, build_doc: dict) -> Future:
+        """Submit build data to be stored in Ceph.
+
+        Updates of the same build are merged and written behind,
+        updates of finished builds are stored immediately.
+
+        :returns: future resolved once the build data have been stored.
+        """
+        return self.write_buffer.submit(build_doc)
 
     def store_build_data(self, build_doc: dict):
-        """Store the build log document in Ceph."""
-        blob = self.ceph.dict2blob(build_doc)
+        """Store the build log document in Ceph.
+
+        Build log, if present, is stored as a separate object
+        and the build information document only keeps its reference.
+        The document is merged into the stored one (see `merge_stored_build_doc`)
+        by a conditional write, so that neither concurrent writers nor redelivered
+        updates of earlier build phases overwrite later ones. Documents which
+        would not change are not written.
+        """
+        build_doc = dict(build_doc)
         build_id: str = build_doc['build_id']
 
-        document_id: str = hashlib.sha256(build_id.encode('utf-8')).hexdigest()
+        document_id: str = self.get_build_document_id(build_id)
+
+        build_log = build_doc.pop('build_log', None)
+        if build_log is not None:
+            if not isinstance(build_log, dict):
+                build_log = {'data': build_log}
+
+            build_doc['build_log_object'] = self.logs.store_build_log(
+                document_id,
+                data=build_log.get('data') or '',
+                metadata=build_log.get('metadata')
+            )
+
+        merged: dict = build_doc
+
+        def _put(key: str):
+            def _merge(stored: Optional[dict]) -> Optional[dict]:
+                nonlocal merged
+
+                moved: bool = stored is None and key != document_id
+                if moved:
+                    # stored in the flat layout, being moved to its partition
+                    stored, _ = self.objects.retrieve_document(document_id)
+
+                merged = merge_stored_build_doc(stored, build_doc)
+
+                return None if merged == stored and not moved else merged
+
+            # flags allowing to check the document by a HEAD request
+            self.objects.update_document(key, _merge, get_metadata=lambda doc: {
+                'build-status': doc.get('build_status') or '',
+                'has-log': '1' if doc.get('build_log_object') or doc.get('build_log') else '0',
+            })
+
+        self.layout.store(document_id, build_doc, _put)
+
+        entry: dict = self.get_index_entry(merged)
+
+        self.index.update(document_id, entry)
+        self.search_index.update(document_id, entry)
+
+        if self.bloom is not None:
+            self.bloom.add(document_id)
+
+    def retrieve_build_metadata(self, build_id: str) -> Optional[dict]:
+        """Retrieve status of the given build and whether its build log has been stored.
+
+        Only a HEAD request is made (none if the Bloom filter rules the document out),
+        documents stored without the metadata flags are retrieved.
+
+        :returns: dict with `build_status` and `has_log` keys, None if there is no such build.
+        """
+        document_id: str = self.get_build_document_id(build_id)
+
+        if self.bloom is not None and document_id not in self.bloom:
+            return None
+
+        obj = self.objects.object(self.layout.get_key(document_id))
 
-        self.ceph.store_blob(blob, document_id)
+        try:
+            obj.load()
+        except ClientError as exc:
+            if exc.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            raise
 
-        _BuildLogsAggregator.__COUNT__ += 1
+        metadata: Dict[str, str] = obj.metadata or {}
+
+        if 'has-log' not in metadata:
+            build_doc: dict = self.retrieve_document(document_id)
+
+            return {
+                'build_status': build_doc.get('build_status'),
+                'has_log': bool(build_doc.get('build_log_object') or build_doc.get('build_log')),
+            }
+
+        return {
+            'build_status': metadata.get('build-status') or None,
+            'has_log': metadata['has-log'] == '1',
+        }
+
+    def attach_build_log(self, build_id: str, build_log: dict = None, build_log_object: dict = None) -> Future:
+        """Store build log of the given build, replacing the stored one.
+
+        Either the build log or a reference to the already stored build log object is given.
+        The stored build information document is not retrieved, the reference is merged
+        into it once written (see `store_build_data`). The build information document
+        is created if it does not exist.
+
+        :returns: future resolved once the build information document has been stored.
+        """
+        build_doc: dict = {'build_id': build_id}
+
+        if build_log_object is not None:
+            build_doc['build_log_object'] = build_log_object
+        else:
+            build_doc['build_log'] = build_log
+
+        return self.submit_build_data(build_doc)
+
+    def retrieve_build_log_object(self, build_id: str) -> dict:
+        """Retrieve reference to the build log of the given build.
+
+        Build logs embedded in documents stored before build logs were split
+        are returned inline under the `data` key.
+
+        :raises NotFoundError: In case there is no build log stored for the build.
+        """
+        (build_doc, _), _ = self._retrieve_cached_build(build_id)
+        build_log_object: Optional[dict] = build_doc.get('build_log_object')
+
+        if build_log_object is None:
+            build_log_data = build_doc.get('build_log')
+            if isinstance(build_log_data, dict):
+                build_log_data = build_log_data.get('data')
+
+            if build_log_data is None:
+                return self._retrieve_build_log_reference(build_id)
+
+            data: bytes = build_log_data.encode('utf-8')
+            build_log_object = {'data': data, 'size': len(data)}
+
+        return build_log_object
+
+    def _retrieve_build_log_reference(self, build_id: str) -> dict:
+        """Retrieve reference to the build log not referenced by the build information document.
+
+        That is the case of build logs being followed and of build logs
+        stored by the follower after the build information document.
+
+        :raises NotFoundError: In case there is no build log stored for the build.
+        """
+        document_id: str = self.get_build_document_id(build_id)
+
+        try:
+            return self.logs.retrieve_build_log_reference(document_id)
+        except NotFoundError as exc:
+            raise NotFoundError(f"Build log of build {build_id!r} has not been stored") from exc
 
     def retrieve_build_data(
             self, build_id: str, log_only=False) -> Union[Tuple[BuildLog, ],
                                                           Tuple[BuildLog, BuildInfo]]:
-        """Retrieve build log document from Ceph by its id."""
-        document_id: str = hashlib.sha256(build_id.encode('utf-8')).hexdigest()
+        """Retrieve build log document from Ceph by its id.
+
+        Build log stored as a separate object is loaded lazily, on first
+        access to its data, `None` is returned if there is no build log stored.
+        """
+        (build_doc, build_info), _ = self._retrieve_cached_build(build_id)
 
-        build_doc: dict = self.ceph.retrieve_document(document_id)
+        build_log_data = build_doc.get('build_log')
+        build_log_object = build_doc.get('build_log_object')
 
-        build_log_data = build_doc.pop('build_log', None)
+        build_log: Optional[BuildLog] = None
 
-        if isinstance(build_log_data, dict):
+        if build_log_object is not None:
+            build_log = LazyBuildLog(
+                partial(self.logs.retrieve_build_log, build_log_object),
+                metadata=build_log_object.get('metadata')
+            )
+        elif isinstance(build_log_data, dict):
+            # documents stored before build logs were split
             build_log = BuildLog(**build_log_data)
-        else:
+        elif build_log_data is not None:
             build_log = BuildLog(data=build_log_data)
 
         ret: tuple = (build_log, )
 
         if not log_only:
-            build_info = BuildInfoSchema().load(build_doc).data
-
             ret = build_log, build_info
 
         return ret
 
-    def paginate_build_data(self, page: int) -> BuildInfoPagination:
-        """Paginate build information stored in Ceph."""
-        if page == 1:
-            # reset pagination
-            self.__COUNT__ = self.count()
-            self.__PAGINATION_COUNT__ = 0
+    def retrieve_build_info(self, build_id: str, if_none_match: str = None) -> Tuple[Optional[BuildInfo], str]:
+        """Retrieve build information along with its version, the ETag of the stored document.
+
+        :param if_none_match: version the caller has already, BuildInfo is not retrieved (None is returned)
+                              if it matches, unless it is cached.
+        :raises NotFoundError: In case there is no such build.
+        """
+        cached, etag = self._retrieve_cached_build(build_id, if_none_match=if_none_match)
+
+        return (cached[1] if cached is not None else None), etag
 
-            _BuildLogsAggregator.__PAGINATION_TOKEN__ = None
+    def retrieve_build_log_summary(self, build_id: str) -> Optional[dict]:
+        """Retrieve summary of the build log extracted when the build log has been stored.
 
-        result_list = []
+        The summary is stored next to the build log, it is served neither with
+        the build information nor with the build log reference.
 
-        if self.__COUNT__ > 0:
+        :raises NotFoundError: In case there is no such build.
+        :returns: the summary, None if the build has no build log or it has been stored without the summary.
+        """
+        summary: Optional[dict] = self.logs.retrieve_build_log_summary(self.get_build_document_id(build_id))
+        if summary is not None:
+            return summary
 
-            # noinspection PyProtectedMember
-            resource: ServiceResource = self.ceph._s3  # pylint: disable=protected-access
+        (build_doc, _), _ = self._retrieve_cached_build(build_id)
 
-            s3_client = resource.meta.client
+        # kept in the build log reference by earlier versions, see `python -m osiris.migrate summarize-logs`
+        return (build_doc.get('build_log_object') or {}).get('summary')
 
-            paginator: Paginator = s3_client.get_paginator('list_objects_v2')
-            page_iterator = paginator.paginate(
-                Bucket=self.ceph.bucket,
-                Prefix=self.ceph.prefix,
-                PaginationConfig={
-                    'MaxItems': BuildInfoPagination.RESULTS_PER_PAGE,
-                    'StartingToken': self.__PAGINATION_TOKEN__
-                }
-            )
+    def retrieve_build_log_version(self, build_id: str) -> Optional[str]:
+        """Get version of the build log of the given build derived from ETags of the stored objects.
+
+        Build logs of running builds and build logs not referenced by the document have no version,
+        as they might change without the document being rewritten.
+
+        :raises NotFoundError: In case there is no such build.
+        """
+        (build_doc, _), etag = self._retrieve_cached_build(build_id)
+        build_log_object: Optional[dict] = build_doc.get('build_log_object')
+
+        if build_log_object is None:
+            return etag if build_doc.get('build_log') is not None else None
 
-            schema = BuildInfoSchema()
-            for page_content in page_iterator:
-                for obj in page_content['Contents']:
-                    _, key = obj['Key'].rsplit('/', 1)
+        if build_log_object.get('live'):
+            return None
 
-                    data = self.ceph.retrieve_document(key)
-                    parsed_data, errors = schema.load(data)
+        obj = self.objects.object(build_log_object['key'])
+        obj.load()
 
-                    result_list.append(
-                        # ignore validation errors here
-                        parsed_data
-                    )
+        return hashlib.sha1(f"{etag}:{obj.e_tag}".encode('utf-8')).hexdigest()
 
-                    _BuildLogsAggregator.__PAGINATION_TOKEN__ = page_iterator.resume_token
+    def _retrieve_cached_build(self, build_id: str,
+                               if_none_match: str = None) -> Tuple[Optional[Tuple[dict, BuildInfo]], str]:
+        """Retrieve build information document along with BuildInfo loaded from it, both shared by the cache.
 
-            self.__PAGINATION_COUNT__ += len(result_list)
+        :raises NotFoundError: In case there is no such build.
+        :returns: the document and BuildInfo (None if matching `if_none_match`), unquoted ETag of the document.
+        """
+        def _parse(blob: bytes) -> Tuple[dict, BuildInfo]:
+            build_doc: dict = json.loads(blob.decode('utf-8'))
+            build_info: BuildInfo = BuildInfoSchema().load({
+                field: value for field, value in build_doc.items()
+                if field not in ('build_log', 'build_log_object')
+            }).data
+
+            return build_doc, build_info
+
+        key: str = self.layout.get_key(self.get_build_document_id(build_id))
+        cached, etag = self.cache.retrieve(self.objects.object(key), _parse,
+                                           if_none_match=f'"{if_none_match}"' if if_none_match else None)
+
+        return cached, etag.strip('"')
+
+    def paginate_build_data(self,
+                            page: int = 1,
+                            per_page: int = None,
+                            cursor: str = None) -> BuildInfoPagination:
+        """Paginate build information stored in Ceph.
+
+        The page is given either by its number or by an opaque cursor
+        returned with the previous page. No pagination state is kept
+        on the server side.
+
+        The page is served from the build information index,
+        build information documents and logs are not retrieved.
+        Until the index is built, or while it does not match its manifest,
+        the page is located in the bucket listing, documents of the page
+        are retrieved concurrently and failed retrievals are reported in `errors`.
+        """
+        per_page = min(max(per_page or BuildInfoPagination.RESULTS_PER_PAGE, 1),
+                       BuildInfoPagination.MAX_RESULTS_PER_PAGE)
+
+        position: dict = decode_cursor(cursor) if cursor else {'offset': (max(page, 1) - 1) * per_page}
+
+        errors: Dict[str, str] = {}
+
+        window: Optional[Tuple[int, int, List[Tuple[str, dict]]]] = self._index_window(per_page, **position)
+
+        if window is not None:
+            total, offset, entries = window
+            document_ids: List[str] = [document_id for document_id, _ in entries]
+        else:
+            total, offset, document_ids = self._listing_window(per_page, **position)
+
+            entries = []
+            for result in self.fetch_documents(document_ids):
+                if result.ok:
+                    entries.append((result.key, self.get_index_entry(result.value)))
+                else:
+                    errors[result.key] = str(result.error)
+
+        schema = BuildInfoSchema()
+        result_list = [
+            # ignore validation errors here
+            schema.load(entry).data
+            for _, entry in entries
+        ]
+
+        has_next: bool = offset + len(document_ids) < total
+        has_prev: bool = offset > 0
 
         build_info_pagination = BuildInfoPagination(
             result_list,
-            total=self.__COUNT__,
-            has_next=self.__PAGINATION_COUNT__ < self.__COUNT__,
-            has_prev=page > 1  # assume that next pages wouldn't be shown otherwise
+            total=total,
+            has_next=has_next,
+            has_prev=has_prev,
+            errors=errors,
+            page=offset // per_page + 1,
+            per_page=per_page,
+            next_cursor=encode_cursor(after=document_ids[-1]) if document_ids and has_next else None,
+            prev_cursor=encode_cursor(before=document_ids[0]) if document_ids and has_prev else None
         )
 
         return build_info_pagination
 
-    @staticmethod
-    def get_build_log(build_id: str,
-                      namespace: str,
-                      log_level: int = DEFAULT_OC_LOG_LEVEL) -> str:
-        """Curl OCP for build log for the given build.
+    def _index_window(self, limit: int, **position) -> Optional[Tuple[int, int, List[Tuple[str, dict]]]]:
+        """Locate the requested page window in the build information index.
 
-        :raises OCError: In case of OC CLI failure.
+        :returns: total, offset of the window and its entries, None if the index
+            has not been built yet (see `reconcile_index`) or it is stale.
         """
-        client = get_oc_client()
+        manifest: dict = self.index.retrieve_manifest()
 
-        logs = client.get_build_log(  # TODO: can log level be modified?
-            build_id=build_id,
-            namespace=namespace
-        )
+        if not self.index.exists(manifest):
+            return None
+
+        try:
+            offset, entries = self.index.page(limit, manifest=manifest, **position)
+        except StaleIndexError as exc:
+            # the manifest is updated after the segment, or its count has been lost
+            _LOGGER.debug("Build information index is stale, the listing is used instead: %s", exc)
+            return None
+
+        return self.index.count(manifest), offset, entries
 
-        return logs
+    def _listing_window(self,
+                        limit: int,
+                        offset: int = 0,
+                        after: str = None,
+                        before: str = None) -> Tuple[int, int, List[str]]:
+        """Locate the requested page window in the bucket listing.
+
+        :returns: total number of documents, offset of the window and ids of documents in the window.
+        """
+        document_ids: List[str] = list(self.iter_document_ids())
+
+        if before is not None:
+            end: int = bisect.bisect_left(document_ids, before)
+            offset = max(end - limit, 0)
+
+            return len(document_ids), offset, document_ids[offset:end]
+
+        if after is not None:
+            offset = bisect.bisect_right(document_ids, after)
+
+        return len(document_ids), offset, document_ids[offset:offset + limit]
 
 
 build_aggregator = _BuildLogsAggregator()
 build_aggregator.connect()
+
+register_metric('write_behind', lambda: dict(build_aggregator.write_buffer.stats.to_dict(),
+                                             pending=build_aggregator.write_buffer.pending()))
+register_metric('cache', build_aggregator.cache.info)
+register_metric('single_flight', build_aggregator.cache.flights.stats.to_dict)
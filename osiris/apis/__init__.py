@@ -7,6 +7,10 @@ from osiris import ABOUT
 from .build import api as build_namespace
 from .probes import api as probes_namespace
 from .config import api as config_namespace
+from .metrics import api as metrics_namespace
+from .upload import api as upload_namespace
+from .search import api as search_namespace
+from .summary import api as summary_namespace
 
 from .model import app_data
 from .model import response
@@ -24,6 +28,10 @@ api = Api(
 api.add_namespace(build_namespace)
 api.add_namespace(probes_namespace)
 api.add_namespace(config_namespace)
+api.add_namespace(metrics_namespace)
+api.add_namespace(upload_namespace)
+api.add_namespace(search_namespace)
+api.add_namespace(summary_namespace)
 
 api.add_model('status', status)
 api.add_model('app_data', app_data)
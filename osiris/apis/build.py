@@ -2,13 +2,18 @@
 
 """Namespace: build."""
 
+import json
+
+from functools import partial
 from http import HTTPStatus
-from typing import Union
+from typing import Callable, Iterator, List, Optional, Tuple, Union
 
 from flask import request
+from flask import Response
 from flask import url_for
 
 from flask_restplus import fields
+from flask_restplus import marshal
 from flask_restplus import Namespace
 from flask_restplus import Resource
 
@@ -17,14 +22,19 @@ from kubernetes.client.models.v1_event import V1Event
 
 from marshmallow import ValidationError
 
+from osiris import DEFAULT_FETCH_WORKERS
+from osiris import DEFAULT_LOG_CHUNK_SIZE
+from osiris import DEFAULT_MAX_BATCH_SIZE
 from osiris import DEFAULT_OC_LOG_LEVEL
 from osiris.aggregator import build_aggregator
 from osiris.apis.model import response
+from osiris.compression import Codec
+from osiris.ingestion import ingestion_pool
 from osiris.response import request_accepted
 from osiris.response import request_ok
 from osiris.response import bad_request
 
-from osiris.schema.build import BuildInfo, BuildInfoSchema, BuildLogSchema
+from osiris.schema.build import BuildInfo, BuildInfoSchema, BuildLog, BuildLogSchema
 from osiris.schema.build import BuildInfoPagination, BuildInfoPaginationSchema
 
 from osiris.exceptions import OCError
@@ -32,6 +42,7 @@ from osiris.exceptions import OCError
 from thoth.storages.exceptions import NotFoundError
 
 from werkzeug.exceptions import HTTPException, InternalServerError
+from werkzeug.http import quote_etag
 
 
 api = Namespace(name='build', description="Namespace for build triggers.")
@@ -112,13 +123,18 @@ class BuildStatusResource(Resource):
     """Build status endpoint."""
 
     # noinspection PyMethodMayBeStatic
+    @api.response(code=HTTPStatus.NOT_MODIFIED,
+                  description="Build information has not changed since the version given by `If-None-Match`.")
     def get(self, build_id):
         """Return status of the given build."""
-        _, build_info = build_aggregator.retrieve_build_data(build_id)
+        build_info, etag = build_aggregator.retrieve_build_info(build_id, if_none_match=_get_if_none_match())
+
+        if request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
 
         return request_ok(payload={
             'build_status': build_info.build_status
-        })
+        }) + ({'ETag': quote_etag(etag)}, )
 
 
 # info
@@ -129,17 +145,62 @@ class BuildInfoResource(Resource):
     """Build information endpoint."""
 
     # noinspection PyMethodMayBeStatic
-    @api.marshal_with(build_response)
     @api.response(code=HTTPStatus.OK,
                   description="Retrieve stored information about build "
                               "specified by unique build id.",
                   model=build_response)
+    @api.response(code=HTTPStatus.NOT_MODIFIED,
+                  description="Build information has not changed since the version given by `If-None-Match`.")
     def get(self, build_id):
         """Return complete information stored about given build."""
         schema = BuildInfoSchema()
-        _, build_info = build_aggregator.retrieve_build_data(build_id)
+        build_info, etag = build_aggregator.retrieve_build_info(build_id, if_none_match=_get_if_none_match())
+
+        if request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
+
+        # marshalled only here, responses to conditional requests have no body
+        body, code = request_ok(payload=schema.dump(build_info))
+
+        return marshal(body, build_response), code, {'ETag': quote_etag(etag)}
 
-        return request_ok(payload=schema.dump(build_info))
+
+@api.route('/info:batch')
+class BuildInfoBatchResource(Resource):
+    """Build information lookup of multiple builds."""
+
+    # noinspection PyMethodMayBeStatic
+    @api.produces(['application/x-ndjson'])
+    @api.response(code=HTTPStatus.OK,
+                  description="Stream NDJSON line `{\"build_id\": ..., \"status\": ..., \"payload\": ...}`"
+                              " for each of the builds in the order of the given ids, status is one of"
+                              " `ok`, `not_found` and `error`.",
+                  )
+    @api.response(code=HTTPStatus.BAD_REQUEST,
+                  description="Request could not be processed due to malformed or too large list of build ids.")
+    def post(self):
+        """Return information stored about the builds given by JSON array of build ids."""
+        schema = BuildInfoSchema()
+
+        return _lookup_builds(lambda build_info: schema.dump(build_info).data)
+
+
+@api.route('/status:batch')
+class BuildStatusBatchResource(Resource):
+    """Build status lookup of multiple builds."""
+
+    # noinspection PyMethodMayBeStatic
+    @api.produces(['application/x-ndjson'])
+    @api.response(code=HTTPStatus.OK,
+                  description="Stream NDJSON line `{\"build_id\": ..., \"status\": ..., \"payload\": ...}`"
+                              " for each of the builds in the order of the given ids, status is one of"
+                              " `ok`, `not_found` and `error`.",
+                  )
+    @api.response(code=HTTPStatus.BAD_REQUEST,
+                  description="Request could not be processed due to malformed or too large list of build ids.")
+    def post(self):
+        """Return status of the builds given by JSON array of build ids."""
+        return _lookup_builds(lambda build_info: {'build_status': build_info.build_status})
 
 
 @api.route('/info/page', defaults={'page': 1})
@@ -148,13 +209,22 @@ class BuildInfoListingResource(Resource):
     """Build information endpoint."""
 
     # noinspection PyMethodMayBeStatic
+    @api.param(name='cursor', description="Opaque cursor returned with the previous page, "
+                                          "takes precedence over page number.")
+    @api.param(name='per_page', description="Number of results per page "
+                                            f"(default {BuildInfoPagination.RESULTS_PER_PAGE}, "
+                                            f"max {BuildInfoPagination.MAX_RESULTS_PER_PAGE}).")
     @api.response(code=HTTPStatus.OK,
                   description="Paginate build information documents."
                   )
     def get(self, page):
         """Paginate build information documents stored in Ceph."""
         schema = BuildInfoPaginationSchema()
-        paginated_data: BuildInfoPagination = build_aggregator.paginate_build_data(page)
+        paginated_data: BuildInfoPagination = build_aggregator.paginate_build_data(
+            page,
+            per_page=request.args.get('per_page', type=int),
+            cursor=request.args.get('cursor')
+        )
 
         return request_ok(payload=schema.dump(paginated_data))
 
@@ -177,15 +247,40 @@ class BuildLogResource(Resource):
             HTTPStatus.OK,
             HTTPStatus.BAD_REQUEST
         ]})
+    @api.param(name='from_line', description="First line of the build log to return (numbered from 1).")
+    @api.param(name='to_line', description="Last line of the build log to return.")
+    @api.param(name='tail', description="Number of lines to return from the end of the build log.")
+    @api.response(code=HTTPStatus.NOT_MODIFIED,
+                  description="Build log has not changed since the version given by `If-None-Match`.")
     def get(self, build_id):
         """Return logs stored by the given build."""
-        build_log, = build_aggregator.retrieve_build_data(build_id, log_only=True)
+        # only the metadata of the stored objects are retrieved to check the version
+        etag: Optional[str] = build_aggregator.retrieve_build_log_version(build_id)
+
+        if etag is not None and request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
+
+        line_range: Optional[dict] = _get_line_range()
+
+        if line_range is not None:
+            build_log_object: dict = build_aggregator.retrieve_build_log_object(build_id)
+
+            build_log = BuildLog(
+                data=b''.join(
+                    build_aggregator.logs.iter_build_log_lines(build_log_object, **line_range)
+                ).decode('utf-8', errors='replace'),
+                metadata=build_log_object.get('metadata')
+            )
+        else:
+            build_log, = build_aggregator.retrieve_build_data(build_id, log_only=True)
 
         # TODO: return the whole doc or just the build log?
-        return request_ok(
+        resp: tuple = request_ok(
             payload=build_log
         )
 
+        return resp + ({'ETag': quote_etag(etag)}, ) if etag is not None else resp
+
     @api.param(name='force', description="Overwrite existing logs (default 1).")
     @api.response(code=HTTPStatus.ACCEPTED,
                   description="Request has been accepted."
@@ -198,32 +293,17 @@ class BuildLogResource(Resource):
     @api.expect(build_log_fields)
     def put(self, build_id):
         """Store logs for the given build in Ceph."""
-        try:
-            build_log, build_info = build_aggregator.retrieve_build_data(build_id)
-
-            if build_log is not None and not int(request.args.get('force', 1)):
-
-                return bad_request(
-                    errors={
-                        'BuildLogExists': f"Build log `{build_id}` already exists"
-                                          " and `force` is not specified."
-                    }
-                )
-
-        except NotFoundError:
-            # create the entry anyway without any metadata
-            build_info = BuildInfo(build_id=build_id, build_status='Unknown')
-
-        build_doc, _ = BuildInfoSchema().dump(build_info)
+        # metadata lookup only, the stored document is not retrieved
+        metadata: Optional[dict] = build_aggregator.retrieve_build_metadata(build_id)
 
         build_log_schema = BuildLogSchema()
         build_log, validation_errors = build_log_schema.load(request.json)
 
-        if not build_info.build_complete():
+        errors: Optional[dict] = check_build_log_upload(build_id, metadata)
+
+        if errors:
             resp = bad_request(
-                errors={
-                    'BuildNotCompleted': "Build has not been completed yet.",
-                },
+                errors=errors,
                 validation_errors=validation_errors
             )
 
@@ -231,15 +311,210 @@ class BuildLogResource(Resource):
             if 'build_id' not in build_log['metadata']:
                 build_log['metadata']['build_id'] = build_id
 
-            build_doc['build_log'] = build_log
-
-            build_aggregator.store_build_data(build_doc)
+            build_aggregator.attach_build_log(build_id, build_log)
 
             resp = request_ok()
 
         return resp
 
 
+@api.route('/logs/<string:build_id>/raw')
+@api.param('build_id', 'Unique build identification.')
+class BuildLogRawResource(Resource):
+    """Raw build log endpoint."""
+
+    # noinspection PyMethodMayBeStatic
+    @api.produces(['text/plain'])
+    @api.response(code=HTTPStatus.OK,
+                  description="Stream stored build log as plain text. "
+                              "Compressed build logs are served without decompression "
+                              "to clients accepting the stored encoding.",
+                  )
+    @api.response(code=HTTPStatus.PARTIAL_CONTENT,
+                  description="Stream the requested byte range of the stored build log.",
+                  )
+    @api.response(code=HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE,
+                  description="Requested byte range is out of the build log.",
+                  )
+    @api.param(name='from_line', description="First line of the build log to return (numbered from 1).")
+    @api.param(name='to_line', description="Last line of the build log to return.")
+    @api.param(name='tail', description="Number of lines to return from the end of the build log.")
+    def get(self, build_id):
+        """Stream build log of the given build as plain text, `Range` header is honoured."""
+        build_log_object: dict = build_aggregator.retrieve_build_log_object(build_id)
+        size: int = build_log_object['size']
+
+        line_range: Optional[dict] = _get_line_range()
+
+        if line_range is not None:
+            return Response(build_aggregator.logs.iter_build_log_lines(build_log_object, **line_range),
+                            mimetype='text/plain', direct_passthrough=True)
+
+        byte_range = request.range
+        if byte_range is not None and (byte_range.units != 'bytes' or len(byte_range.ranges) != 1):
+            byte_range = None  # not supported, serve the whole build log
+
+        if byte_range is not None:
+            bounds = byte_range.range_for_length(size)
+
+            if bounds is None:
+                resp = Response(status=HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE.value)
+                resp.headers['Content-Range'] = f"bytes */{size}"
+
+                return resp
+
+            start, end = bounds
+            _, chunks = build_aggregator.logs.iter_build_log(build_log_object, start, end)
+
+            resp = Response(chunks, status=HTTPStatus.PARTIAL_CONTENT.value,
+                            mimetype='text/plain', direct_passthrough=True)
+            resp.headers['Content-Range'] = f"bytes {start}-{end - 1}/{size}"
+            resp.headers['Content-Length'] = end - start
+
+        else:
+            encodings = [encoding for encoding, quality in request.accept_encodings if quality > 0]
+            encoding, chunks = build_aggregator.logs.iter_build_log(build_log_object, encodings=encodings)
+
+            resp = Response(chunks, mimetype='text/plain', direct_passthrough=True)
+
+            if encoding != Codec.NAME:
+                resp.headers['Content-Encoding'] = encoding
+                resp.headers['Content-Length'] = build_log_object['stored_size']
+            else:
+                resp.headers['Content-Length'] = size
+
+        resp.headers['Accept-Ranges'] = 'bytes'
+        resp.headers['Vary'] = 'Accept-Encoding'
+
+        return resp
+
+    # noinspection PyMethodMayBeStatic
+    @api.param(name='force', description="Overwrite existing logs (default 1).")
+    @api.response(code=HTTPStatus.OK,
+                  description="Build log has been stored in Ceph.",
+                  )
+    @api.response(code=HTTPStatus.BAD_REQUEST,
+                  description="Request could not be processed due to invalid UTF-8 data"
+                              " or the build has not been completed yet."
+                  )
+    @api.doc(consumes=['text/plain'])
+    def put(self, build_id):
+        """Store build log of the given build streamed as plain text request body.
+
+        The body (possibly sent in chunked transfer encoding) is stored as it arrives,
+        it is never held in memory as a whole.
+        """
+        metadata: Optional[dict] = build_aggregator.retrieve_build_metadata(build_id)
+
+        errors: Optional[dict] = check_build_log_upload(build_id, metadata)
+
+        if errors:
+            return bad_request(errors=errors)
+
+        chunks = iter(partial(request.stream.read, DEFAULT_LOG_CHUNK_SIZE), b'')
+
+        try:
+            build_log_object: dict = build_aggregator.logs.store_build_log_stream(
+                build_aggregator.get_build_document_id(build_id), chunks, metadata={'build_id': build_id})
+        except UnicodeDecodeError as exc:
+            return bad_request(errors={'InvalidBuildLog': f"Build log is not valid UTF-8: {exc}"})
+
+        build_aggregator.attach_build_log(build_id, build_log_object=build_log_object)
+
+        return request_ok()
+
+
+def _lookup_builds(serialize: Callable[[BuildInfo], dict]) -> Union[tuple, Response]:
+    """Look up builds given by the request body concurrently, stream the results as NDJSON.
+
+    Builds are retrieved in chunks, so that the first results are sent before all of them are retrieved.
+    """
+    build_ids = request.get_json(force=True, silent=True)
+    if isinstance(build_ids, dict):
+        build_ids = build_ids.get('build_ids')
+
+    if not isinstance(build_ids, list) or not all(isinstance(build_id, str) for build_id in build_ids):
+        return bad_request(errors={'build_ids': "Expected JSON array of build ids."})
+
+    if len(build_ids) > DEFAULT_MAX_BATCH_SIZE:
+        return bad_request(errors={
+            'build_ids': f"Batch of {len(build_ids)} build ids exceeds the limit of {DEFAULT_MAX_BATCH_SIZE}."
+        })
+
+    def _retrieve(build_id: str) -> BuildInfo:
+        build_info, _ = build_aggregator.retrieve_build_info(build_id)
+
+        return build_info
+
+    def _generate() -> Iterator[str]:
+        chunk_size: int = 4 * DEFAULT_FETCH_WORKERS
+
+        for offset in range(0, len(build_ids), chunk_size):
+            for result in build_aggregator.fetch_documents(build_ids[offset:offset + chunk_size], fetch=_retrieve):
+                line: dict = {'build_id': result.key}
+
+                if result.ok:
+                    line.update(status='ok', payload=serialize(result.value))
+                elif isinstance(result.error, NotFoundError):
+                    line.update(status='not_found')
+                else:
+                    line.update(status='error', error=str(result.error) or result.error.__class__.__name__)
+
+                yield json.dumps(line) + '\n'
+
+    return Response(_generate(), mimetype='application/x-ndjson')
+
+
+def _get_if_none_match() -> Optional[str]:
+    """Get the version given by `If-None-Match`, if any, so that it can be checked before retrieving the data."""
+    return next(iter(request.if_none_match), None)
+
+
+def _not_modified(etag: str) -> tuple:
+    """Return response to conditional request of a resource whose version has not changed."""
+    return {}, HTTPStatus.NOT_MODIFIED.value, {'ETag': quote_etag(etag)}
+
+
+def check_build_log_upload(build_id: str, metadata: Optional[dict]) -> Optional[dict]:
+    """Check whether build log of the given build can be stored.
+
+    :returns: errors preventing the build log from being stored, if any.
+    """
+    if metadata is not None and metadata['has_log'] and not int(request.args.get('force', 1)):
+        return {
+            'BuildLogExists': f"Build log `{build_id}` already exists"
+                              " and `force` is not specified."
+        }
+
+    build_info = BuildInfo(build_id=build_id,
+                           build_status=(metadata or {}).get('build_status') or 'Unknown')
+
+    if not build_info.build_complete():
+        return {
+            'BuildNotCompleted': "Build has not been completed yet.",
+        }
+
+    return None
+
+
+def _get_line_range() -> Optional[dict]:
+    """Get range of build log lines requested by query parameters, if any."""
+    from_line: Optional[int] = request.args.get('from_line', type=int)
+    to_line: Optional[int] = request.args.get('to_line', type=int)
+    tail: Optional[int] = request.args.get('tail', type=int)
+
+    if tail is not None:
+        return {'tail': max(tail, 0)}
+
+    if from_line is None and to_line is None:
+        return None
+
+    return {
+        'start_line': max((from_line or 1) - 1, 0),
+        'end_line': to_line
+    }
+
+
 # triggers
 
 @api.route('/started/build_schema/<string:build_id>')
@@ -262,7 +537,6 @@ class BuildStartedResource(Resource):
     @api.expect(build_fields)
     def put(self, build_id: str = None):  # pragma: no cover
         """Trigger build start hook."""
-        # TODO: run all of the following ops asynchronously
         errors = {}
 
         build_schema = BuildInfoSchema()
@@ -274,11 +548,10 @@ class BuildStartedResource(Resource):
         validation_errors = build_schema.validate(build_data)
 
         if not errors:  # validation errors other than build_id are permitted for now
-            # store in Ceph
-            build_data['build_log'] = None
-            build_aggregator.store_build_data(build_data)
+            # store in Ceph asynchronously
+            job_id: Optional[int] = ingestion_pool.submit('build_started', {'build_doc': build_data})
 
-            return request_accepted(errors=validation_errors)
+            return request_accepted(payload={'job_id': job_id, 'duplicate': job_id is None}, errors=validation_errors)
 
         else:
             errors.update(validation_errors)
@@ -314,11 +587,10 @@ class BuildStartedEventResource(Resource):
             BuildInfo.from_event(event, build_id)
         )
 
-        # store in Ceph
-        build_data['build_log'] = None
-        build_aggregator.store_build_data(build_data)
+        # store in Ceph asynchronously
+        job_id: Optional[int] = ingestion_pool.submit('build_started', {'build_doc': build_data})
 
-        return request_accepted(errors=validation_errors)
+        return request_accepted(payload={'job_id': job_id, 'duplicate': job_id is None}, errors=validation_errors)
 
 
 @api.route('/started/<string:build_id>')
@@ -347,11 +619,10 @@ class BuildStartedEventResource(Resource):
             BuildInfo.from_resource(request.json, build_id)
         )
 
-        # store in Ceph
-        build_data['build_log'] = None
-        build_aggregator.store_build_data(build_data)
+        # store in Ceph asynchronously
+        job_id: Optional[int] = ingestion_pool.submit('build_started', {'build_doc': build_data})
 
-        return request_accepted(errors=validation_errors)
+        return request_accepted(payload={'job_id': job_id, 'duplicate': job_id is None}, errors=validation_errors)
 
 
 @api.route('/completed/build_schema/<string:build_id>')
@@ -381,10 +652,10 @@ class BuildCompletedResource(Resource):
         log_level: int = request.args.get('log_level', DEFAULT_OC_LOG_LEVEL)
 
         build_data: dict = request.json
-        validation_errors = _on_build_completed(
+        job_id, validation_errors = _on_build_completed(
             build_id, build_data, get_build_log=request.args.get('mode', 'remote') == 'cluster', log_level=log_level)
 
-        return request_accepted(errors=validation_errors)
+        return request_accepted(payload={'job_id': job_id, 'duplicate': job_id is None}, errors=validation_errors)
 
 
 @api.route('/completed/event_schema/<string:build_id>')
@@ -422,10 +693,10 @@ class BuildCompletedEventResource(Resource):
         )
 
         # TODO: handle validation errors
-        validation_errors = _on_build_completed(
+        job_id, validation_errors = _on_build_completed(
             build_id, build_data, get_build_log=request.args.get('mode', 'remote') == 'cluster', log_level=log_level)
 
-        return request_accepted(errors=validation_errors)
+        return request_accepted(payload={'job_id': job_id, 'duplicate': job_id is None}, errors=validation_errors)
 
 
 @api.route('/completed/<string:build_id>')
@@ -461,21 +732,123 @@ class BuildCompletedThothResource(Resource):
         )
 
         # TODO: handle validation errors
-        validation_errors = _on_build_completed(
+        job_id, validation_errors = _on_build_completed(
             build_id, build_data, get_build_log=request.args.get('mode', 'remote') == 'cluster', log_level=log_level)
 
-        return request_accepted(errors=validation_errors)
+        return request_accepted(payload={'job_id': job_id, 'duplicate': job_id is None}, errors=validation_errors)
+
+
+# batches
+
+BUILD_EVENT_SCHEMAS = ('build_schema', 'event_schema', 'thoth_schema')
+BUILD_EVENTS = ('started', 'completed')
+
+
+@api.route('/events:batch')
+class BuildEventsBatchResource(Resource):
+    """Receiver hook for batches of build events.
+
+    This endpoint expects a JSON array (or NDJSON stream, Content-Type application/x-ndjson)
+    of build events `{"schema": ..., "event": ..., "build_id": ..., "data": ...}`, where
+    `schema` is one of `build_schema`, `event_schema` and `thoth_schema`, `event` is either
+    `started` or `completed` and `data` is the build data as expected by the respective hook.
+    """
+
+    # noinspection PyMethodMayBeStatic
+    @api.response(code=HTTPStatus.ACCEPTED,
+                  description="Valid build events have been accepted."
+                              "Documents will be stored in Ceph",
+                  )
+    @api.response(code=HTTPStatus.BAD_REQUEST,
+                  description="Request could not be processed due to malformed"
+                              " or too large batch of build events."
+                  )
+    @api.param(name='mode', description="Build log gathering mode of completed builds (remote or cluster).")
+    @api.param(name='log_level', description="Log level of build logs gathered from the cluster.")
+    def post(self):  # pragma: no cover
+        """Trigger build hooks for a batch of build events."""
+        log_level: int = request.args.get('log_level', DEFAULT_OC_LOG_LEVEL)
+        get_build_log: bool = request.args.get('mode', 'remote') == 'cluster'
+
+        try:
+            events: List[dict] = _read_build_events()
+        except ValueError as exc:
+            return bad_request(errors={'events': str(exc)})
+
+        if len(events) > DEFAULT_MAX_BATCH_SIZE:
+            return bad_request(errors={
+                'events': f"Batch of {len(events)} build events exceeds the limit of {DEFAULT_MAX_BATCH_SIZE}."
+            })
+
+        # validate all events in one pass, share the schema and the client
+        build_schema = BuildInfoSchema()
+        kube_client = ApiClient()
+
+        results: List[dict] = []
+        jobs: List[Tuple[str, dict]] = []
+
+        for index, event in enumerate(events):
+            result = {'index': index, 'build_id': None, 'status': 'rejected', 'job_id': None, 'errors': {}}
+
+            try:
+                build_id, kind, payload, validation_errors = _prepare_build_event(
+                    event, build_schema, kube_client, get_build_log=get_build_log, log_level=log_level)
+            except (KeyError, TypeError, ValueError, ValidationError) as exc:
+                result['errors'] = {'event': str(exc) or exc.__class__.__name__}
+            else:
+                result.update(build_id=build_id, status='accepted', errors=validation_errors)
+
+                jobs.append((kind, payload))
+
+            results.append(result)
+
+        # enqueue all accepted events at once, ingestion workers store them concurrently
+        job_ids = iter(ingestion_pool.submit_many(jobs))
+
+        for result in results:
+            if result['status'] == 'accepted':
+                result['job_id'] = next(job_ids)
+
+                if result['job_id'] is None:
+                    # acknowledged without being stored again
+                    result['status'] = 'duplicate'
+
+        return request_accepted(payload={
+            'accepted': sum(result['status'] == 'accepted' for result in results),
+            'duplicate': sum(result['status'] == 'duplicate' for result in results),
+            'rejected': len(results) - len(jobs),
+            'results': results,
+        })
 
 
 def _on_build_completed(build_id: str,
                         build_data: dict,
                         get_build_log=False,
-                        log_level: int = DEFAULT_OC_LOG_LEVEL):
-    """Update Ceph build data.
+                        log_level: int = DEFAULT_OC_LOG_LEVEL) -> Tuple[Optional[int], dict]:
+    """Enqueue update of Ceph build data.
+
+    The build document is prepared within the request, gathering of the build log
+    and storing the document are left to the ingestion workers.
+
+    :returns: id of the ingestion job (None for duplicates)
+              and validation errors produced by BuildInfoSchema schema validation.
+    """
+    payload, validation_errors = _prepare_build_completed(
+        build_id, build_data, get_build_log=get_build_log, log_level=log_level)
+
+    job_id: Optional[int] = ingestion_pool.submit('build_completed', payload)
 
-    :returns: validation errors produced by BuildInfoSchema schema validation.
+    return job_id, validation_errors
+
+
+def _prepare_build_completed(build_id: str,
+                             build_data: dict,
+                             get_build_log=False,
+                             log_level: int = DEFAULT_OC_LOG_LEVEL) -> Tuple[dict, dict]:
+    """Prepare ingestion job payload of a completed build.
+
+    :returns: payload of the ingestion job and validation errors produced by BuildInfoSchema schema validation.
     """
-    # TODO: run all of the following ops asynchronously
     build_schema = BuildInfoSchema()
 
     build_info: BuildInfo
@@ -487,17 +860,114 @@ def _on_build_completed(build_id: str,
 
     build_doc, validation_errors = build_schema.dump(build_info)
 
+    payload = {
+        'build_doc': build_doc,
+        'get_build_log': get_build_log,
+        'log_level': log_level,
+    }
+
     if get_build_log:
-        # get build log from relevant pod (requires OpenShift authentication)
-        build_log: str = build_aggregator.get_build_log(
-            build_id,
-            namespace=build_info.ocp_info.namespace,
-            log_level=log_level
+        # build logs are gathered from the cluster, OpenShift information is required
+        payload['namespace'] = build_info.ocp_info.namespace
+
+    return payload, validation_errors
+
+
+def _read_build_events() -> List[dict]:
+    """Read build events from the request body, either a JSON array or NDJSON.
+
+    :raises ValueError: In case of malformed request body.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        events: List[dict] = []
+
+        for line_number, line in enumerate(request.stream, 1):
+            if not line.strip():
+                continue
+
+            try:
+                events.append(json.loads(line.decode('utf-8')))
+            except ValueError as exc:
+                raise ValueError(f"Malformed build event on line {line_number}: {exc}")
+
+        return events
+
+    events = request.get_json(force=True, silent=True)
+
+    if not isinstance(events, list):
+        raise ValueError("Expected JSON array or NDJSON stream of build events.")
+
+    return events
+
+
+def _prepare_build_event(event: dict,
+                         build_schema: BuildInfoSchema,
+                         kube_client: ApiClient,
+                         get_build_log=False,
+                         log_level: int = DEFAULT_OC_LOG_LEVEL) -> Tuple[str, str, dict, dict]:
+    """Validate build event of a batch and prepare its ingestion job.
+
+    :returns: build id, kind and payload of the ingestion job
+              and validation errors produced by BuildInfoSchema schema validation.
+    :raises ValueError: In case of invalid build event.
+    """
+    if not isinstance(event, dict):
+        raise ValueError("Build event must be an object.")
+
+    schema: str = event.get('schema', 'build_schema')
+    event_type: str = event.get('event')
+    build_id: Optional[str] = event.get('build_id')
+    data: dict = event.get('data')
+
+    if schema not in BUILD_EVENT_SCHEMAS:
+        raise ValueError(f"Unknown schema {schema!r}, expected one of {BUILD_EVENT_SCHEMAS}.")
+
+    if event_type not in BUILD_EVENTS:
+        raise ValueError(f"Unknown event {event_type!r}, expected one of {BUILD_EVENTS}.")
+
+    if not isinstance(data, dict):
+        raise ValueError("`data` field must be an object.")
+
+    validation_errors: dict
+
+    if schema == 'build_schema':
+        build_id = build_id or data.get('build_id')
+
+        if data.get('build_id', build_id) != build_id:
+            raise ValueError("`build_id` field does not match the build data.")
+
+        build_data = dict(data, build_id=build_id)
+        validation_errors = build_schema.validate(build_data)
+
+    elif schema == 'event_schema':
+        v1_event: V1Event = kube_client.deserialize(_JSONData(data), response_type='V1Event')
+        build_data, validation_errors = build_schema.dump(
+            BuildInfo.from_event(v1_event, build_id)
+        )
+
+    else:
+        build_data, validation_errors = build_schema.dump(
+            BuildInfo.from_resource(data, build_id)
         )
 
-        build_doc['build_log'] = build_log
+    build_id = build_data.get('build_id')
+
+    if not build_id:
+        raise ValueError("Missing build identification.")
+
+    if event_type == 'started':
+        return build_id, 'build_started', {'build_doc': build_data}, validation_errors
+
+    payload, completed_errors = _prepare_build_completed(
+        build_id, build_data, get_build_log=get_build_log, log_level=log_level)
+
+    validation_errors.update(completed_errors)
+
+    return build_id, 'build_completed', payload, validation_errors
+
 
-    # store in Ceph
-    build_aggregator.store_build_data(build_doc)
+class _JSONData(object):
+    """Response-like wrapper of JSON data to be deserialized by kubernetes ApiClient."""
 
-    return validation_errors
+    def __init__(self, data: dict):
+        self.data = json.dumps(data)
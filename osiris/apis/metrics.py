@@ -0,0 +1,28 @@
+# Osiris: Build log aggregator.
+
+"""Namespace: metrics."""
+
+from http import HTTPStatus
+
+from flask_restplus import Namespace
+from flask_restplus import Resource
+
+from osiris.metrics import collect_metrics
+
+from osiris.response import request_ok
+
+api = Namespace(name='metrics', description="Namespace for runtime metrics.")
+
+
+@api.route('/')
+class MetricsResource(Resource):
+    """Runtime metrics (ingestion queue depth, ...)."""
+
+    # noinspection PyMethodMayBeStatic
+    @api.doc(responses={
+        s.value: s.description for s in [
+            HTTPStatus.OK,
+        ]})
+    def get(self):  # pragma: no cover
+        """Get current values of runtime metrics."""
+        return request_ok(payload=collect_metrics())
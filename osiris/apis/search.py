@@ -0,0 +1,174 @@
+# Osiris: Build log aggregator.
+
+"""Namespace: search."""
+
+import time
+
+from http import HTTPStatus
+from typing import Dict, List, Optional
+
+from flask import request
+
+from flask_restplus import Namespace
+from flask_restplus import Resource
+
+from osiris.aggregator import build_aggregator
+from osiris.response import bad_request
+from osiris.response import request_ok
+from osiris.response import request_unavailable
+from osiris.search import SORT_FIELDS, TIME_FIELDS, parse_timestamp
+
+from osiris.schema.build import BuildInfoPagination
+
+
+api = Namespace(name='search', description="Namespace for build information and build log search.", path='/build')
+
+
+def _get_time(name: str) -> Optional[float]:
+    """Get time given by query parameter as seconds since the epoch.
+
+    The time is given either as seconds since the epoch, seconds ago
+    (negative number) or date time in the format build timestamps are stored in.
+
+    :raises ValueError: In case of malformed time.
+    """
+    value: Optional[str] = request.args.get(name)
+    if not value:
+        return None
+
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = parse_timestamp(value)
+
+        if seconds is None:
+            raise ValueError(f"Invalid time {value!r} of parameter {name!r}")
+
+    return time.time() + seconds if seconds < 0 else seconds
+
+
+@api.route('/search')
+class BuildSearchResource(Resource):
+    """Build information search endpoint."""
+
+    # noinspection PyMethodMayBeStatic
+    @api.param(name='namespace', description="Namespace the builds have run in.")
+    @api.param(name='status', description="Comma separated build statuses, any of them matches.")
+    @api.param(name='since', description="Match builds since the given time, either seconds since the epoch,"
+                                         " seconds ago (negative number) or date time.")
+    @api.param(name='until', description="Match builds before the given time, the same format as `since`.")
+    @api.param(name='time_field', description=f"Timestamp `since` and `until` apply to,"
+                                              f" one of {', '.join(TIME_FIELDS)} (default last_timestamp).")
+    @api.param(name='sort', description=f"Field to sort by, one of {', '.join(SORT_FIELDS)},"
+                                        f" prefixed by `-` for descending order (default -last_timestamp).")
+    @api.param(name='page', description="Page number (default 1).")
+    @api.param(name='per_page', description="Number of results per page "
+                                            f"(default {BuildInfoPagination.RESULTS_PER_PAGE}, "
+                                            f"max {BuildInfoPagination.MAX_RESULTS_PER_PAGE}).")
+    @api.response(code=HTTPStatus.OK,
+                  description="Build information of the matching builds. The search is served by the local index"
+                              " of the instance, builds stored by other instances are found once it is reconciled.",
+                  )
+    @api.response(code=HTTPStatus.BAD_REQUEST,
+                  description="Malformed filter or unsupported field.",
+                  )
+    def get(self):
+        """Search build information by namespace, status and time.
+
+        The search is served by the local index of build information, builds stored
+        by other instances are found once the index has been reconciled.
+        """
+        page: int = max(request.args.get('page', 1, type=int), 1)
+        per_page: int = min(
+            max(request.args.get('per_page', BuildInfoPagination.RESULTS_PER_PAGE, type=int), 1),
+            BuildInfoPagination.MAX_RESULTS_PER_PAGE
+        )
+
+        sort: str = request.args.get('sort', '-last_timestamp')
+        statuses: List[str] = [status.strip() for status in request.args.get('status', '').split(',')
+                               if status.strip()]
+
+        try:
+            total, build_info = build_aggregator.search_index.search(
+                namespace=request.args.get('namespace') or None,
+                statuses=statuses,
+                since=_get_time('since'),
+                until=_get_time('until'),
+                time_field=request.args.get('time_field', 'last_timestamp'),
+                sort=sort.lstrip('-'),
+                descending=sort.startswith('-'),
+                limit=per_page,
+                offset=(page - 1) * per_page,
+            )
+        except ValueError as exc:
+            return bad_request(errors={'search': str(exc)})
+
+        return request_ok(payload={
+            'build_info': build_info,
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'has_next': page * per_page < total,
+        })
+
+
+@api.route('/logs/search')
+class BuildLogSearchResource(Resource):
+    """Build log full-text search endpoint."""
+
+    # noinspection PyMethodMayBeStatic
+    @api.param(name='q', description="Words to search for, matching lines contain all of them in the given order.")
+    @api.param(name='limit', description="Maximum number of builds returned "
+                                         f"(default {BuildInfoPagination.MAX_RESULTS_PER_PAGE}).")
+    @api.param(name='max_lines', description="Maximum number of line numbers returned per build (default 10).")
+    @api.response(code=HTTPStatus.OK,
+                  description="Builds whose build logs match the query along with the matching line numbers,"
+                              " recently stored build logs first. `truncated` is set if the search has been"
+                              " stopped early due to the limit or the time bound.",
+                  )
+    @api.response(code=HTTPStatus.BAD_REQUEST,
+                  description="Missing or malformed query.",
+                  )
+    @api.response(code=HTTPStatus.SERVICE_UNAVAILABLE,
+                  description="Build log search is disabled.",
+                  )
+    def get(self):
+        """Search stored build logs for lines containing the given words.
+
+        The search is served by the local full-text index of build logs stored by this instance.
+        """
+        if build_aggregator.log_search is None:
+            return request_unavailable(errors={'search': "Build log search is disabled."})
+
+        query: str = request.args.get('q', '').strip()
+        if not query:
+            return bad_request(errors={'q': "Query is required."})
+
+        try:
+            results, truncated = build_aggregator.log_search.search(
+                query,
+                limit=min(max(request.args.get('limit', BuildInfoPagination.MAX_RESULTS_PER_PAGE, type=int), 1),
+                          BuildInfoPagination.MAX_RESULTS_PER_PAGE),
+                max_lines=max(request.args.get('max_lines', 10, type=int), 1),
+            )
+        except ValueError as exc:
+            return bad_request(errors={'q': str(exc)})
+
+        build_ids: Dict[str, str] = build_aggregator.search_index.get_build_ids(
+            [result['document_id'] for result in results])
+
+        # build information is indexed after the build log, it might not have been indexed yet
+        missing: List[str] = [result['document_id'] for result in results if result['document_id'] not in build_ids]
+        for fetched in build_aggregator.fetch_documents(missing):
+            if fetched.ok:
+                build_ids[fetched.key] = fetched.value['build_id']
+
+        return request_ok(payload={
+            'query': query,
+            'builds': [
+                {'build_id': build_ids[result['document_id']], 'lines': result['lines'],
+                 'match_count': result['match_count']}
+                for result in results if result['document_id'] in build_ids
+            ],
+            'truncated': truncated,
+        })
@@ -0,0 +1,48 @@
+# Osiris: Build log aggregator.
+
+"""Namespace: summary."""
+
+from http import HTTPStatus
+from typing import Optional
+
+from flask_restplus import Namespace
+from flask_restplus import Resource
+
+from osiris.aggregator import build_aggregator
+from osiris.response import request_not_found
+from osiris.response import request_ok
+
+from thoth.storages.exceptions import NotFoundError
+
+
+api = Namespace(name='summary', description="Namespace for build log summaries.", path='/build')
+
+
+@api.route('/summary/<string:build_id>')
+@api.param('build_id', 'Unique build identification.')
+class BuildLogSummaryResource(Resource):
+    """Build log summary endpoint."""
+
+    # noinspection PyMethodMayBeStatic
+    @api.response(code=HTTPStatus.OK,
+                  description="Summary extracted from the build log when it has been stored: size, line count"
+                              " and checksum of the build log, steps run, packages installed, files downloaded,"
+                              " the image pushed and the errors the build has failed with (with line numbers).",
+                  )
+    @api.response(code=HTTPStatus.NOT_FOUND,
+                  description="Build does not exist or its build log has been stored without the summary.",
+                  )
+    def get(self, build_id):
+        """Return summary of the build log of the given build."""
+        try:
+            summary: Optional[dict] = build_aggregator.retrieve_build_log_summary(build_id)
+        except NotFoundError as exc:
+            return request_not_found(errors={'BuildNotFound': str(exc)})
+
+        if summary is None:
+            return request_not_found(errors={
+                'SummaryNotFound': "Build log has not been stored or it has been stored without the summary, "
+                                   "see `python -m osiris.migrate summarize-logs`."
+            })
+
+        return request_ok(payload={'build_id': build_id, 'summary': summary})
@@ -0,0 +1,182 @@
+# Osiris: Build log aggregator.
+
+"""Namespace: upload."""
+
+import shutil
+import tempfile
+
+from functools import partial
+from http import HTTPStatus
+from typing import List, Optional
+
+from flask import request
+from flask import url_for
+
+from flask_restplus import Namespace
+from flask_restplus import Resource
+
+from osiris import DEFAULT_LOG_CHUNK_SIZE
+from osiris import DEFAULT_UPLOAD_PART_SIZE
+from osiris.aggregator import build_aggregator
+from osiris.apis.build import check_build_log_upload
+from osiris.response import request_created
+from osiris.response import request_not_found
+from osiris.response import request_ok
+from osiris.response import bad_request
+
+from thoth.storages.exceptions import NotFoundError
+
+
+api = Namespace(name='upload', description="Namespace for build log upload sessions.", path='/build/logs')
+
+
+@api.route('/<string:build_id>/uploads')
+@api.param('build_id', 'Unique build identification.')
+class BuildLogUploadsResource(Resource):
+    """Build log upload sessions endpoint."""
+
+    # noinspection PyMethodMayBeStatic
+    @api.param(name='force', description="Overwrite existing logs (default 1).")
+    @api.response(code=HTTPStatus.CREATED,
+                  description="Upload session has been initiated, parts of the build log"
+                              " can be uploaded to the returned location.",
+                  )
+    @api.response(code=HTTPStatus.BAD_REQUEST,
+                  description="Build log exists already or the build has not been completed yet."
+                  )
+    def post(self, build_id):
+        """Initiate upload session of build log of the given build.
+
+        Parts of the build log are uploaded as numbered plain text chunks, possibly in parallel.
+        All of the parts except for the last one have to be at least 5 MiB large.
+        """
+        errors: Optional[dict] = check_build_log_upload(
+            build_id, build_aggregator.retrieve_build_metadata(build_id))
+
+        if errors:
+            return bad_request(errors=errors)
+
+        session_id: str = build_aggregator.uploads.initiate(build_aggregator.get_build_document_id(build_id))
+
+        return request_created(payload={
+            'session_id': session_id,
+            'location': url_for('upload_build_log_upload_resource', build_id=build_id, session_id=session_id,
+                                _external=True),
+            'min_part_size': 5 * 1024 * 1024,
+            'max_parts': build_aggregator.uploads.MAX_PARTS,
+        })
+
+
+@api.route('/<string:build_id>/uploads/<string:session_id>')
+@api.param('build_id', 'Unique build identification.')
+@api.param('session_id', 'Upload session identification.')
+class BuildLogUploadResource(Resource):
+    """Build log upload session endpoint."""
+
+    # noinspection PyMethodMayBeStatic
+    @api.response(code=HTTPStatus.OK,
+                  description="Parts uploaded so far, missing parts are to be (re-)uploaded.",
+                  )
+    @api.response(code=HTTPStatus.NOT_FOUND,
+                  description="Upload session does not exist.",
+                  )
+    def get(self, build_id, session_id):
+        """List parts of the build log uploaded so far."""
+        try:
+            parts: List[dict] = build_aggregator.uploads.list_parts(
+                build_aggregator.get_build_document_id(build_id), session_id)
+        except NotFoundError as exc:
+            return request_not_found(errors={'UploadSessionNotFound': str(exc)})
+
+        return request_ok(payload={'session_id': session_id, 'parts': parts})
+
+    # noinspection PyMethodMayBeStatic
+    @api.param(name='force', description="Overwrite existing logs (default 1).")
+    @api.response(code=HTTPStatus.OK,
+                  description="Build log has been assembled and stored in Ceph.",
+                  )
+    @api.response(code=HTTPStatus.BAD_REQUEST,
+                  description="Build log could not be assembled or is not valid UTF-8.",
+                  )
+    @api.response(code=HTTPStatus.NOT_FOUND,
+                  description="Upload session does not exist.",
+                  )
+    def post(self, build_id, session_id):
+        """Complete the upload session and store the assembled build log.
+
+        The session is consumed even if the assembled build log turns out to be invalid.
+        """
+        metadata: Optional[dict] = build_aggregator.retrieve_build_metadata(build_id)
+
+        errors: Optional[dict] = check_build_log_upload(build_id, metadata)
+
+        if errors:
+            return bad_request(errors=errors)
+
+        document_id: str = build_aggregator.get_build_document_id(build_id)
+
+        try:
+            build_log_object: dict = build_aggregator.uploads.complete(
+                document_id, session_id,
+                partial(build_aggregator.logs.store_build_log_stream, document_id, metadata={'build_id': build_id})
+            )
+        except NotFoundError as exc:
+            return request_not_found(errors={'UploadSessionNotFound': str(exc)})
+        except ValueError as exc:  # UnicodeDecodeError included
+            return bad_request(errors={'InvalidBuildLog': str(exc)})
+
+        build_aggregator.attach_build_log(build_id, build_log_object=build_log_object)
+
+        return request_ok()
+
+    # noinspection PyMethodMayBeStatic
+    @api.response(code=HTTPStatus.OK,
+                  description="Upload session has been aborted.",
+                  )
+    @api.response(code=HTTPStatus.NOT_FOUND,
+                  description="Upload session does not exist.",
+                  )
+    def delete(self, build_id, session_id):
+        """Abort the upload session, the uploaded parts are discarded."""
+        try:
+            build_aggregator.uploads.abort(build_aggregator.get_build_document_id(build_id), session_id)
+        except NotFoundError as exc:
+            return request_not_found(errors={'UploadSessionNotFound': str(exc)})
+
+        return request_ok()
+
+
+@api.route('/<string:build_id>/uploads/<string:session_id>/parts/<int:part_number>')
+@api.param('build_id', 'Unique build identification.')
+@api.param('session_id', 'Upload session identification.')
+@api.param('part_number', 'Number of the part, parts are assembled in the order of their numbers.')
+class BuildLogUploadPartResource(Resource):
+    """Build log upload session part endpoint."""
+
+    # noinspection PyMethodMayBeStatic
+    @api.response(code=HTTPStatus.OK,
+                  description="Part has been uploaded, ETag of the part is returned.",
+                  )
+    @api.response(code=HTTPStatus.BAD_REQUEST,
+                  description="Part number is out of the range.",
+                  )
+    @api.response(code=HTTPStatus.NOT_FOUND,
+                  description="Upload session does not exist.",
+                  )
+    @api.doc(consumes=['text/plain'])
+    def put(self, build_id, session_id, part_number):
+        """Upload part of the build log as plain text request body, replacing the part uploaded before."""
+        # spooled, so that failed uploads to Ceph can be retried
+        with tempfile.SpooledTemporaryFile(max_size=DEFAULT_UPLOAD_PART_SIZE) as body:
+            shutil.copyfileobj(request.stream, body, DEFAULT_LOG_CHUNK_SIZE)
+            body.seek(0)
+
+            try:
+                etag: str = build_aggregator.uploads.upload_part(
+                    build_aggregator.get_build_document_id(build_id), session_id, part_number, body)
+            except NotFoundError as exc:
+                return request_not_found(errors={'UploadSessionNotFound': str(exc)})
+            except ValueError as exc:
+                return bad_request(errors={'InvalidPartNumber': str(exc)})
+
+        return request_ok(payload={'part_number': part_number, 'etag': etag})
@@ -0,0 +1,75 @@
+# Osiris: Build log aggregator.
+
+"""Bloom filter of stored build information documents."""
+
+import math
+import threading
+
+from typing import Iterable, List, Optional
+
+
+class BloomFilter(object):
+    """Bloom filter of document ids.
+
+    Document ids are hex digests already, so the bit positions are taken
+    from the id itself instead of being hashed again. Negative answers
+    are reliable only once the filter has been populated with all of the
+    stored ids and only if all of the writes go through this process.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """Initialize BloomFilter."""
+        self.size: int = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        # each position is taken from 8 hex digits of the id
+        self.hash_count: int = min(max(round(self.size / capacity * math.log(2)), 1), 8)
+
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+
+        # ids added while the filter is being populated
+        self._added: Optional[List[str]] = None
+
+        self.populated = False
+
+    def _positions(self, document_id: str) -> Iterable[int]:
+        for i in range(self.hash_count):
+            yield int(document_id[i * 8:(i + 1) * 8], 16) % self.size
+
+    def _set(self, bits: bytearray, document_id: str):
+        for position in self._positions(document_id):
+            bits[position // 8] |= 1 << position % 8
+
+    def add(self, document_id: str):
+        """Add document id to the filter."""
+        with self._lock:
+            self._set(self._bits, document_id)
+
+            if self._added is not None:
+                self._added.append(document_id)
+
+    def populate(self, document_ids: Iterable[str]):
+        """Replace content of the filter with the given document ids."""
+        with self._lock:
+            self._added = []
+
+        bits = bytearray(len(self._bits))
+
+        for document_id in document_ids:
+            self._set(bits, document_id)
+
+        with self._lock:
+            for document_id in self._added:
+                self._set(bits, document_id)
+
+            self._bits = bits
+            self._added = None
+
+            self.populated = True
+
+    def __contains__(self, document_id: str) -> bool:
+        """Check whether the document id might have been added, always true until populated."""
+        if not self.populated:
+            return True
+
+        bits = self._bits
+        return all(bits[position // 8] & 1 << position % 8 for position in self._positions(document_id))
@@ -0,0 +1,243 @@
+# Osiris: Build log aggregator.
+
+"""Write-behind buffer of build information updates.
+
+Updates of a build arriving within the window are merged and written once.
+Build phases are ranked, so that an update of an older phase never overwrites
+a newer one, neither in the buffer nor once the newer one has been stored
+(see `merge_stored_build_doc`, the stored document is the source of truth).
+Updates of finished builds are written immediately (by the submitting thread),
+so only intermediate phases, which are superseded anyway, are ever delayed.
+Submitters are given futures resolved once their updates have been written,
+updates are not durable until then.
+"""
+
+import atexit
+import logging
+import re
+import threading
+import time
+import zlib
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from osiris import DEFAULT_WRITE_BEHIND_WINDOW
+
+from osiris.metrics import Counter
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# Unknown status is not ranked, so that any known status replaces it
+STATUS_RANKS = [
+    (re.compile(r"complete|fail|error|cancel", re.IGNORECASE), 3),
+    (re.compile(r"running|started", re.IGNORECASE), 2),
+    (re.compile(r"pending", re.IGNORECASE), 1),
+]
+TERMINAL_RANK = 3
+
+
+def get_status_rank(build_status: Optional[str]) -> int:
+    """Return rank of the build status, statuses of later build phases are ranked higher."""
+    for pattern, rank in STATUS_RANKS:
+        if build_status and pattern.search(build_status):
+            return rank
+
+    return 0
+
+
+def merge_build_docs(current: dict, update: dict) -> dict:
+    """Merge update into the current build document.
+
+    The document of the later build phase (the update if the phases match) takes precedence,
+    fields missing in it are taken from the other document.
+    """
+    if get_status_rank(update.get('build_status')) >= get_status_rank(current.get('build_status')):
+        base, overlay = current, update
+    else:
+        base, overlay = update, current
+
+    merged = dict(base)
+    merged.update({field: value for field, value in overlay.items() if value is not None})
+
+    return merged
+
+
+def merge_stored_build_doc(stored: Optional[dict], update: dict) -> dict:
+    """Merge update into the stored build document (None if there is none).
+
+    Fields are merged by `merge_build_docs`, so that an update of an earlier build phase
+    never overwrites the stored status of a later one. Build log referenced by the update
+    replaces the stored one whatever the phase is, embedded build logs are dropped then.
+    Documents created by updates without any build status (i.e. build logs attached
+    before the build information is stored) are created with the Unknown one.
+    """
+    if stored is None:
+        stored = {'build_status': 'Unknown'} if update.get('build_status') is None else {}
+
+    merged: dict = merge_build_docs(stored, update)
+
+    if update.get('build_log_object') is not None:
+        merged['build_log_object'] = update['build_log_object']
+
+    if merged.get('build_log_object') is not None:
+        merged.pop('build_log', None)
+
+    return merged
+
+
+class _PendingWrite(object):
+    """Merged build document waiting to be written along with futures of the merged updates."""
+
+    def __init__(self, build_doc: dict, deadline: float):
+        self.build_doc = build_doc
+        self.deadline = deadline
+        self.futures: List[Future] = []
+
+
+class WriteBehindBuffer(object):
+    """Buffer merging build information updates keyed by build id.
+
+    Each submitted update is given a future resolved once the update (merged with others)
+    has been written, so that the submitter can acknowledge it only then. Writes batched
+    by the writer itself are completed by `after_flush`, called by each background flush.
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(self,
+                 write: Callable[[dict], None],
+                 window: float = DEFAULT_WRITE_BEHIND_WINDOW,
+                 after_flush: Callable[[], None] = None):
+        """Initialize WriteBehindBuffer."""
+        self.write = write
+        self.window = window
+        self.after_flush = after_flush
+
+        self.stats = Counter('submitted', 'written', 'coalesced', 'failed')
+
+        self._lock = threading.Lock()
+        # writes of a single build are serialized, so that they are stored in order
+        self._write_locks: List[threading.Lock] = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+
+        self._pending: Dict[str, _PendingWrite] = OrderedDict()
+
+        self._flusher: Optional[threading.Thread] = None
+
+    def submit(self, build_doc: dict) -> Future:
+        """Submit update of the build information.
+
+        :raises Exception: In case the update of a finished build could not be written.
+        :returns: future resolved once the update has been written, failed if the write fails
+            (the update is kept pending and retried anyway).
+        """
+        build_id: str = build_doc['build_id']
+        rank: int = get_status_rank(build_doc.get('build_status'))
+
+        future: Future = Future()
+
+        self.stats.inc('submitted')
+
+        with self._lock:
+            pending: Optional[_PendingWrite] = self._pending.get(build_id)
+
+            if pending is not None:
+                pending.build_doc = merge_build_docs(pending.build_doc, build_doc)
+                self.stats.inc('coalesced')
+            else:
+                pending = self._pending[build_id] = _PendingWrite(
+                    dict(build_doc), deadline=time.monotonic() + self.window)
+
+            pending.futures.append(future)
+
+            self._start_flusher()
+
+        if rank >= TERMINAL_RANK or self.window <= 0:
+            self.flush(build_id)
+
+        return future
+
+    def flush(self, build_id: str):
+        """Write pending update of the given build.
+
+        :raises Exception: In case the update could not be written, it is kept pending.
+        """
+        with self._write_locks[zlib.crc32(build_id.encode('utf-8')) % self.LOCK_STRIPES]:
+            with self._lock:
+                pending: Optional[_PendingWrite] = self._pending.pop(build_id, None)
+
+            if pending is None:
+                return
+
+            futures, pending.futures = pending.futures, []
+
+            try:
+                self.write(pending.build_doc)
+            except Exception as exc:
+                with self._lock:
+                    # keep it pending, merged with updates submitted in the meantime
+                    newer: Optional[_PendingWrite] = self._pending.get(build_id)
+                    if newer is not None:
+                        pending.build_doc = merge_build_docs(pending.build_doc, newer.build_doc)
+                        pending.futures = newer.futures
+
+                    self._pending[build_id] = pending
+
+                self.stats.inc('failed')
+
+                for future in futures:
+                    future.set_exception(exc)
+
+                raise
+
+            self.stats.inc('written')
+
+            for future in futures:
+                future.set_result(None)
+
+    def flush_due(self, force: bool = False):
+        """Write pending updates whose window has elapsed, all of them if forced."""
+        now = time.monotonic()
+
+        with self._lock:
+            build_ids = [build_id for build_id, pending in self._pending.items() if force or pending.deadline <= now]
+
+        for build_id in build_ids:
+            # noinspection PyBroadException
+            try:
+                self.flush(build_id)
+            except Exception as exc:
+                _LOGGER.warning("Failed to write build information of %r, will be retried: %s", build_id, exc)
+
+                with self._lock:
+                    if build_id in self._pending:
+                        self._pending[build_id].deadline = now + self.window
+
+        if self.after_flush is not None:
+            # noinspection PyBroadException
+            try:
+                self.after_flush()
+            except Exception as exc:
+                _LOGGER.warning("Failed to complete batched writes, will be retried: %s", exc)
+
+    def pending(self) -> int:
+        """Return number of builds with pending updates."""
+        return len(self._pending)
+
+    def _start_flusher(self):
+        """Start background flushing of pending updates, flush them on exit as well."""
+        if self._flusher is not None:
+            return
+
+        def _flush():
+            while True:
+                time.sleep(min(self.window, 1.0) or 1.0)
+
+                self.flush_due()
+
+        self._flusher = threading.Thread(target=_flush, name='write-behind', daemon=True)
+        self._flusher.start()
+
+        atexit.register(self.flush_due, force=True)
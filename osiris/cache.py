@@ -0,0 +1,180 @@
+# Osiris: Build log aggregator.
+
+"""Size bounded cache of objects retrieved from Ceph.
+
+Cached objects are revalidated by a conditional GET (`If-None-Match`) on each
+access, so that changes made by other instances are picked up; the object is
+transferred and parsed again only if it has changed. Missing objects are cached
+for a short time without revalidation, local writes invalidate their entries.
+Concurrent retrievals of the same object share a single request.
+"""
+
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from thoth.storages.exceptions import NotFoundError
+
+from osiris import DEFAULT_CACHE_NOT_FOUND_TTL
+from osiris import DEFAULT_CACHE_SIZE
+
+from osiris.metrics import Counter
+from osiris.singleflight import SingleFlight
+
+
+# approximate memory taken by an entry apart from its value
+_ENTRY_OVERHEAD = 256
+
+
+class _Entry(object):
+    """Cached value of an object, `etag` is None for missing objects."""
+
+    __slots__ = ('value', 'etag', 'size', 'expires')
+
+    def __init__(self, value: Any, etag: Optional[str], size: int, expires: float = None):
+        self.value = value
+        self.etag = etag
+        self.size = size + _ENTRY_OVERHEAD
+        self.expires = expires
+
+
+class ObjectCache(object):
+    """LRU cache of parsed objects bounded by their size in bytes.
+
+    Objects larger than a tenth of the cache are not cached at all,
+    so that a single build log does not evict everything else.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE, not_found_ttl: float = DEFAULT_CACHE_NOT_FOUND_TTL):
+        """Initialize ObjectCache."""
+        self.max_size = max_size
+        self.not_found_ttl = not_found_ttl
+
+        self.stats = Counter('hits', 'misses', 'not_found_hits', 'evictions')
+        self.flights = SingleFlight()
+
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = OrderedDict()
+        self._size = 0
+
+        # incremented by each invalidation, entries retrieved before are not stored
+        self._generation = 0
+
+    def retrieve(self,
+                 obj,
+                 parse: Callable[[bytes], Any],
+                 weigh: Callable[[Any], int] = None,
+                 if_none_match: str = None) -> Tuple[Any, str]:
+        """Retrieve the object parsed by `parse`, cached value is returned if the object has not changed.
+
+        The cached value is shared, it must not be modified.
+
+        :param obj: boto3 Object resource.
+        :param weigh: size of the parsed value, size of the object is used by default.
+        :param if_none_match: ETag of the object version the caller has already, the object
+                              is not transferred if it matches; the returned value is None
+                              in that case unless it is cached.
+        :raises NotFoundError: In case the object does not exist.
+        :returns: the parsed value and ETag of the object.
+        """
+        return self.flights.do((obj.key, if_none_match), lambda: self._retrieve(obj, parse, weigh, if_none_match))
+
+    def _retrieve(self, obj, parse: Callable[[bytes], Any], weigh: Optional[Callable[[Any], int]],
+                  if_none_match: Optional[str]) -> Tuple[Any, str]:
+        key: str = obj.key
+
+        with self._lock:
+            entry: Optional[_Entry] = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+            generation: int = self._generation
+
+        etag: Optional[str] = if_none_match
+
+        if entry is not None and entry.etag is None:
+            if entry.expires > time.monotonic():
+                self.stats.inc('not_found_hits')
+
+                raise NotFoundError(f"Failed to retrieve object, object {key!r} does not exist")
+        elif entry is not None:
+            etag = entry.etag
+
+        try:
+            response: dict = obj.get(IfNoneMatch=etag) if etag else obj.get()
+        except ClientError as exc:
+            code: str = exc.response['Error']['Code']
+
+            if code in ('304', 'NotModified'):
+                self.stats.inc('hits')
+
+                return (entry.value if entry is not None and entry.etag == etag else None), etag
+
+            if code in ('404', 'NoSuchKey'):
+                self.stats.inc('misses')
+                self._store(key, _Entry(None, None, len(key), time.monotonic() + self.not_found_ttl), generation)
+
+                raise NotFoundError(f"Failed to retrieve object, object {key!r} does not exist") from exc
+
+            raise
+
+        self.stats.inc('misses')
+
+        blob: bytes = response['Body'].read()
+        value: Any = parse(blob)
+
+        self._store(key, _Entry(value, response['ETag'], weigh(value) if weigh else len(blob)), generation)
+
+        return value, response['ETag']
+
+    def invalidate(self, key: str):
+        """Invalidate entry of the given object key."""
+        with self._lock:
+            self._generation += 1
+
+            entry: Optional[_Entry] = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= entry.size
+
+    def clear(self):
+        """Invalidate all of the entries."""
+        with self._lock:
+            self._generation += 1
+
+            self._entries.clear()
+            self._size = 0
+
+    def info(self) -> dict:
+        """Return statistics of the cache."""
+        return dict(
+            self.stats.to_dict(),
+            hit_rate=self.stats.ratio('hits', 'hits', 'misses'),
+            entries=len(self._entries),
+            size=self._size,
+            max_size=self.max_size,
+        )
+
+    def _store(self, key: str, entry: _Entry, generation: int):
+        if entry.size > self.max_size // 10:
+            return
+
+        with self._lock:
+            if generation != self._generation:
+                return  # invalidated in the meantime, the entry might be stale
+
+            previous: Optional[_Entry] = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous.size
+
+            self._entries[key] = entry
+            self._size += entry.size
+
+            while self._size > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size
+
+                self.stats.inc('evictions')
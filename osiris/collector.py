@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# Osiris: Build log aggregator.
+
+"""Watch based collector of OpenShift builds.
+
+The collector is an alternative to build hooks, it watches `Build` resources
+in the configured namespaces and feeds them to the ingestion queue.
+The last seen resource version is persisted, so that no build events are
+missed between restarts, and build phase changes are debounced, so that
+a build produces few writes. Terminal phases are flushed immediately.
+Builds listed when the watch can not be resumed are fed only if they have
+not been stored in their current (or a terminal) phase already.
+
+Usage:
+
+    python -m osiris.collector [--namespace NAMESPACE ...]
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from kubernetes.client.rest import ApiException
+
+from osiris import DEFAULT_API_URL
+from osiris import DEFAULT_COLLECTOR_DEBOUNCE
+from osiris import DEFAULT_COLLECTOR_NAMESPACES
+from osiris import DEFAULT_COLLECTOR_WATCH_TIMEOUT
+from osiris import DEFAULT_DATA_DIR
+from osiris import DEFAULT_LOG_LEVEL
+from osiris import DEFAULT_OC_LOG_LEVEL
+from osiris import DEFAULT_OC_PROJECT
+from osiris import get_oc_client
+
+from osiris.schema.build import BuildInfo, BuildInfoSchema
+
+
+_LOGGER = logging.getLogger(__name__)
+
+TERMINAL_PHASES = ('Complete', 'Failed', 'Error', 'Cancelled')
+
+
+class ResourceVersionStore(object):
+    """Resource versions the watch of each namespace can be resumed from, persisted in a JSON file."""
+
+    def __init__(self, path: str):
+        """Initialize ResourceVersionStore."""
+        self.path = path
+
+        self._lock = threading.Lock()
+
+        try:
+            with open(path) as f:
+                self._versions: Dict[str, str] = json.load(f)
+        except FileNotFoundError:
+            self._versions = {}
+
+    def get(self, namespace: str) -> Optional[str]:
+        """Return resource version to resume the watch of the given namespace from."""
+        return self._versions.get(namespace)
+
+    def set(self, namespace: str, resource_version: Optional[str]):
+        """Persist resource version of the given namespace."""
+        with self._lock:
+            if self._versions.get(namespace) == resource_version:
+                return
+
+            self._versions[namespace] = resource_version
+
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+            # write atomically, partially written file would lose all of the versions
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._versions, f)
+
+            os.replace(tmp_path, self.path)
+
+
+class _PendingBuild(object):
+    """Latest state of a build waiting to be flushed."""
+
+    def __init__(self, resource: dict, deadline: float, checkpoint: Optional[str]):
+        self.resource = resource
+        self.deadline = deadline
+
+        # resource version preceding the first buffered event of the build
+        self.checkpoint = checkpoint
+
+
+class BuildEventDebouncer(object):
+    """Collapse build events arriving within a window into a single flush of the latest build state.
+
+    Resource versions are opaque, they are never compared. The persisted version
+    of a namespace is the one preceding the oldest build event that has not been
+    flushed yet, so that resuming the watch never skips an unflushed event.
+    """
+
+    def __init__(self,
+                 flush: Callable[[dict], None],
+                 checkpoints: ResourceVersionStore,
+                 window: float = DEFAULT_COLLECTOR_DEBOUNCE):
+        """Initialize BuildEventDebouncer."""
+        self.flush = flush
+        self.checkpoints = checkpoints
+        self.window = window
+
+        self._lock = threading.RLock()
+
+        self._pending: Dict[Tuple[str, str], _PendingBuild] = OrderedDict()
+        self._latest: Dict[str, Optional[str]] = {}
+
+    def push(self, namespace: str, resource: dict, resource_version: Optional[str]):
+        """Buffer build resource received from the watch of the given namespace."""
+        key = (namespace, resource['metadata']['name'])
+
+        with self._lock:
+            pending = self._pending.get(key)
+
+            if pending is None:
+                self._pending[key] = _PendingBuild(
+                    resource,
+                    deadline=time.monotonic() + self.window,
+                    checkpoint=self._latest.get(namespace, self.checkpoints.get(namespace))
+                )
+            else:
+                # events of a single watch are ordered, the latest state wins
+                pending.resource = resource
+
+            self._latest[namespace] = resource_version
+
+            if resource.get('status', {}).get('phase') in TERMINAL_PHASES:
+                self._flush([key])
+
+    def advance(self, namespace: str, resource_version: str):
+        """Record resource version of an event which has not been buffered."""
+        with self._lock:
+            self._latest[namespace] = resource_version
+
+            self._checkpoint(namespace)
+
+    def flush_due(self, force: bool = False):
+        """Flush builds whose window has elapsed, all of them if forced."""
+        now = time.monotonic()
+
+        with self._lock:
+            self._flush([key for key, pending in self._pending.items() if force or pending.deadline <= now])
+
+    def _flush(self, keys: List[Tuple[str, str]]):
+        """Flush the given builds and persist resource versions of the affected namespaces."""
+        for key in keys:
+            # noinspection PyBroadException
+            try:
+                self.flush(self._pending[key].resource)
+            except Exception:
+                _LOGGER.exception("Failed to flush build %s/%s, will be retried", *key)
+            else:
+                del self._pending[key]
+
+        for namespace in {namespace for namespace, _ in keys}:
+            self._checkpoint(namespace)
+
+    def _checkpoint(self, namespace: str):
+        """Persist resource version the watch of the given namespace can be safely resumed from."""
+        for (pending_namespace, _), pending in self._pending.items():
+            if pending_namespace == namespace:
+                resource_version = pending.checkpoint
+                break
+        else:
+            resource_version = self._latest.get(namespace)
+
+        self.checkpoints.set(namespace, resource_version)
+
+
+class BuildCollector(object):
+    """Collector of OpenShift builds in the given namespaces."""
+
+    def __init__(self,
+                 namespaces: List[str],
+                 debouncer: BuildEventDebouncer,
+                 watch_timeout: int = DEFAULT_COLLECTOR_WATCH_TIMEOUT,
+                 get_stored_status: Callable[[str], Optional[str]] = None):
+        """Initialize BuildCollector."""
+        self.namespaces = namespaces
+        self.debouncer = debouncer
+        self.watch_timeout = watch_timeout
+
+        # status of the stored build of the given id (None if not stored), listed builds collected already are skipped
+        self.get_stored_status = get_stored_status
+
+        self._stopped = threading.Event()
+
+    def run(self):
+        """Watch builds until stopped, flush buffered builds on exit."""
+        client = get_oc_client().ocp_client
+        builds = client.resources.get(api_version='build.openshift.io/v1', kind='Build')
+
+        for namespace in self.namespaces:
+            threading.Thread(
+                target=self.watch, args=(client, builds, namespace), name=f'collector-{namespace}', daemon=True
+            ).start()
+
+        while not self._stopped.wait(min(self.debouncer.window, 1.0)):
+            self.debouncer.flush_due()
+
+        self.debouncer.flush_due(force=True)
+
+    def stop(self):
+        """Stop watching builds."""
+        self._stopped.set()
+
+    def watch(self, client, builds, namespace: str):
+        """Watch builds in the given namespace, list them first if the watch can not be resumed."""
+        resource_version: Optional[str] = self.debouncer.checkpoints.get(namespace)
+        backoff = 1
+
+        while not self._stopped.is_set():
+            try:
+                if resource_version is None:
+                    resource_version = self.list(builds, namespace)
+
+                for event in client.watch(builds,
+                                          namespace=namespace,
+                                          resource_version=resource_version,
+                                          timeout=self.watch_timeout):
+                    if self._stopped.is_set():
+                        return
+
+                    if event['type'] == 'ERROR':
+                        # resource version is too old (410 Gone), list the builds again
+                        _LOGGER.warning("Watch of builds in %r failed: %r", namespace, event['raw_object'])
+                        resource_version = None
+                        break
+
+                    resource: dict = event['raw_object']
+                    resource_version = resource['metadata']['resourceVersion']
+
+                    if event['type'] in ('ADDED', 'MODIFIED'):
+                        self.debouncer.push(namespace, resource, resource_version)
+                    else:
+                        self.debouncer.advance(namespace, resource_version)
+
+                backoff = 1
+
+            except ApiException as exc:
+                if exc.status == 410:
+                    resource_version = None
+                    continue
+
+                _LOGGER.warning("Watch of builds in %r failed: %s", namespace, exc)
+
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 60)
+
+            except Exception as exc:  # connection errors, ...
+                _LOGGER.warning("Watch of builds in %r failed: %s", namespace, exc)
+
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 60)
+
+    def list(self, builds, namespace: str) -> str:
+        """Feed builds in the given namespace which have not been collected yet, return resource version of the listing.
+
+        The resource version of the listing is persisted once the builds have been fed,
+        so that the builds are not listed again after a restart.
+        """
+        listing = builds.get(namespace=namespace)
+        resource_version: str = listing.metadata.resourceVersion
+
+        collected = 0
+
+        for item in listing.items:
+            resource: dict = item.to_dict()
+            resource.setdefault('kind', 'Build')  # not present in items of a listing
+
+            if self.is_collected(resource):
+                collected += 1
+                continue
+
+            self.debouncer.push(namespace, resource, resource_version)
+
+        self.debouncer.advance(namespace, resource_version)
+
+        _LOGGER.info("Listed %d build(s) in %r, %d of them collected already", len(listing.items), namespace, collected)
+
+        return resource_version
+
+    def is_collected(self, resource: dict) -> bool:
+        """Check whether the build has been stored in its current phase or in a terminal phase already."""
+        if self.get_stored_status is None:
+            return False
+
+        # noinspection PyBroadException
+        try:
+            stored_status: Optional[str] = self.get_stored_status(resource['metadata']['name'])
+        except Exception as exc:
+            _LOGGER.warning("Failed to retrieve stored status of build %r: %s", resource['metadata']['name'], exc)
+            return False
+
+        return stored_status is not None and (
+            stored_status in TERMINAL_PHASES or stored_status == resource.get('status', {}).get('phase'))
+
+
+def prepare_build_job(resource: dict, get_build_log: bool = True) -> Tuple[str, dict]:
+    """Prepare ingestion job of the given build resource, the same way build hooks do.
+
+    :returns: kind and payload of the ingestion job.
+    """
+    build_schema = BuildInfoSchema()
+
+    build_info = BuildInfo.from_resource(resource)
+
+    if DEFAULT_API_URL:
+        build_info.build_log_url = f"{DEFAULT_API_URL.rstrip('/')}/build/logs/{build_info.build_id}"
+
+    build_doc, _ = build_schema.dump(build_info)
+
+    if resource['status'].get('phase') not in TERMINAL_PHASES:
+        return 'build_started', {'build_doc': build_doc}
+
+    return 'build_completed', {
+        'build_doc': build_doc,
+        'get_build_log': get_build_log,
+        'namespace': build_info.ocp_info.namespace,
+        'log_level': DEFAULT_OC_LOG_LEVEL,
+    }
+
+
+def main(argv: list = None) -> int:
+    """Run the build collector."""
+    parser = argparse.ArgumentParser(prog='osiris.collector', description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--namespace', dest='namespaces', action='append',
+                        help="Namespace to watch builds in, can be given multiple times.")
+    parser.add_argument('--debounce', type=float, default=DEFAULT_COLLECTOR_DEBOUNCE,
+                        help="Window (in seconds) build phase changes are collapsed in.")
+    parser.add_argument('--no-logs', dest='get_build_log', action='store_false',
+                        help="Do not gather build logs of completed builds.")
+
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, DEFAULT_LOG_LEVEL, logging.INFO))
+
+    namespaces: List[str] = args.namespaces or [
+        namespace.strip() for namespace in (DEFAULT_COLLECTOR_NAMESPACES or DEFAULT_OC_PROJECT or '').split(',')
+        if namespace.strip()
+    ]
+
+    if not namespaces:
+        parser.error("no namespace to watch builds in, use --namespace or OSIRIS_COLLECTOR_NAMESPACES")
+
+    if not DEFAULT_DATA_DIR:
+        parser.error("OSIRIS_DATA_DIR has to be set to a directory on a persistent volume")
+
+    from osiris.aggregator import build_aggregator
+    from osiris.ingestion import start_ingestion
+
+    ingestion_pool = start_ingestion()
+
+    def get_stored_status(build_id: str) -> Optional[str]:
+        metadata: Optional[dict] = build_aggregator.retrieve_build_metadata(build_id)
+
+        return metadata['build_status'] if metadata is not None else None
+
+    def submit(resource: dict):
+        ingestion_pool.submit(*prepare_build_job(resource, get_build_log=args.get_build_log))
+
+    debouncer = BuildEventDebouncer(
+        submit,
+        checkpoints=ResourceVersionStore(os.path.join(DEFAULT_DATA_DIR, 'collector.json')),
+        window=args.debounce
+    )
+    collector = BuildCollector(namespaces, debouncer, get_stored_status=get_stored_status)
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: collector.stop())
+
+    _LOGGER.info("Collecting builds in %s", namespaces)
+
+    collector.run()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
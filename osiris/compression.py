@@ -0,0 +1,136 @@
+# Osiris: Build log aggregator.
+
+"""Compression codecs for stored build logs.
+
+Codec names match HTTP content-coding tokens, so that the stored
+blobs can be served as they are to clients accepting the encoding.
+"""
+
+import zlib
+
+from typing import Any, Callable, Dict, List
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+class Codec(object):
+    """Identity codec, base for other compression codecs."""
+
+    NAME = 'identity'
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress the data."""
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        """Decompress the data."""
+        return data
+
+    def decompressor(self):
+        """Return incremental decompressor with `decompress(chunk)` method."""
+        return self
+
+
+class GzipCodec(Codec):
+    """Gzip codec."""
+
+    NAME = 'gzip'
+
+    def __init__(self, level: int = 6):
+        """Initialize GzipCodec."""
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress the data."""
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data: bytes) -> bytes:
+        """Decompress the data, concatenated gzip members are supported."""
+        return self.decompressor().decompress(data)
+
+    def decompressor(self):
+        """Return incremental decompressor with `decompress(chunk)` method."""
+        return _ConcatenatedDecompressor(lambda: zlib.decompressobj(16 + zlib.MAX_WBITS))
+
+
+class _ConcatenatedDecompressor(object):
+    """Incremental decompressor of concatenated compressed members (frames)."""
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._decompressor = factory()
+
+    def decompress(self, chunk: bytes) -> bytes:
+        data: List[bytes] = []
+
+        while chunk:
+            if self._decompressor.eof:
+                # start of the next member
+                self._decompressor = self._factory()
+
+            data.append(self._decompressor.decompress(chunk))
+
+            chunk = self._decompressor.unused_data if self._decompressor.eof else b''
+
+        return b''.join(data)
+
+
+class ZstdCodec(Codec):
+    """Zstandard codec, requires `zstandard` package."""
+
+    NAME = 'zstd'
+
+    def __init__(self, level: int = 3):
+        """Initialize ZstdCodec."""
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress the data."""
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        """Decompress the data, concatenated frames are supported."""
+        return self.decompressor().decompress(data)
+
+    def decompressor(self):
+        """Return incremental decompressor with `decompress(chunk)` method."""
+        return _ConcatenatedDecompressor(lambda: zstandard.ZstdDecompressor().decompressobj())
+
+
+_CODECS: Dict[str, Codec] = {}
+
+# codecs which are registered only if the package they require is installed
+_OPTIONAL_CODECS: Dict[str, str] = {'zstd': 'zstandard'}
+
+
+def register_codec(codec: Codec):
+    """Register compression codec under its name."""
+    _CODECS[codec.NAME] = codec
+
+
+def get_codec(name: str = None) -> Codec:
+    """Get compression codec by its name, identity codec if no name is given.
+
+    :raises ValueError: In case of unknown or unavailable codec.
+    """
+    try:
+        return _CODECS[name or Codec.NAME]
+    except KeyError:
+        if name in _OPTIONAL_CODECS:
+            raise ValueError(f"Compression codec {name!r} requires the {_OPTIONAL_CODECS[name]!r} package, "
+                             f"install osiris[{name}] or use one of the available codecs: {sorted(_CODECS)}")
+
+        raise ValueError(f"Compression codec {name!r} is not available, "
+                         f"available codecs: {sorted(_CODECS)}")
+
+
+register_codec(Codec())
+register_codec(GzipCodec())
+
+if zstandard is not None:  # pragma: no cover
+    register_codec(ZstdCodec())
@@ -0,0 +1,57 @@
+# Osiris: Build log aggregator.
+
+"""Concurrent retrieval of documents."""
+
+from concurrent.futures import Executor, Future
+from concurrent.futures import wait as wait_for_futures
+
+from typing import Any, Callable, Iterable, List, Tuple
+
+from osiris import DEFAULT_FETCH_TIMEOUT
+
+
+class FetchResult(object):
+    """Result of a single fetch performed by `fetch_concurrently`."""
+
+    def __init__(self, key: str, value: Any = None, error: Exception = None):
+        """Initialize FetchResult."""
+        self.key = key
+
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        """Return whether the fetch has succeeded."""
+        return self.error is None
+
+
+def fetch_concurrently(keys: Iterable[str],
+                       fetch: Callable[[str], Any],
+                       executor: Executor,
+                       timeout: float = DEFAULT_FETCH_TIMEOUT) -> List[FetchResult]:
+    """Fetch the given keys concurrently using the executor.
+
+    Results are returned in the order of the given keys. Failure of a single
+    fetch does not affect the others, the exception is reported in its result
+    instead. Fetches which have not finished before the deadline
+    are reported as failed with TimeoutError.
+    """
+    futures: List[Tuple[str, Future]] = [(key, executor.submit(fetch, key)) for key in keys]
+
+    wait_for_futures([future for _, future in futures], timeout=timeout)
+
+    results = []
+    for key, future in futures:
+        if not future.done():
+            future.cancel()
+
+            results.append(FetchResult(key, error=TimeoutError(f"Fetch deadline of {timeout}s exceeded")))
+
+        elif future.exception() is not None:
+            results.append(FetchResult(key, error=future.exception()))
+
+        else:
+            results.append(FetchResult(key, value=future.result()))
+
+    return results
@@ -0,0 +1,147 @@
+# Osiris: Build log aggregator.
+
+"""Followers of build logs of running builds.
+
+A follower streams the build log of a running build from OCP and stores
+it incrementally, so that the build log is readable while the build is
+in progress and it does not need to be transferred at once on completion.
+Once the build has finished, the reference to the stored build log is attached
+to the build information document and handed to the completion hook waiting for it.
+"""
+
+import logging
+import threading
+
+from concurrent.futures import Future, TimeoutError
+from typing import Dict, Iterable, Iterator, Optional
+
+from osiris import DEFAULT_LOG_FOLLOWERS
+from osiris import get_oc_client
+
+from osiris.aggregator import build_aggregator
+from osiris.objects import PreconditionFailed
+from osiris.openshift import follow_build_log, get_build_log
+
+
+_LOGGER = logging.getLogger(__name__)
+
+TERMINAL_PHASES = ('Complete', 'Failed', 'Error', 'Cancelled')
+
+
+class IncompleteBuildLog(Exception):
+    """Build log stream ended before the build has finished."""
+
+
+class BuildLogFollowerPool(object):
+    """Bounded pool of build log followers."""
+
+    def __init__(self, max_followers: int = DEFAULT_LOG_FOLLOWERS, max_attempts: int = 3):
+        """Initialize BuildLogFollowerPool."""
+        self.max_followers = max_followers
+        self.max_attempts = max_attempts
+
+        self._lock = threading.Lock()
+        # futures of the references to the build logs being followed, None if not gathered
+        self._following: Dict[str, Future] = {}
+
+    def is_following(self, build_id: str) -> bool:
+        """Return whether build log of the given build is being followed."""
+        return build_id in self._following
+
+    def follow(self, build_id: str, namespace: str) -> bool:
+        """Start following build log of the given build.
+
+        :returns: whether the follower has been started, builds already followed
+                  and builds exceeding the limit of followers are not followed.
+        """
+        with self._lock:
+            if build_id in self._following or len(self._following) >= self.max_followers:
+                return False
+
+            future = self._following[build_id] = Future()
+
+        threading.Thread(
+            target=self._follow, args=(build_id, namespace, future), name=f'follower-{build_id}', daemon=True
+        ).start()
+
+        return True
+
+    def wait(self, build_id: str, timeout: float = None) -> Optional[dict]:
+        """Wait for the follower of the given build to store its build log.
+
+        :returns: reference to the stored build log, None if the build is not followed,
+                  the follower has failed to gather the build log or it has not finished in time.
+        """
+        with self._lock:
+            future: Optional[Future] = self._following.get(build_id)
+
+        if future is None:
+            return None
+
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            return None
+
+    def _follow(self, build_id: str, namespace: str, future: Future):
+        """Follow build log of the given build, fall back to gathering the whole build log.
+
+        The reference to the stored build log is attached to the build information document.
+        """
+        document_id: str = build_aggregator.get_build_document_id(build_id)
+        build_log_object: Optional[dict] = None
+
+        try:
+            for attempt in range(1, self.max_attempts + 1):
+                # noinspection PyBroadException
+                try:
+                    # the stream starts from the beginning of the build log on reconnection
+                    build_log_object = build_aggregator.logs.store_live_build_log(
+                        document_id, _until_complete(follow_build_log(build_id, namespace), build_id, namespace)
+                    )
+                    break
+                except PreconditionFailed as exc:
+                    # the build log is stored by another follower (or has been gathered), which attaches it
+                    _LOGGER.info("Stopped following build log of %r: %s", build_id, exc)
+                    break
+                except Exception as exc:
+                    _LOGGER.warning("Following build log of %r failed, attempt %d: %s", build_id, attempt, exc)
+            else:
+                build_aggregator.logs.purge_live_build_log(document_id)
+
+                if _is_complete(build_id, namespace):
+                    build_log_object = build_aggregator.logs.store_build_log(
+                        document_id, data=get_build_log(build_id, namespace=namespace), if_none_match='*')
+
+            if build_log_object is not None:
+                build_aggregator.attach_build_log(build_id, build_log_object=build_log_object)
+
+        except PreconditionFailed:
+            _LOGGER.info("Build log of %r has been gathered in the meantime", build_id)
+
+        except Exception:
+            _LOGGER.exception("Failed to gather build log of %r", build_id)
+
+        finally:
+            future.set_result(build_log_object)
+
+            with self._lock:
+                self._following.pop(build_id, None)
+
+
+def _is_complete(build_id: str, namespace: str) -> bool:
+    """Check whether the given build has finished."""
+    build: dict = get_oc_client().get_build(build_id, namespace=namespace)
+
+    return build['status']['phase'] in TERMINAL_PHASES
+
+
+def _until_complete(chunks: Iterable[bytes], build_id: str, namespace: str) -> Iterator[bytes]:
+    """Yield the chunks, raise IncompleteBuildLog if the stream ends before the build has finished."""
+    yield from chunks
+
+    if not _is_complete(build_id, namespace):
+        raise IncompleteBuildLog(f"Build log stream of {build_id!r} ended before the build has finished")
+
+
+log_followers = BuildLogFollowerPool()
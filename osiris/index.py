@@ -0,0 +1,450 @@
+# Osiris: Build log aggregator.
+
+"""Build information index."""
+
+import base64
+import bisect
+import json
+import logging
+import threading
+
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from marshmallow import ValidationError
+
+from osiris import DEFAULT_INDEX_SEGMENT_KEY_LENGTH
+
+from osiris.objects import ObjectStore
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StaleIndexError(Exception):
+    """Segment of the index does not match its size kept by the manifest, the index is being updated."""
+
+
+class BuildInfoIndex(object):
+    """Segmented index of build information documents.
+
+    The index keeps compact build information entries (no build logs)
+    grouped into segment objects by the leading characters of the document id.
+    The manifest object keeps the number of entries in each segment, so that
+    any page of the index can be located without listing the bucket.
+
+    The layout of the index in the Ceph storage is the following:
+
+        <prefix>/index/manifest
+        <prefix>/index/segments/<segment_id>
+
+    Segments and the manifest are shared by all of the instances, they are updated
+    by conditional writes retried on conflict, so that concurrent updates are not lost.
+    The manifest is updated only if the number of entries of a segment changes, the changes
+    are accumulated and written by a single update of the manifest (see `flush_manifest`),
+    so that the manifest is not written by each update of every instance. Pages covering
+    segments whose changes have not been written yet are served from the bucket listing.
+
+    The manifest is created by the first full reconciliation only and it is marked
+    complete once a reconciliation has retrieved all of the missing entries. Until then
+    (and whenever the segment key length is changed) the index is considered to be absent
+    and the bucket listing stays the source of truth.
+    """
+
+    INDEX_PREFIX = 'index'
+
+    def __init__(self, objects: ObjectStore, segment_key_length: int = DEFAULT_INDEX_SEGMENT_KEY_LENGTH):
+        """Initialize BuildInfoIndex."""
+        self.objects = objects
+        self.segment_key_length = segment_key_length
+
+        self._lock = threading.Lock()
+        # changes of the segment sizes not written to the manifest yet
+        self._deltas: Dict[str, int] = {}
+
+    @property
+    def manifest_key(self) -> str:
+        """Return object key of the index manifest."""
+        return f"{self.INDEX_PREFIX}/manifest"
+
+    def get_segment_id(self, document_id: str) -> str:
+        """Return id of the segment the given document belongs to."""
+        return document_id[:self.segment_key_length]
+
+    def get_segment_key(self, segment_id: str) -> str:
+        """Return object key of the given segment."""
+        return f"{self.INDEX_PREFIX}/segments/{segment_id}"
+
+    def exists(self, manifest: dict = None) -> bool:
+        """Check whether the index has been built by a full reconciliation with the current segment key length.
+
+        Manifests of indexes which have not been fully reconciled yet
+        (or whose segments are keyed by a different length) are incomplete.
+        """
+        manifest = manifest or self.retrieve_manifest()
+
+        return bool(manifest.get('complete')) and manifest.get('segment_key_length') == self.segment_key_length
+
+    def retrieve_manifest(self) -> dict:
+        """Retrieve the index manifest.
+
+        Empty manifest is returned if the index has not been created yet.
+        """
+        manifest, _ = self.objects.retrieve_document(self.manifest_key)
+
+        return manifest or {'segments': {}}
+
+    def retrieve_segment(self, segment_id: str) -> Dict[str, dict]:
+        """Retrieve entries of the given segment mapped by document id."""
+        segment, _ = self.objects.retrieve_document(self.get_segment_key(segment_id))
+
+        return segment or {}
+
+    def update(self, document_id: str, entry: dict):
+        """Insert or replace index entry for the given document.
+
+        :raises PreconditionFailed: In case the segment has been changed concurrently by each of the attempts.
+        """
+        self._update_segment(self.get_segment_id(document_id), document_id, entry)
+
+    def remove(self, document_id: str):
+        """Remove index entry of the given document, if present.
+
+        :raises PreconditionFailed: In case the segment has been changed concurrently by each of the attempts.
+        """
+        self._update_segment(self.get_segment_id(document_id), document_id, None)
+
+    def flush_manifest(self):
+        """Write the changes of the segment sizes accumulated since the last flush to the manifest.
+
+        :raises PreconditionFailed: In case the manifest has been changed concurrently by each of the attempts,
+            the changes are kept for the next flush.
+        """
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+
+        deltas = {segment_id: delta for segment_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        def _update_manifest(manifest: Optional[dict]) -> Optional[dict]:
+            if manifest is None:
+                return None
+
+            for segment_id, delta in deltas.items():
+                count: int = manifest['segments'].get(segment_id, 0) + delta
+                if count > 0:
+                    manifest['segments'][segment_id] = count
+                else:
+                    manifest['segments'].pop(segment_id, None)
+
+            return manifest
+
+        try:
+            self.objects.update_document(self.manifest_key, _update_manifest)
+        except Exception:
+            with self._lock:
+                for segment_id, delta in deltas.items():
+                    self._deltas[segment_id] = self._deltas.get(segment_id, 0) + delta
+            raise
+
+    def reconcile(self,
+                  document_ids: Set[str],
+                  get_entries: Callable[[Set[str]], Dict[str, Optional[dict]]]) -> dict:
+        """Reconcile the index with the given set of stored document ids.
+
+        Entries of documents missing in the index are created using `get_entries`,
+        which maps documents no longer stored to None and leaves out documents
+        it has failed to retrieve. Entries of documents which are not in the given
+        set are checked by `get_entries` as well, as they might have been stored
+        after the set has been listed, and dropped only if they are no longer stored.
+        Segments keyed by a different length are rebuilt from the previous segments
+        and removed. The manifest is rewritten with the actual segment sizes, it is
+        marked complete only if none of the documents has failed to be retrieved,
+        the failed ones are retried by the next reconciliation.
+
+        :returns: the reconciled manifest.
+        """
+        # changes made before the segments are counted
+        self.flush_manifest()
+
+        previous: dict = self.retrieve_manifest()
+        previous_ids: List[str] = sorted(previous['segments'])
+
+        # manifests stored before the key length has been recorded are keyed by 2 characters
+        rebuild: bool = previous.get('segment_key_length', 2) != self.segment_key_length
+
+        expected_segments: Dict[str, Set[str]] = {}
+
+        for document_id in document_ids:
+            expected_segments.setdefault(self.get_segment_id(document_id), set()).add(document_id)
+
+        segment_ids: Set[str] = set(expected_segments)
+        if not rebuild:
+            segment_ids.update(previous_ids)
+
+        previous_segments: Dict[str, Dict[str, dict]] = {}
+
+        def _get_previous_entries(segment_id: str) -> Dict[str, dict]:
+            """Get entries of the segment kept by the segments of the previous key length."""
+            entries: Dict[str, dict] = {}
+
+            for previous_id in previous_ids:
+                if not (previous_id.startswith(segment_id) or segment_id.startswith(previous_id)):
+                    continue
+
+                if previous_id not in previous_segments:
+                    # segments are reconciled in order, each previous segment is needed by consecutive ones
+                    previous_segments.clear()
+                    previous_segments[previous_id] = self.retrieve_segment(previous_id)
+
+                entries.update(
+                    (document_id, entry) for document_id, entry in previous_segments[previous_id].items()
+                    if document_id.startswith(segment_id)
+                )
+
+            return entries
+
+        segment_counts: Dict[str, int] = {}
+        failed: Set[str] = set()
+
+        for segment_id in sorted(segment_ids):
+            expected: Set[str] = expected_segments.get(segment_id, set())
+            fetched: Dict[str, dict] = {}
+
+            def _reconcile(segment: Optional[Dict[str, dict]]) -> Optional[Dict[str, dict]]:
+                if rebuild:
+                    # entries stored by concurrent updates in the meantime are more recent
+                    segment = dict(_get_previous_entries(segment_id), **(segment or {}))
+
+                segment = segment or {}
+
+                stale: Set[str] = set(segment) - expected
+                missing: Set[str] = expected - set(segment)
+
+                unknown: Set[str] = (stale | missing) - set(fetched)
+                if unknown:
+                    fetched.update(get_entries(unknown))
+
+                # documents failed to be retrieved are left as they are
+                failed.update((stale | missing) - set(fetched))
+
+                for document_id in stale:
+                    if document_id in fetched and fetched[document_id] is None:
+                        del segment[document_id]
+
+                segment.update((document_id, fetched[document_id]) for document_id in stale | missing
+                               if fetched.get(document_id) is not None)
+
+                segment_counts[segment_id] = len(segment)
+
+                return segment if stale or missing or rebuild else None
+
+            self.objects.update_document(self.get_segment_key(segment_id), _reconcile)
+
+            if not segment_counts[segment_id]:
+                del segment_counts[segment_id]
+                self.objects.object(self.get_segment_key(segment_id)).delete()
+
+        if rebuild:
+            for previous_id in previous_ids:
+                # segments of the current key length might have been counted by concurrent updates
+                if len(previous_id) != self.segment_key_length:
+                    self.objects.object(self.get_segment_key(previous_id)).delete()
+
+        if failed:
+            _LOGGER.warning("Failed to retrieve %d document(s) of the build information index, "
+                            "the index is left as it is until the next reconciliation", len(failed))
+
+        manifest: dict = {
+            'segments': segment_counts,
+            'segment_key_length': self.segment_key_length,
+            # the index missing entries is not used until it has been fully reconciled
+            'complete': not failed or (self.exists(previous) and not rebuild),
+        }
+
+        self.objects.store_document(manifest, self.manifest_key)
+
+        return manifest
+
+    def iter_entries(self) -> Iterator[Tuple[str, dict]]:
+        """Iterate over all of the index entries along with their document ids, segment by segment."""
+        for segment_id in sorted(self.retrieve_manifest()['segments']):
+            yield from self.retrieve_segment(segment_id).items()
+
+    def count(self, manifest: dict = None) -> int:
+        """Return total number of indexed documents."""
+        manifest = manifest or self.retrieve_manifest()
+
+        return sum(manifest['segments'].values())
+
+    def page(self,
+             limit: int,
+             offset: int = 0,
+             after: str = None,
+             before: str = None,
+             manifest: dict = None) -> Tuple[int, List[Tuple[str, dict]]]:
+        """Return up to `limit` index entries of the requested window.
+
+        The window is given either by its offset or relative to a document id,
+        i.e. entries following `after` or entries preceding `before`.
+        Entries are ordered by document id, which matches the order
+        of the objects as listed by the storage. Only the segments
+        covering the requested window are retrieved.
+
+        :raises StaleIndexError: In case a retrieved segment does not match the manifest,
+            the offsets of the window would be wrong.
+        :returns: offset of the first entry and list of (document_id, entry) pairs.
+        """
+        manifest = manifest or self.retrieve_manifest()
+        counts: Dict[str, int] = manifest['segments']
+
+        segments: List[Tuple[str, int]] = sorted(manifest['segments'].items())
+        segment_ids: List[str] = [segment_id for segment_id, _ in segments]
+
+        positions: List[int] = [0]
+        for _, segment_count in segments:
+            positions.append(positions[-1] + segment_count)
+
+        if before is not None:
+            return self._page_before(before, limit, segment_ids, positions, counts)
+
+        retrieved: Dict[str, Dict[str, dict]] = {}
+
+        if after is not None:
+            segment_id = self.get_segment_id(after)
+            first = bisect.bisect_left(segment_ids, segment_id)
+
+            segment = retrieved[segment_id] = self._retrieve_counted_segment(segment_id, counts)
+            start = bisect.bisect_right(sorted(segment), after)
+
+            offset = positions[first] + start
+        else:
+            first = bisect.bisect_right(positions, offset) - 1
+            start = offset - positions[first] if first < len(segments) else 0
+
+        entries: List[Tuple[str, dict]] = []
+
+        for segment_id in segment_ids[first:]:
+            if len(entries) >= limit:
+                break
+
+            segment = retrieved.get(segment_id)
+            if segment is None:
+                segment = self._retrieve_counted_segment(segment_id, counts)
+
+            for document_id in sorted(segment)[start:start + limit - len(entries)]:
+                entries.append((document_id, segment[document_id]))
+
+            start = 0
+
+        return offset, entries
+
+    def _page_before(self,
+                     before: str,
+                     limit: int,
+                     segment_ids: List[str],
+                     positions: List[int],
+                     counts: Dict[str, int]) -> Tuple[int, List[Tuple[str, dict]]]:
+        """Return up to `limit` index entries preceding the given document id."""
+        segment_id = self.get_segment_id(before)
+        last = bisect.bisect_left(segment_ids, segment_id)
+
+        segment = self._retrieve_counted_segment(segment_id, counts)
+        end = bisect.bisect_left(sorted(segment), before)
+
+        offset = positions[last] + end
+
+        entries: List[Tuple[str, dict]] = [
+            (document_id, segment[document_id])
+            for document_id in sorted(segment)[max(end - limit, 0):end]
+        ]
+
+        for segment_id in reversed(segment_ids[:last]):
+            if len(entries) >= limit:
+                break
+
+            segment = self._retrieve_counted_segment(segment_id, counts)
+            document_ids = sorted(segment)
+
+            entries[:0] = [
+                (document_id, segment[document_id])
+                for document_id in document_ids[max(len(document_ids) - limit + len(entries), 0):]
+            ]
+
+        return offset - len(entries), entries
+
+    def _retrieve_counted_segment(self, segment_id: str, counts: Dict[str, int]) -> Dict[str, dict]:
+        """Retrieve the segment, check that its size matches the count kept by the manifest.
+
+        :raises StaleIndexError: In case the sizes differ.
+        """
+        segment: Dict[str, dict] = self.retrieve_segment(segment_id)
+
+        if len(segment) != counts.get(segment_id, 0):
+            raise StaleIndexError(f"Segment {segment_id!r} of the index has {len(segment)} entries, "
+                                  f"{counts.get(segment_id, 0)} expected by the manifest")
+
+        return segment
+
+    def _update_segment(self, segment_id: str, document_id: str, entry: Optional[dict]):
+        """Store (or remove if None) entry of the document in the segment, record the change of its size.
+
+        The change is written to the manifest by the next `flush_manifest`.
+        """
+        delta: int = 0
+
+        def _update(segment: Optional[Dict[str, dict]]) -> Optional[Dict[str, dict]]:
+            nonlocal delta
+
+            segment = segment or {}
+            delta = 0
+
+            if entry is None:
+                if document_id not in segment:
+                    return None
+
+                del segment[document_id]
+                delta = -1
+            else:
+                if segment.get(document_id) == entry:
+                    return None
+
+                delta = 0 if document_id in segment else 1
+                segment[document_id] = entry
+
+            return segment
+
+        self.objects.update_document(self.get_segment_key(segment_id), _update)
+
+        if delta:
+            with self._lock:
+                self._deltas[segment_id] = self._deltas.get(segment_id, 0) + delta
+
+
+def encode_cursor(**position) -> str:
+    """Encode position in the build information index into an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode opaque pagination cursor.
+
+    :raises ValidationError: In case of malformed cursor.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (ValueError, TypeError, UnicodeError):
+        raise ValidationError(f"Invalid pagination cursor: {cursor!r}", 'cursor')
+
+    if not isinstance(position, dict):
+        raise ValidationError(f"Invalid pagination cursor: {cursor!r}", 'cursor')
+
+    position = {
+        key: value for key, value in position.items()
+        if key in ('after', 'before') and isinstance(value, str)
+    }
+
+    if len(position) != 1:
+        raise ValidationError(f"Invalid pagination cursor: {cursor!r}", 'cursor')
+
+    return position
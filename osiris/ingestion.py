@@ -0,0 +1,687 @@
+# Osiris: Build log aggregator.
+
+"""Asynchronous ingestion of build hooks.
+
+Build hooks enqueue ingestion jobs into a durable local queue (SQLite)
+and return immediately, jobs are processed by a pool of worker threads.
+Claimed jobs are leased, so that jobs of a crashed worker (or process)
+are redelivered once their lease expires; the lease is renewed for as long
+as the job is being processed. Failed jobs are retried with exponential
+backoff until the maximum number of attempts is reached, jobs failed by all
+of the attempts are kept (and listed by the metrics) for the retention period.
+The queue is kept in `OSIRIS_DATA_DIR`, which has to be on a persistent volume
+of the instance, the workers are started by `start_ingestion`. Without the queue
+(`OSIRIS_INGESTION_QUEUE=0`, the default if no data directory is configured)
+jobs are ingested synchronously within the request which submits them.
+Jobs are acknowledged only once their build data have been stored, updates
+written behind (see `WriteBehindBuffer`) included.
+Redelivered hooks matching the content fingerprint of the last processed
+job of the same build and kind, or of a job of the same build and kind
+which is still queued (or being processed), are acknowledged without
+being enqueued.
+"""
+
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from osiris import DEFAULT_DATA_DIR
+from osiris import DEFAULT_DEDUP
+from osiris import DEFAULT_DEDUP_MAX_FINGERPRINTS
+from osiris import DEFAULT_FOLLOW_LOGS
+from osiris import DEFAULT_INGESTION_FAILED_RETENTION
+from osiris import DEFAULT_INGESTION_LEASE
+from osiris import DEFAULT_INGESTION_MAX_ATTEMPTS
+from osiris import DEFAULT_INGESTION_QUEUE
+from osiris import DEFAULT_INGESTION_RETRY_DELAY
+from osiris import DEFAULT_INGESTION_WORKERS
+from osiris import DEFAULT_LOG_FOLLOWER_WAIT
+from osiris import DEFAULT_OC_LOG_LEVEL
+
+from osiris.aggregator import build_aggregator
+from osiris.follower import log_followers
+from osiris.metrics import Counter
+from osiris.metrics import register_metric
+from osiris.objects import PreconditionFailed
+from osiris.openshift import get_build_log
+from osiris.sqlite import SQLiteDatabase
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Job(object):
+    """Ingestion job."""
+
+    def __init__(self, job_id: int, kind: str, payload: dict, attempts: int = 0):
+        """Initialize Job."""
+        self.job_id = job_id
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+
+
+class IngestionQueue(SQLiteDatabase):
+    """Durable queue of ingestion jobs backed by SQLite.
+
+    The queue can be shared by multiple processes (e.g. gunicorn workers).
+    """
+
+    def __init__(self,
+                 path: str,
+                 lease: float = DEFAULT_INGESTION_LEASE,
+                 max_attempts: int = DEFAULT_INGESTION_MAX_ATTEMPTS,
+                 retry_delay: float = DEFAULT_INGESTION_RETRY_DELAY,
+                 failed_retention: float = DEFAULT_INGESTION_FAILED_RETENTION):
+        """Initialize IngestionQueue."""
+        super().__init__(path)
+
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.failed_retention = failed_retention
+
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    visible_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_error TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_visible ON jobs (state, visible_at)")
+
+            # queues created by earlier versions have no fingerprints
+            columns: List[str] = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if 'dedup_key' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN dedup_key TEXT")
+                conn.execute("ALTER TABLE jobs ADD COLUMN fingerprint TEXT")
+
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, fingerprint)")
+
+    def put(self, kind: str, payload: dict, fingerprint: Tuple[str, str] = None) -> Optional[int]:
+        """Enqueue a job, see `put_many`."""
+        job_id, = self.put_many([(kind, payload)], [fingerprint])
+
+        return job_id
+
+    def put_many(self, jobs: List[Tuple[str, dict]],
+                 fingerprints: List[Optional[Tuple[str, str]]] = None) -> List[Optional[int]]:
+        """Enqueue (kind, payload) jobs in a single transaction, return their ids.
+
+        Jobs given (key, fingerprint) pairs (see `get_fingerprint`) are not enqueued
+        if a job of the same key and fingerprint is queued already, whether it is
+        pending or leased (failed jobs do not count).
+
+        :returns: ids of the jobs, None for jobs which are duplicates of queued ones.
+        """
+        now = time.time()
+
+        job_ids: List[Optional[int]] = []
+
+        with self._transaction() as conn:
+            for (kind, payload), fingerprint in zip(jobs, fingerprints or [None] * len(jobs)):
+                dedup_key, content_fingerprint = fingerprint or (None, None)
+
+                if fingerprint is not None and conn.execute(
+                        "SELECT 1 FROM jobs WHERE dedup_key = ? AND fingerprint = ? AND state = 'pending' LIMIT 1",
+                        (dedup_key, content_fingerprint)).fetchone() is not None:
+                    job_ids.append(None)
+                    continue
+
+                cursor = conn.execute(
+                    "INSERT INTO jobs (kind, payload, visible_at, created_at, dedup_key, fingerprint)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (kind, json.dumps(payload), now, now, dedup_key, content_fingerprint)
+                )
+
+                job_ids.append(cursor.lastrowid)
+
+        return job_ids
+
+    def claim(self) -> Optional[Job]:
+        """Claim the oldest visible job, the job is leased to the caller."""
+        now = time.time()
+
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id, kind, payload, attempts FROM jobs"
+                " WHERE state = 'pending' AND visible_at <= ? ORDER BY id LIMIT 1",
+                (now,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            job_id, kind, payload, attempts = row
+
+            conn.execute(
+                "UPDATE jobs SET attempts = attempts + 1, visible_at = ? WHERE id = ?",
+                (now + self.lease, job_id)
+            )
+
+        return Job(job_id, kind, json.loads(payload), attempts=attempts + 1)
+
+    def renew(self, jobs: List[Job]):
+        """Renew the lease of jobs being processed, jobs claimed again in the meantime are left as they are."""
+        if not jobs:
+            return
+
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE jobs SET visible_at = ? WHERE id = ? AND state = 'pending' AND attempts = ?",
+                [(time.time() + self.lease, job.job_id, job.attempts) for job in jobs]
+            )
+
+    def ack(self, job: Job):
+        """Remove successfully processed job from the queue."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job.job_id,))
+
+    def retry(self, job: Job, error: str):
+        """Schedule failed job for retry, mark it failed if it has been attempted too many times."""
+        with self._transaction() as conn:
+            if job.attempts >= self.max_attempts:
+                # visible_at is the time of the failure for failed jobs
+                conn.execute(
+                    "UPDATE jobs SET state = 'failed', visible_at = ?, last_error = ? WHERE id = ?",
+                    (time.time(), error, job.job_id)
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET visible_at = ?, last_error = ? WHERE id = ?",
+                    (time.time() + self.retry_delay * 2 ** (job.attempts - 1), error, job.job_id)
+                )
+
+    def depth(self) -> Dict[str, int]:
+        """Return number of pending, leased and failed jobs."""
+        now = time.time()
+
+        row = self._conn.execute(
+            "SELECT"
+            " COALESCE(SUM(state = 'pending' AND (attempts = 0 OR visible_at <= ?)), 0),"
+            " COALESCE(SUM(state = 'pending' AND attempts > 0 AND visible_at > ?), 0),"
+            " COALESCE(SUM(state = 'failed'), 0)"
+            " FROM jobs",
+            (now, now)
+        ).fetchone()
+
+        return dict(zip(('pending', 'leased', 'failed'), row))
+
+    def failed(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Return jobs failed by all of the attempts, the most recent failures first."""
+        rows = self._conn.execute(
+            "SELECT id, kind, payload, attempts, visible_at, last_error FROM jobs"
+            " WHERE state = 'failed' ORDER BY visible_at DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+
+        return [{
+            'job_id': job_id,
+            'kind': kind,
+            'build_id': json.loads(payload).get('build_doc', {}).get('build_id'),
+            'attempts': attempts,
+            'failed_at': failed_at,
+            'error': error,
+        } for job_id, kind, payload, attempts, failed_at, error in rows]
+
+    def prune(self) -> int:
+        """Remove jobs failed longer than the retention period ago.
+
+        :returns: number of the jobs removed.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE state = 'failed' AND visible_at < ?",
+                (time.time() - self.failed_retention,)
+            )
+
+        return cursor.rowcount
+
+
+class FingerprintStore(SQLiteDatabase):
+    """Content fingerprints of ingested jobs, cached in memory and persisted in SQLite.
+
+    Both the cache and the persisted store are bounded, least recently
+    stored fingerprints are evicted first.
+    """
+
+    def __init__(self,
+                 path: str,
+                 max_cached: int = 10000,
+                 max_stored: int = DEFAULT_DEDUP_MAX_FINGERPRINTS):
+        """Initialize FingerprintStore."""
+        super().__init__(path)
+
+        self.max_cached = max_cached
+        self.max_stored = max_stored
+
+        self._lock = threading.Lock()
+        self._cache: Dict[str, str] = OrderedDict()
+
+        self._stored = 0
+
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    key TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS fingerprints_stored ON fingerprints (stored_at)")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return fingerprint stored under the given key."""
+        with self._lock:
+            fingerprint: Optional[str] = self._cache.get(key)
+
+        if fingerprint is None:
+            row = self._conn.execute("SELECT fingerprint FROM fingerprints WHERE key = ?", (key,)).fetchone()
+
+            if row is not None:
+                fingerprint, = row
+                self._cache_fingerprint(key, fingerprint)
+
+        return fingerprint
+
+    def set(self, key: str, fingerprint: str):
+        """Store fingerprint under the given key."""
+        self._cache_fingerprint(key, fingerprint)
+
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (key, fingerprint, stored_at) VALUES (?, ?, ?)",
+                (key, fingerprint, time.time())
+            )
+
+            self._stored += 1
+            if self._stored % 1000 == 0:
+                conn.execute(
+                    "DELETE FROM fingerprints WHERE key NOT IN"
+                    " (SELECT key FROM fingerprints ORDER BY stored_at DESC LIMIT ?)",
+                    (self.max_stored,)
+                )
+
+    def _cache_fingerprint(self, key: str, fingerprint: str):
+        with self._lock:
+            self._cache.pop(key, None)
+            self._cache[key] = fingerprint
+
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+
+def get_fingerprint(kind: str, payload: dict) -> Tuple[str, str]:
+    """Return key and content fingerprint of the given ingestion job.
+
+    The fingerprint is a hash of the normalized job payload,
+    the key identifies the build and the kind of the job.
+    """
+    key = f"{kind}:{payload['build_doc']['build_id']}"
+    fingerprint: str = hashlib.sha256(
+        json.dumps([kind, payload], sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+
+    return key, fingerprint
+
+
+class IngestionWorkerPool(object):
+    """Pool of worker threads draining the ingestion queue.
+
+    The queue is given by `start`, jobs cannot be submitted before.
+    A pool started without a queue ingests the submitted jobs synchronously.
+    """
+
+    def __init__(self,
+                 handlers: Dict[str, Callable[[dict], Optional[Future]]],
+                 workers: int = DEFAULT_INGESTION_WORKERS,
+                 poll_interval: float = 1.0):
+        """Initialize IngestionWorkerPool."""
+        self.queue: Optional[IngestionQueue] = None
+        self.handlers = handlers
+
+        # jobs matching the fingerprint of the last processed job of the same key are dropped
+        self.fingerprints: Optional[FingerprintStore] = None
+        self.stats = Counter('duplicates', 'unique')
+
+        self.workers = workers
+        self.poll_interval = poll_interval
+
+        self._threads: List[threading.Thread] = []
+
+        # jobs being processed, their leases are renewed by the keeper thread
+        self._lock = threading.Lock()
+        self._processed: Dict[int, Job] = {}
+
+        self._wakeup = threading.Condition()
+        self._stopped = threading.Event()
+
+        self._started = threading.Event()
+        # ids of jobs ingested synchronously, unique within the process only
+        self._job_ids = itertools.count(1)
+
+    def submit(self, kind: str, payload: dict) -> Optional[int]:
+        """Enqueue a job and wake up an idle worker.
+
+        :returns: id of the job, None if the job is a duplicate of an already processed or queued one.
+        """
+        job_id, = self.submit_many([(kind, payload)])
+
+        return job_id
+
+    def submit_many(self, jobs: List[Tuple[str, dict]]) -> List[Optional[int]]:
+        """Enqueue (kind, payload) jobs and wake up idle workers.
+
+        :raises RuntimeError: In case the pool has not been started.
+        :returns: ids of the jobs, None for jobs which are duplicates of already processed or queued ones.
+        """
+        if not self.is_started():
+            raise RuntimeError("Ingestion has not been started, jobs cannot be enqueued")
+
+        if self.queue is None:
+            return self._ingest(jobs)
+
+        if self.fingerprints is None:
+            job_ids: List[Optional[int]] = self.queue.put_many(jobs)
+        else:
+            fingerprints: List[Tuple[str, str]] = [get_fingerprint(kind, payload) for kind, payload in jobs]
+            unique: List[bool] = [not self.is_processed(*fingerprint) for fingerprint in fingerprints]
+
+            # jobs matching the queued ones are dropped by the queue, atomically with the enqueueing
+            queued = iter(self.queue.put_many(
+                [job for job, is_unique in zip(jobs, unique) if is_unique],
+                [fingerprint for fingerprint, is_unique in zip(fingerprints, unique) if is_unique]
+            ))
+            job_ids = [next(queued) if is_unique else None for is_unique in unique]
+
+            for job_id in job_ids:
+                self.stats.inc('duplicates' if job_id is None else 'unique')
+
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+        return job_ids
+
+    def is_processed(self, key: str, fingerprint: str) -> bool:
+        """Check whether the fingerprint matches the last processed job of the same key (build and kind)."""
+        return self.fingerprints is not None and self.fingerprints.get(key) == fingerprint
+
+    def is_started(self) -> bool:
+        """Check whether the pool has been started, jobs can be submitted."""
+        return self._started.is_set()
+
+    def start(self, queue: IngestionQueue = None, fingerprints: FingerprintStore = None):
+        """Start worker threads draining the given queue, along with the thread keeping their leases."""
+        if self.is_started():
+            return
+
+        self.queue = queue
+        self.fingerprints = fingerprints
+
+        self._started.set()
+
+        if queue is None:
+            return
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'ingestion-worker-{i}', daemon=True)
+            thread.start()
+
+            self._threads.append(thread)
+
+        thread = threading.Thread(target=self._keep, name='ingestion-keeper', daemon=True)
+        thread.start()
+
+        self._threads.append(thread)
+
+    def stop(self):
+        """Stop worker threads once they finish the jobs being processed."""
+        self._stopped.set()
+
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def _ingest(self, jobs: List[Tuple[str, dict]]) -> List[Optional[int]]:
+        """Ingest (kind, payload) jobs synchronously, waiting for their build data to be stored.
+
+        :raises Exception: In case a job fails, it is up to the submitter to submit it again.
+        :returns: ids of the jobs, None for jobs which are duplicates of already processed ones.
+        """
+        job_ids: List[Optional[int]] = []
+
+        for kind, payload in jobs:
+            key, fingerprint = get_fingerprint(kind, payload)
+
+            if self.is_processed(key, fingerprint):
+                self.stats.inc('duplicates')
+                job_ids.append(None)
+
+                continue
+
+            self.stats.inc('unique')
+
+            result: Optional[Future] = self.handlers[kind](payload)
+
+            if result is not None:
+                result.result()
+
+            if self.fingerprints is not None:
+                self.fingerprints.set(key, fingerprint)
+
+            job_ids.append(next(self._job_ids))
+
+        return job_ids
+
+    def _work(self):
+        """Process jobs until stopped."""
+        while not self._stopped.is_set():
+            # noinspection PyBroadException
+            try:
+                job: Optional[Job] = self.queue.claim()
+            except Exception as exc:
+                _LOGGER.warning("Failed to claim ingestion job: %s", exc)
+                job = None
+
+            if job is None:
+                # jobs might be enqueued by other processes as well, poll
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+
+                continue
+
+            self._process(job)
+
+    def _keep(self):
+        """Renew leases of the jobs being processed, remove jobs failed past the retention period."""
+        # renewed well before the lease expires, so that a delayed renewal does not lose it
+        interval: float = self.queue.lease / 3
+
+        while not self._stopped.wait(interval):
+            with self._lock:
+                jobs: List[Job] = list(self._processed.values())
+
+            # noinspection PyBroadException
+            try:
+                self.queue.renew(jobs)
+                self.queue.prune()
+            except Exception as exc:
+                _LOGGER.warning("Failed to renew leases of ingestion jobs: %s", exc)
+
+    def _process(self, job: Job):
+        """Process the job and acknowledge or retry it.
+
+        Jobs whose handlers return a future (of build data written behind)
+        are acknowledged or retried once the future is resolved.
+        """
+        # handlers may modify the payload
+        key, fingerprint = get_fingerprint(job.kind, job.payload)
+
+        with self._lock:
+            self._processed[job.job_id] = job
+
+        # noinspection PyBroadException
+        try:
+            result: Optional[Future] = self.handlers[job.kind](job.payload)
+        except Exception as exc:
+            _LOGGER.exception("Ingestion job %d (%s) failed, attempt %d", job.job_id, job.kind, job.attempts)
+
+            with self._lock:
+                self._processed.pop(job.job_id, None)
+
+            self.queue.retry(job, error=str(exc))
+            return
+
+        if result is None:
+            self._complete(job, key, fingerprint)
+        else:
+            result.add_done_callback(lambda future: self._complete(job, key, fingerprint, future.exception()))
+
+    def _complete(self, job: Job, key: str, fingerprint: str, error: BaseException = None):
+        """Acknowledge the processed job, retry it if its build data could not be stored."""
+        with self._lock:
+            self._processed.pop(job.job_id, None)
+
+        # noinspection PyBroadException
+        try:
+            if error is not None:
+                _LOGGER.warning("Ingestion job %d (%s) failed to store build data, attempt %d: %s",
+                                job.job_id, job.kind, job.attempts, error)
+
+                self.queue.retry(job, error=str(error))
+                return
+
+            self.queue.ack(job)
+
+            if self.fingerprints is not None:
+                self.fingerprints.set(key, fingerprint)
+        except Exception as exc:
+            # the job is redelivered once its lease expires
+            _LOGGER.warning("Failed to complete ingestion job %d (%s): %s", job.job_id, job.kind, exc)
+
+
+def ingest_build_started(payload: dict) -> Future:
+    """Store build information of a started build, follow its build log if enabled.
+
+    :returns: future resolved once the build information has been stored.
+    """
+    build_doc: dict = payload['build_doc']
+    build_doc['build_log'] = None
+
+    stored: Future = build_aggregator.submit_build_data(build_doc)
+
+    namespace: Optional[str] = (build_doc.get('ocp_info') or {}).get('namespace')
+
+    if DEFAULT_FOLLOW_LOGS and namespace and build_doc.get('build_status') in ('Running', 'BuildStarted'):
+        log_followers.follow(build_doc['build_id'], namespace)
+
+    return stored
+
+
+def ingest_build_completed(payload: dict) -> Future:
+    """Store build information of a completed build, gather its build log if requested.
+
+    Build logs being followed are finalized by the follower, the completion waits
+    for the reference to the stored build log (the follower attaches it on its own
+    if the completion stops waiting) and gathers the build log only if the follower
+    has failed to. Build logs followed by other instances are waited for by polling
+    their build log index and gathered only if their follower has stalled, the build
+    log index is replaced conditionally, so that the build log is stored only once.
+
+    :returns: future resolved once the build information has been stored.
+    """
+    build_doc: dict = payload['build_doc']
+    build_id: str = build_doc['build_id']
+
+    build_log_object: Optional[dict] = log_followers.wait(build_id, timeout=DEFAULT_LOG_FOLLOWER_WAIT)
+
+    if build_log_object is None and payload.get('get_build_log') and not log_followers.is_following(build_id):
+        document_id: str = build_aggregator.get_build_document_id(build_id)
+
+        build_log_object, etag = build_aggregator.logs.wait_build_log(document_id, timeout=DEFAULT_LOG_FOLLOWER_WAIT)
+
+        if build_log_object is None:
+            # get build log from relevant pod (requires OpenShift authentication)
+            build_log: str = get_build_log(
+                build_id,
+                namespace=payload['namespace'],
+                log_level=payload.get('log_level', DEFAULT_OC_LOG_LEVEL)
+            )
+
+            try:
+                build_log_object = build_aggregator.logs.store_build_log(
+                    document_id, build_log, if_match=etag, if_none_match=None if etag else '*')
+            except PreconditionFailed:
+                # finalized by the follower in the meantime, it attaches the build log on its own
+                _LOGGER.info("Build log of %r has been stored by its follower", build_id)
+
+    if build_log_object is not None and not build_log_object.get('live'):
+        build_doc['build_log_object'] = build_log_object
+
+    return build_aggregator.submit_build_data(build_doc)
+
+
+_START_LOCK = threading.Lock()
+
+ingestion_pool = IngestionWorkerPool(
+    handlers={
+        'build_started': ingest_build_started,
+        'build_completed': ingest_build_completed,
+    }
+)
+
+
+def start_ingestion(data_dir: Optional[str] = DEFAULT_DATA_DIR,
+                    queue: bool = DEFAULT_INGESTION_QUEUE) -> IngestionWorkerPool:
+    """Open the ingestion queue in the data directory and start the ingestion workers.
+
+    Without the queue, build hooks are ingested within the requests. Starting
+    the ingestion again has no effect.
+
+    :raises RuntimeError: In case the queue is enabled, but the data directory is not configured.
+    """
+    if queue and not data_dir:
+        raise RuntimeError("OSIRIS_DATA_DIR has to be set to a directory on a persistent volume, "
+                           "ingestion jobs are queued there")
+
+    with _START_LOCK:
+        if ingestion_pool.is_started():
+            return ingestion_pool
+
+        ingestion_pool.start(
+            IngestionQueue(os.path.join(data_dir, 'ingestion.sqlite')) if queue else None,
+            fingerprints=FingerprintStore(os.path.join(data_dir, 'fingerprints.sqlite'))
+            if DEFAULT_DEDUP and data_dir else None
+        )
+
+    return ingestion_pool
+
+
+def _collect_ingestion_metrics() -> Dict[str, Any]:
+    """Collect depth of the ingestion queue and the most recently failed jobs."""
+    if ingestion_pool.queue is None:
+        # not started yet or ingesting synchronously
+        return {'workers': 0}
+
+    return dict(ingestion_pool.queue.depth(), workers=ingestion_pool.workers,
+                failed_jobs=ingestion_pool.queue.failed())
+
+
+register_metric('ingestion', _collect_ingestion_metrics)
+register_metric('deduplication', lambda: dict(
+    ingestion_pool.stats.to_dict(),
+    hit_rate=ingestion_pool.stats.ratio('duplicates', 'duplicates', 'unique')
+))
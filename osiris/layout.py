@@ -0,0 +1,192 @@
+# Osiris: Build log aggregator.
+
+"""Layout of keys of build information documents.
+
+In the flat layout, documents are stored right under the prefix by their ids.
+In the date layout, documents are stored in daily partitions (`yyyy/mm/dd/<id>`)
+by the first timestamp of the build, so that builds of a time window can be listed
+(or expired by lifecycle rules) by the prefixes of their days. A pointer object is stored
+under the id instead, its metadata keep the partition so that a HEAD request resolves
+the key. The partition of a build is assigned once, by its first write in the layout,
+later updates are stored in the same partition whatever their timestamps are. Documents
+stored in the flat layout are moved to their partition the next time they are stored.
+"""
+
+import json
+import threading
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from thoth.common.helpers import _DATETIME_FORMAT_STRING  # noqa
+
+from osiris import DEFAULT_KEY_LAYOUT
+from osiris import DEFAULT_KEY_LAYOUT_CACHE_SIZE
+
+from osiris.objects import ObjectStore
+from osiris.objects import PreconditionFailed
+
+
+LAYOUTS = ('flat', 'date')
+
+
+class KeyLayout(object):
+    """Keys of build information documents in the configured layout."""
+
+    def __init__(self, objects: ObjectStore, name: str = DEFAULT_KEY_LAYOUT,
+                 cache_size: int = DEFAULT_KEY_LAYOUT_CACHE_SIZE):
+        """Initialize KeyLayout.
+
+        :raises ValueError: In case of unknown layout.
+        """
+        if name not in LAYOUTS:
+            raise ValueError(f"Key layout {name!r} is not supported, supported layouts: {list(LAYOUTS)}")
+
+        self.objects = objects
+        self.name = name
+        self.cache_size = cache_size
+
+        # pointers never change once stored, so the resolved keys are not revalidated
+        self._lock = threading.Lock()
+        self._keys: Dict[str, str] = OrderedDict()
+
+    @property
+    def partitioned(self) -> bool:
+        """Check whether the documents are stored in date partitions."""
+        return self.name == 'date'
+
+    @staticmethod
+    def get_partition(*build_docs: dict) -> str:
+        """Get partition of the build by the first (or last) timestamp of the first of the documents having one.
+
+        The current day is used if none of the documents has a timestamp.
+        """
+        for build_doc in build_docs:
+            for field in ('first_timestamp', 'last_timestamp'):
+                timestamp = build_doc.get(field)
+
+                if isinstance(timestamp, datetime):
+                    return timestamp.strftime('%Y/%m/%d')
+
+                try:
+                    return datetime.strptime(timestamp, _DATETIME_FORMAT_STRING).strftime('%Y/%m/%d')
+                except (TypeError, ValueError):
+                    pass
+
+        return datetime.utcnow().strftime('%Y/%m/%d')
+
+    def get_key(self, document_id: str) -> str:
+        """Get key the given document is stored under.
+
+        The id itself is returned for documents stored in the flat layout and missing documents.
+        """
+        if not self.partitioned:
+            return document_id
+
+        with self._lock:
+            key: Optional[str] = self._keys.get(document_id)
+            if key is not None:
+                self._keys.move_to_end(document_id)
+
+                return key
+
+        obj = self.objects.object(document_id)
+
+        try:
+            obj.load()
+        except ClientError as exc:
+            if exc.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return document_id
+            raise
+
+        partition: Optional[str] = (obj.metadata or {}).get('partition')
+        if not partition:
+            return document_id  # not moved to the date layout yet
+
+        key = f"{partition}/{document_id}"
+        self._remember(document_id, key)
+
+        return key
+
+    def store(self, document_id: str, build_doc: dict, put: Callable[[str], None]):
+        """Store the document by calling `put` with its key.
+
+        Documents stored in a partition already are stored there. New documents
+        (and documents stored in the flat layout) are assigned a partition by
+        the timestamps of the stored document, if any, or of the update. The pointer
+        is stored only once the document has been stored, so that it never refers
+        to a missing document, and only if neither the pointer has been stored nor
+        the flat document changed in the meantime. Otherwise the copy is removed
+        and the update is stored again, in the partition of the concurrent writer.
+
+        :raises PreconditionFailed: In case the pointer could not be stored by any of the attempts.
+        """
+        for _ in range(self.objects.conditional_write_attempts):
+            key: str = self.get_key(document_id)
+
+            if not self.partitioned or key != document_id:
+                put(key)
+                return
+
+            partition, stored, etag = self._retrieve(document_id)
+
+            if partition is not None:
+                # pointer stored concurrently
+                self._remember(document_id, f"{partition}/{document_id}")
+                continue
+
+            partition = self.get_partition(stored or {}, build_doc)
+            key = f"{partition}/{document_id}"
+
+            put(key)
+
+            try:
+                self.objects.store_document(
+                    {'build_id': build_doc.get('build_id'), 'key': key}, document_id,
+                    if_match=etag, if_none_match=None if etag else '*', metadata={'partition': partition}
+                )
+            except PreconditionFailed:
+                if self.get_key(document_id) != key:
+                    self.objects.delete_object(key)
+
+                continue
+
+            self._remember(document_id, key)
+            return
+
+        raise PreconditionFailed(f"Partition of document {document_id!r} has been changed concurrently by each of "
+                                 f"{self.objects.conditional_write_attempts} attempts to store it")
+
+    def clear(self):
+        """Forget the resolved keys."""
+        with self._lock:
+            self._keys.clear()
+
+    def _remember(self, document_id: str, key: str):
+        with self._lock:
+            self._keys[document_id] = key
+
+            while len(self._keys) > self.cache_size:
+                self._keys.popitem(last=False)
+
+    def _retrieve(self, document_id: str) -> Tuple[Optional[str], Optional[dict], Optional[str]]:
+        """Retrieve object stored under the id: partition of the pointer or the flat document, along with its ETag.
+
+        :returns: (partition, None, ETag) for pointers, (None, document, ETag) for documents
+            stored in the flat layout and (None, None, None) if there is no object.
+        """
+        try:
+            response: dict = self.objects.object(document_id).get()
+        except ClientError as exc:
+            if exc.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None, None, None
+            raise
+
+        partition: Optional[str] = (response.get('Metadata') or {}).get('partition')
+        if partition:
+            return partition, None, response['ETag']
+
+        return None, json.loads(response['Body'].read().decode('utf-8')), response['ETag']
@@ -0,0 +1,322 @@
+# Osiris: Build log aggregator.
+
+"""Build log storage format.
+
+Build logs are compressed in independently decompressible blocks
+(concatenated gzip members or zstd frames are still a valid stream),
+so that a byte range of the build log can be mapped onto a byte range
+of the stored object. The block table is kept in the build log index
+stored next to the build log, along with byte offsets of every Nth line,
+so that a range of lines can be mapped onto a byte range as well.
+"""
+
+import bisect
+
+from array import array
+from typing import Iterable, Iterator, List, Tuple
+
+from osiris import DEFAULT_LOG_BLOCK_SIZE
+from osiris import DEFAULT_LOG_LINE_INTERVAL
+from osiris.compression import Codec
+
+
+class BlockCompressor(object):
+    """Incremental compressor producing independently decompressible blocks."""
+
+    def __init__(self, codec: Codec, block_size: int = DEFAULT_LOG_BLOCK_SIZE):
+        """Initialize BlockCompressor."""
+        self.codec = codec
+        self.block_size = block_size
+
+        # (raw offset, stored offset) of each block
+        self.blocks: List[Tuple[int, int]] = []
+
+        self.size = 0
+        self.stored_size = 0
+
+        self._buffer = bytearray()
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress the data, return compressed blocks completed so far."""
+        self._buffer += data
+
+        blobs: List[bytes] = []
+        while len(self._buffer) >= self.block_size:
+            blobs.append(self._compress_block(bytes(self._buffer[:self.block_size])))
+
+            del self._buffer[:self.block_size]
+
+        return b''.join(blobs)
+
+    def flush(self) -> bytes:
+        """Compress the remaining data."""
+        blob = b''
+
+        if self._buffer:
+            blob = self._compress_block(bytes(self._buffer))
+
+            self._buffer.clear()
+
+        return blob
+
+    def _compress_block(self, data: bytes) -> bytes:
+        blob = self.codec.compress(data)
+
+        self.blocks.append((self.size, self.stored_size))
+
+        self.size += len(data)
+        self.stored_size += len(blob)
+
+        return blob
+
+
+class LineIndexer(object):
+    """Incremental indexer of byte offsets of every Nth line."""
+
+    def __init__(self, interval: int = DEFAULT_LOG_LINE_INTERVAL):
+        """Initialize LineIndexer."""
+        self.interval = interval
+
+        # byte offset of the line 0, N, 2N, ...
+        self.offsets = array('Q', [0])
+
+        self.size = 0
+        self.newlines = 0
+
+        self._last_byte = b''
+
+    @property
+    def line_count(self) -> int:
+        """Return number of lines indexed so far, unterminated last line included."""
+        return self.newlines + (1 if self._last_byte not in (b'', b'\n') else 0)
+
+    def feed(self, chunk: bytes):
+        """Index the next chunk of the build log."""
+        newlines: int = chunk.count(b'\n')
+
+        if self.newlines % self.interval + newlines < self.interval:
+            # no checkpoint in this chunk
+            self.newlines += newlines
+        else:
+            position: int = chunk.find(b'\n')
+            while position != -1:
+                self.newlines += 1
+
+                if self.newlines % self.interval == 0:
+                    self.offsets.append(self.size + position + 1)
+
+                position = chunk.find(b'\n', position + 1)
+
+        if chunk:
+            self._last_byte = chunk[-1:]
+
+        self.size += len(chunk)
+
+
+class LogIndex(object):
+    """Index of a stored build log."""
+
+    def __init__(self,
+                 size: int,
+                 stored_size: int,
+                 encoding: str = Codec.NAME,
+                 blocks: List[Tuple[int, int]] = None,
+                 line_count: int = None,
+                 line_interval: int = None,
+                 lines: Iterable[int] = None,
+                 live: bool = False,
+                 key: str = None):
+        """Initialize LogIndex."""
+        self.size = size
+        self.stored_size = stored_size
+
+        self.encoding = encoding
+
+        self.blocks: List[Tuple[int, int]] = [tuple(block) for block in blocks or []]
+
+        self.line_count = line_count
+        self.line_interval = line_interval
+
+        self.lines = array('Q', lines or [])
+
+        # build log is still being followed, blocks are stored as separate parts
+        self.live = live
+        # key of the object the build log is stored in, None if stored under the unversioned key
+        self.key = key
+
+    @classmethod
+    def from_compressor(cls,
+                        compressor: BlockCompressor,
+                        indexer: LineIndexer = None,
+                        live: bool = False,
+                        key: str = None) -> "LogIndex":
+        """Create LogIndex from finished (or flushed, if live) block compressor and line indexer."""
+        return cls(
+            size=compressor.size,
+            stored_size=compressor.stored_size,
+            encoding=compressor.codec.NAME,
+            blocks=compressor.blocks,
+            line_count=indexer.line_count if indexer else None,
+            line_interval=indexer.interval if indexer else None,
+            lines=indexer.offsets if indexer else None,
+            live=live,
+            key=key
+        )
+
+    @property
+    def has_lines(self) -> bool:
+        """Return whether the index contains line offsets."""
+        return bool(self.line_interval and self.lines)
+
+    @classmethod
+    def from_dict(cls, dct: dict) -> "LogIndex":
+        """Create LogIndex from its dictionary representation."""
+        return cls(**dct)
+
+    def to_dict(self) -> dict:
+        """Return dictionary representation of the index."""
+        return {
+            'size': self.size,
+            'stored_size': self.stored_size,
+            'encoding': self.encoding,
+            'blocks': self.blocks,
+            'line_count': self.line_count,
+            'line_interval': self.line_interval,
+            'lines': self.lines.tolist(),
+            'live': self.live,
+            'key': self.key,
+        }
+
+    def locate(self, start: int, end: int) -> Tuple[int, int, int]:
+        """Locate raw byte range [start, end) in the stored object.
+
+        :returns: stored byte range [stored_start, stored_end) covering the raw range
+                  and number of raw bytes to be skipped at the beginning of the decompressed range.
+        """
+        if self.encoding == Codec.NAME or not self.blocks:
+            return start, end, 0
+
+        first, last, skip = self.locate_blocks(start, end)
+
+        stored_start: int = self.blocks[first][1]
+        stored_end: int = self.blocks[last][1] if last < len(self.blocks) else self.stored_size
+
+        return stored_start, stored_end, skip
+
+    def locate_blocks(self, start: int, end: int) -> Tuple[int, int, int]:
+        """Locate raw byte range [start, end) in the blocks.
+
+        :returns: blocks [first, last) covering the raw range
+                  and number of raw bytes to be skipped at the beginning of the first block.
+        """
+        raw_offsets: List[int] = [raw_offset for raw_offset, _ in self.blocks]
+
+        first: int = max(bisect.bisect_right(raw_offsets, start) - 1, 0)
+        last: int = bisect.bisect_left(raw_offsets, end)
+
+        return first, last, start - self.blocks[first][0]
+
+    def locate_lines(self, first: int, last: int) -> Tuple[int, int, int]:
+        """Locate lines [first, last) (numbered from 0) in the raw build log.
+
+        :returns: raw byte range [start, end) covering the lines
+                  and number of lines to be skipped at the beginning of the range.
+        """
+        if first >= self.line_count:
+            return self.size, self.size, 0
+
+        last = max(min(last, self.line_count), first)
+
+        checkpoint: int = first // self.line_interval
+        start: int = self.lines[checkpoint]
+
+        checkpoint_end: int = -(-last // self.line_interval)
+        end: int = self.lines[checkpoint_end] if checkpoint_end < len(self.lines) else self.size
+
+        return start, end, first - checkpoint * self.line_interval
+
+
+def slice_chunks(chunks: Iterable[bytes], skip: int = 0, length: int = None) -> Iterator[bytes]:
+    """Skip `skip` bytes of the chunked stream and yield at most `length` following bytes."""
+    for chunk in chunks:
+        if skip:
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+
+            chunk, skip = chunk[skip:], 0
+
+        if length is not None:
+            if length <= len(chunk):
+                if length:
+                    yield chunk[:length]
+
+                return
+
+            length -= len(chunk)
+
+        if chunk:
+            yield chunk
+
+
+def slice_lines(chunks: Iterable[bytes], skip: int = 0, count: int = None) -> Iterator[bytes]:
+    """Skip `skip` lines of the chunked stream and yield at most `count` following lines."""
+    if count is not None and count <= 0:
+        return
+
+    for chunk in chunks:
+        while skip and chunk:
+            position: int = chunk.find(b'\n')
+
+            if position == -1:
+                chunk = b''
+            else:
+                chunk = chunk[position + 1:]
+                skip -= 1
+
+        if not chunk:
+            continue
+
+        if count is not None:
+            newlines: int = chunk.count(b'\n')
+
+            if newlines >= count:
+                position = -1
+                for _ in range(count):
+                    position = chunk.find(b'\n', position + 1)
+
+                yield chunk[:position + 1]
+
+                return
+
+            count -= newlines
+
+        yield chunk
+
+
+def tail_lines(chunks: Iterable[bytes], count: int) -> Iterator[bytes]:
+    """Yield the last `count` lines of the chunked stream, the whole stream is read."""
+    if count <= 0:
+        return
+
+    data: bytes = b''.join(chunks)
+
+    # newline terminating the last line is not a start of a new one
+    position: int = len(data) - 1 if data.endswith(b'\n') else len(data)
+    for _ in range(count):
+        position = data.rfind(b'\n', 0, position)
+        if position == -1:
+            break
+
+    yield data[position + 1:]
+
+
+def decompress_chunks(chunks: Iterable[bytes], codec: Codec) -> Iterator[bytes]:
+    """Decompress the chunked stream incrementally."""
+    decompressor = codec.decompressor()
+
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+
+        if data:
+            yield data
@@ -0,0 +1,317 @@
+# Osiris: Build log aggregator.
+
+"""Full-text index of build log lines.
+
+Lines of build logs are indexed by an SQLite FTS5 table as the build logs are stored.
+Row id of each line is made of the sequence number of the indexed build log and the line
+number, so that matches map to builds and lines without any other lookup. With SQLite 3.43
+or newer the table is contentless (it keeps only the tokens, not the lines themselves),
+older versions keep the lines as well, so that lines of replaced build logs can be deleted.
+SQLite built without FTS5 can not index build logs at all, the search is not available then.
+
+The index is local to each instance, build logs stored by other instances are indexed
+(and build logs no longer stored are removed) by the periodic reconciliation.
+"""
+
+import logging
+import sqlite3
+import time
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from osiris import DEFAULT_LOG_SEARCH
+from osiris import DEFAULT_LOG_SEARCH_TIMEOUT
+
+from osiris.sqlite import SQLiteDatabase
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# bits of the row id taken by the line number
+_LINE_BITS = 24
+
+MAX_LINES = (1 << _LINE_BITS) - 1
+MAX_LINE_LENGTH = 4096
+
+# contentless tables support deletes since SQLite 3.43
+_LINES_TABLE = "fts5(text, content='', contentless_delete=1, columnsize=0)" \
+    if sqlite3.sqlite_version_info >= (3, 43, 0) else "fts5(text, columnsize=0)"
+
+# age (in seconds) of sequences reserved by writers which have never published them, considered abandoned
+ABANDONED_SEQUENCE_AGE = 24 * 3600
+
+
+class LogSearchIndex(SQLiteDatabase):
+    """Full-text index of build log lines.
+
+    Each build log is indexed under a new sequence number, which replaces the previous one
+    of the document only once the whole build log has been indexed. Lines of the replaced
+    build logs are deleted then, lines of build logs whose indexing has been aborted
+    are deleted by the writer or pruned once abandoned.
+    """
+
+    def __init__(self, path: str, timeout: float = DEFAULT_LOG_SEARCH_TIMEOUT):
+        """Initialize LogSearchIndex.
+
+        Indexes created by a different table definition (e.g. before lines could be deleted)
+        are dropped, they are rebuilt by the reconciliation.
+
+        :raises sqlite3.OperationalError: In case SQLite has been built without FTS5.
+        """
+        super().__init__(path)
+
+        self.timeout = timeout
+
+        with self._transaction() as conn:
+            row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'lines'").fetchone()
+
+            if row is not None and not row[0].endswith(_LINES_TABLE):
+                _LOGGER.info("Dropping build log search index of an incompatible version, it is going to be rebuilt")
+
+                for table in ('lines', 'documents', 'sequences'):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sequences (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    document_id TEXT NOT NULL,
+                    reserved_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    document_id TEXT PRIMARY KEY,
+                    seq INTEGER NOT NULL UNIQUE,
+                    line_count INTEGER NOT NULL,
+                    indexed_at REAL NOT NULL
+                )
+            """)
+            conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS lines USING {_LINES_TABLE}")
+
+    def reserve(self, document_id: str) -> int:
+        """Reserve sequence number of a build log of the given document."""
+        with self._transaction() as conn:
+            return conn.execute("INSERT INTO sequences (document_id, reserved_at) VALUES (?, ?)",
+                                (document_id, time.time())).lastrowid
+
+    def insert(self, seq: int, lines: List[Tuple[int, str]]):
+        """Index (line number, text) pairs of the build log with the given sequence number."""
+        with self._transaction() as conn:
+            conn.executemany("INSERT INTO lines (rowid, text) VALUES (?, ?)", [
+                (seq << _LINE_BITS | line, text) for line, text in lines
+            ])
+
+    def publish(self, document_id: str, seq: int, line_count: int):
+        """Make the build log indexed under the sequence number searchable.
+
+        Lines of the build logs of the document indexed under earlier sequence numbers are deleted.
+        """
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)",
+                         (document_id, seq, line_count, time.time()))
+
+            _delete_sequences(conn, [
+                earlier for earlier, in conn.execute(
+                    "SELECT seq FROM sequences WHERE document_id = ? AND seq < ?", (document_id, seq))
+            ])
+
+    def discard(self, seq: int):
+        """Delete lines of the build log whose indexing has been aborted."""
+        with self._transaction() as conn:
+            _delete_sequences(conn, [seq])
+
+    def remove(self, document_id: str):
+        """Remove the indexed build log of the given document."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT seq FROM documents WHERE document_id = ?", (document_id, )).fetchone()
+            if row is None:
+                return
+
+            conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id, ))
+
+            _delete_sequences(conn, [
+                seq for seq, in conn.execute(
+                    "SELECT seq FROM sequences WHERE document_id = ? AND seq <= ?", (document_id, row[0]))
+            ])
+
+    def prune(self, age: float = ABANDONED_SEQUENCE_AGE) -> int:
+        """Delete lines of build logs reserved more than `age` seconds ago and never published.
+
+        :returns: number of the build logs deleted.
+        """
+        with self._transaction() as conn:
+            abandoned: List[int] = [seq for seq, in conn.execute(
+                "SELECT seq FROM sequences WHERE reserved_at < ? AND seq NOT IN (SELECT seq FROM documents)",
+                (time.time() - age, )
+            )]
+
+            _delete_sequences(conn, abandoned)
+
+        return len(abandoned)
+
+    def indexed(self) -> Dict[str, float]:
+        """Return time each of the indexed build logs has been indexed at, mapped by document id."""
+        return dict(self._conn.execute("SELECT document_id, indexed_at FROM documents"))
+
+    def clear(self):
+        """Remove all of the indexed build logs."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM lines")
+            conn.execute("DELETE FROM documents")
+            conn.execute("DELETE FROM sequences")
+
+    def count(self) -> int:
+        """Return number of indexed build logs."""
+        count, = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()
+
+        return count
+
+    def search(self, query: str, limit: int = 100, max_lines: int = 10) -> Tuple[List[dict], bool]:
+        """Search build log lines containing all words of the query in the given order.
+
+        Recently indexed build logs are returned first. The search stops once
+        `limit` build logs have been found or the timeout has elapsed.
+
+        :raises ValueError: In case the query contains no words.
+        :returns: dicts with `document_id`, the first `max_lines` matching (1-based) line numbers
+                  and `match_count` of each build log found, whether the search has been stopped early.
+        """
+        phrase = '"{}"'.format(query.replace('"', '""'))
+
+        results: List[dict] = []
+        documents: Dict[int, Optional[dict]] = {}
+
+        deadline: float = time.monotonic() + self.timeout
+        conn: sqlite3.Connection = self._conn
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+
+        try:
+            for rowid, in conn.execute("SELECT rowid FROM lines WHERE lines MATCH ? ORDER BY rowid DESC", (phrase, )):
+                seq, line = rowid >> _LINE_BITS, rowid & MAX_LINES
+
+                if seq not in documents:
+                    if len(results) >= limit:
+                        return _finish(results, max_lines), True
+
+                    row = conn.execute("SELECT document_id FROM documents WHERE seq = ?", (seq, )).fetchone()
+
+                    # lines of replaced build logs
+                    documents[seq] = {'document_id': row[0], 'lines': [], 'match_count': 0} if row else None
+                    if row:
+                        results.append(documents[seq])
+
+                result: Optional[dict] = documents[seq]
+                if result is not None:
+                    result['match_count'] += 1
+                    result['lines'].append(line)
+        except sqlite3.OperationalError as exc:
+            if str(exc) == 'interrupted':
+                _LOGGER.debug("Build log search for %r has timed out after %ss", query, self.timeout)
+
+                return _finish(results, max_lines), True
+
+            if 'syntax error' in str(exc) or 'fts5' in str(exc):
+                raise ValueError(f"Invalid search query {query!r}: {exc}") from exc
+            raise
+        finally:
+            conn.set_progress_handler(None, 0)
+
+        return _finish(results, max_lines), False
+
+
+def _delete_sequences(conn: sqlite3.Connection, seqs: Iterable[int]):
+    """Delete lines of the build logs indexed under the given sequence numbers along with the sequences."""
+    for seq in seqs:
+        conn.execute("DELETE FROM lines WHERE rowid BETWEEN ? AND ?",
+                     (seq << _LINE_BITS, seq << _LINE_BITS | MAX_LINES))
+        conn.execute("DELETE FROM sequences WHERE seq = ?", (seq, ))
+
+
+def _finish(results: List[dict], max_lines: int) -> List[dict]:
+    """Sort lines of the found build logs and keep only the first `max_lines` of them."""
+    for result in results:
+        result['lines'] = sorted(result['lines'])[:max_lines]
+
+    return results
+
+
+class LogLineWriter(object):
+    """Incremental indexer of lines of a build log being stored.
+
+    Lines are indexed in batches as the build log arrives, but they become searchable only
+    once the writer is closed. Writers of a disabled index (None) do nothing.
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, index: Optional[LogSearchIndex], document_id: str):
+        """Initialize LogLineWriter."""
+        self.index = index
+        self.document_id = document_id
+
+        self.line_count = 0
+
+        self._seq: Optional[int] = None
+        self._partial = ''
+        self._batch: List[Tuple[int, str]] = []
+
+    def feed(self, text: str):
+        """Index lines of the next chunk of decoded build log."""
+        if self.index is None or not text:
+            return
+
+        lines: List[str] = (self._partial + text).split('\n')
+        self._partial = lines.pop()[:MAX_LINE_LENGTH]
+
+        for line in lines:
+            self._add(line)
+
+    def close(self):
+        """Index the remaining lines and make the build log searchable."""
+        if self.index is None:
+            return
+
+        if self._partial:
+            self._add(self._partial)
+            self._partial = ''
+
+        self._flush()
+        self.index.publish(self.document_id, self._seq, self.line_count)
+
+    def abort(self):
+        """Discard the lines indexed so far, the build log is not going to be published."""
+        if self.index is None or self._seq is None:
+            return
+
+        self.index.discard(self._seq)
+        self._seq = None
+
+    def _add(self, line: str):
+        self.line_count += 1
+
+        if self.line_count <= MAX_LINES and line.strip():
+            self._batch.append((self.line_count, line[:MAX_LINE_LENGTH]))
+
+        if len(self._batch) >= self.BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._seq is None:
+            self._seq = self.index.reserve(self.document_id)
+
+        if self._batch:
+            self.index.insert(self._seq, self._batch)
+            self._batch = []
+
+
+def open_log_search_index(path: str, enabled: bool = DEFAULT_LOG_SEARCH) -> Optional[LogSearchIndex]:
+    """Open the build log search index, None if it is disabled or SQLite lacks FTS5."""
+    if not enabled:
+        return None
+
+    try:
+        return LogSearchIndex(path)
+    except sqlite3.OperationalError as exc:
+        _LOGGER.warning("Build log search is not available: %s", exc)
+
+        return None
@@ -0,0 +1,681 @@
+# Osiris: Build log aggregator.
+
+"""Build logs stored in Ceph as separate objects next to the build information documents.
+
+Each build log is stored in an object of its own version, the build log index (which
+refers to the object) is replaced only once the object has been stored, so that
+concurrent reads never apply offsets of one version to another. Replaced objects
+are removed once no read started before the replacement can be in progress.
+"""
+
+import codecs
+import itertools
+import re
+import tempfile
+import time
+import uuid
+
+from collections import defaultdict
+
+from functools import partial
+
+from typing import Callable, Container, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from thoth.storages.exceptions import NotFoundError
+
+from osiris import DEFAULT_LOG_BLOCK_SIZE
+from osiris import DEFAULT_LOG_CHUNK_SIZE
+from osiris import DEFAULT_LOG_CODEC
+from osiris import DEFAULT_LOG_PUBLISH_INTERVAL
+from osiris import DEFAULT_LOG_VERSION_TTL
+
+from osiris.compression import Codec, get_codec
+from osiris.logs import BlockCompressor, LineIndexer, LogIndex
+from osiris.logs import decompress_chunks, slice_chunks, slice_lines, tail_lines
+from osiris.logsearch import LogLineWriter, LogSearchIndex
+from osiris.objects import ObjectStore, PreconditionFailed
+from osiris.summary import LogSummary
+
+# suffix of the keys of versioned build log objects
+_VERSION = re.compile(r'[0-9a-f]{32}')
+
+
+class BuildLogStore(object):
+    """Build logs compressed in independent blocks, indexed and summarized as they are stored."""
+
+    PREFIX = 'logs/'
+
+    def __init__(self, objects: ObjectStore, log_search: LogSearchIndex = None, log_codec: str = DEFAULT_LOG_CODEC):
+        """Initialize BuildLogStore.
+
+        :raises ValueError: In case of unknown codec.
+        """
+        self.objects = objects
+        self.ceph = objects.ceph
+
+        self.log_search = log_search
+        self.log_codec: Codec = get_codec(log_codec)
+
+    @classmethod
+    def get_build_log_key(cls, document_id: str, version: str = None) -> str:
+        """Get object key of the given version of the build log stored for the given document.
+
+        Build logs stored before the versions were introduced are stored without one.
+        """
+        if version is None:
+            return f"{cls.PREFIX}{document_id}"
+
+        return f"{cls.PREFIX}{document_id}.{version}"
+
+    @classmethod
+    def get_build_log_index_key(cls, document_id: str) -> str:
+        """Get object key of the build log index stored for the given document."""
+        return f"{cls.PREFIX}{document_id}.index"
+
+    @classmethod
+    def get_build_log_summary_key(cls, document_id: str) -> str:
+        """Get object key of the summary of the build log stored for the given document."""
+        return f"{cls.PREFIX}{document_id}.summary"
+
+    @classmethod
+    def get_build_log_live_key(cls, document_id: str, version: str = None) -> str:
+        """Get key prefix of the parts of the given version of the build log followed for the given document.
+
+        Without the version, the prefix covers parts of all the versions.
+        """
+        if version is None:
+            return f"{cls.PREFIX}{document_id}.live/"
+
+        return f"{cls.PREFIX}{document_id}.live/{version}/"
+
+    def store_build_log(self, document_id: str, data: str, metadata: dict = None,
+                        if_match: str = None, if_none_match: str = None) -> dict:
+        """Store the build log as a separate object in Ceph, see `store_build_log_stream` for the conditions.
+
+        :returns: build log reference to be kept in the build information document.
+        """
+        return self.store_build_log_stream(document_id, [data.encode('utf-8')], metadata=metadata, validate=False,
+                                           if_match=if_match, if_none_match=if_none_match)
+
+    def store_build_log_stream(self, document_id: str, chunks: Iterable[bytes],
+                               metadata: dict = None, validate: bool = True,
+                               if_match: str = None, if_none_match: str = None) -> dict:
+        """Store the build log streamed in chunks as a separate object in Ceph.
+
+        The build log is compressed by the configured codec in independent blocks,
+        the codec name is recorded in the returned reference and as the object Content-Encoding.
+        The block table and line offsets are stored in the build log index next to the build log.
+        Chunks are validated, indexed and compressed as they arrive and only a single upload
+        part is kept in memory, the stored build log is replaced (by switching the build log
+        index to the new version) only once the stream ends.
+
+        :param if_match: ETag the build log index has to have for the build log to be replaced.
+        :param if_none_match: `*` to store the build log only if there is none stored.
+        :raises UnicodeDecodeError: In case the build log is not valid UTF-8, nothing is stored.
+        :raises PreconditionFailed: In case the condition is not met, nothing is stored.
+        :returns: build log reference to be kept in the build information document.
+        """
+        compressor = BlockCompressor(self.log_codec)
+        indexer = LineIndexer()
+        decoder = codecs.getincrementaldecoder('utf-8')('strict' if validate else 'replace')
+        lines = LogLineWriter(self.log_search, document_id)
+        summary = LogSummary()
+
+        key: str = self.get_build_log_key(document_id, version=uuid.uuid4().hex)
+
+        try:
+            with self.objects.object_writer(key, encoding=self.log_codec.NAME) as writer:
+                for chunk in chunks:
+                    text: str = decoder.decode(chunk)
+                    lines.feed(text)
+                    summary.feed(chunk, text)
+
+                    indexer.feed(chunk)
+                    writer.write(compressor.compress(chunk))
+
+                text = decoder.decode(b'', final=True)
+                lines.feed(text)
+                summary.feed(b'', text)
+
+                writer.write(compressor.flush())
+        except Exception:
+            lines.abort()
+            raise
+
+        log_index = LogIndex.from_compressor(compressor, indexer, key=key)
+
+        try:
+            self.objects.store_document(log_index.to_dict(), self.get_build_log_index_key(document_id),
+                                        if_match=if_match, if_none_match=if_none_match)
+        except PreconditionFailed:
+            lines.abort()
+            self.objects.delete_object(key)
+            raise
+        except Exception:
+            lines.abort()
+            raise
+
+        # indexed after the build log index has been replaced, so that it is not indexed again
+        lines.close()
+        self.store_build_log_summary(document_id, summary.to_dict())
+
+        return self.get_build_log_reference(document_id, log_index, metadata=metadata)
+
+    def get_build_log_reference(self, document_id: str, log_index: LogIndex, metadata: dict = None) -> dict:
+        """Get reference to the build log of the given document to be kept in the build information document."""
+        build_log_object = {
+            'key': log_index.key or self.get_build_log_key(document_id),
+            'index_key': self.get_build_log_index_key(document_id),
+            'size': log_index.size,
+            'stored_size': log_index.stored_size,
+            'line_count': log_index.line_count,
+            'encoding': log_index.encoding,
+            'metadata': metadata,
+        }
+
+        if log_index.live:
+            build_log_object.update(key=log_index.key or self.get_build_log_live_key(document_id), live=True)
+
+        return build_log_object
+
+    def store_live_build_log(self,
+                             document_id: str,
+                             chunks: Iterable[bytes],
+                             publish_interval: float = DEFAULT_LOG_PUBLISH_INTERVAL) -> dict:
+        """Store build log of a running build incrementally, as its chunks arrive.
+
+        Each compressed block is stored as a separate part object and the build log index
+        marked as live is republished every `publish_interval` seconds, so that the build log
+        can be read while the build is in progress. Once the chunks are exhausted,
+        the parts are concatenated into a new version of the build log object (concatenated
+        blocks are still a valid stream), the final index is stored and the parts are removed.
+
+        The build log index is the claim on the build log: it is published before any part
+        is stored, taking over the build log from a previous follower, and each following
+        publication is conditioned on the last one, so that the follower taken over (or whose
+        build log has been gathered as a whole in the meantime) stops on its next publication.
+
+        :raises PreconditionFailed: In case the build log has been finalized or taken over.
+        :returns: build log reference to be kept in the build information document.
+        """
+        version: str = uuid.uuid4().hex
+        live_key: str = self.get_build_log_live_key(document_id, version=version)
+        index_key: str = self.get_build_log_index_key(document_id)
+        key: str = self.get_build_log_key(document_id, version=version)
+
+        compressor = BlockCompressor(self.log_codec)
+        indexer = LineIndexer()
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        lines = LogLineWriter(self.log_search, document_id)
+        summary = LogSummary()
+
+        stored_index, etag = self.objects.retrieve_document(index_key)
+        if stored_index is not None and not stored_index.get('live', False):
+            raise PreconditionFailed(f"Build log of {document_id!r} has been finalized already")
+
+        def publish(log_index: LogIndex) -> str:
+            return self.objects.store_document(log_index.to_dict(), index_key,
+                                               if_match=etag, if_none_match=None if etag else '*')
+
+        etag = publish(LogIndex.from_compressor(compressor, indexer, live=True, key=live_key))
+
+        try:
+            # compressed blocks are kept for the final object, spilled to disk if large
+            with tempfile.SpooledTemporaryFile(max_size=DEFAULT_LOG_BLOCK_SIZE * 8) as stored:
+
+                def store_parts(compress: Callable[[], bytes]):
+                    first_block: int = len(compressor.blocks)
+
+                    blob: bytes = compress()
+                    blocks = compressor.blocks[first_block:]
+
+                    for offset, (_, stored_offset) in enumerate(blocks):
+                        stored_end = blocks[offset + 1][1] if offset + 1 < len(blocks) else compressor.stored_size
+                        part: bytes = blob[stored_offset - blocks[0][1]:stored_end - blocks[0][1]]
+
+                        self.objects.put_object(f"{live_key}{first_block + offset:08d}", part,
+                                                encoding=self.log_codec.NAME)
+
+                    stored.write(blob)
+
+                published: float = time.monotonic()
+
+                for chunk in chunks:
+                    text: str = decoder.decode(chunk)
+                    lines.feed(text)
+                    summary.feed(chunk, text)
+
+                    indexer.feed(chunk)
+                    store_parts(partial(compressor.compress, chunk))
+
+                    if time.monotonic() - published >= publish_interval:
+                        store_parts(compressor.flush)
+
+                        etag = publish(LogIndex.from_compressor(compressor, indexer, live=True, key=live_key))
+
+                        published = time.monotonic()
+
+                store_parts(compressor.flush)
+
+                stored.seek(0)
+                self.objects.put_object(key, stored, encoding=self.log_codec.NAME)
+        except Exception:
+            lines.abort()
+            raise
+
+        log_index = LogIndex.from_compressor(compressor, indexer, key=key)
+
+        try:
+            publish(log_index)
+        except PreconditionFailed:
+            lines.abort()
+            self.objects.delete_object(key)
+            raise
+        except Exception:
+            lines.abort()
+            raise
+
+        self.purge_live_build_log(document_id)
+
+        text = decoder.decode(b'', final=True)
+        lines.feed(text)
+        lines.close()
+        summary.feed(b'', text)
+        self.store_build_log_summary(document_id, summary.to_dict())
+
+        return self.get_build_log_reference(document_id, log_index)
+
+    def wait_build_log(self, document_id: str, timeout: float,
+                       poll_interval: float = 1.0) -> Tuple[Optional[dict], Optional[str]]:
+        """Wait for the build log followed for the given document (possibly by another instance) to be finalized.
+
+        The follower is considered stalled if it has not republished the build log index within `timeout` seconds.
+
+        :returns: reference to the build log (live if the follower is still publishing it when the time is up)
+                  along with ETag of the build log index, the reference is None if the build log is to be
+                  gathered, by a write conditioned on the ETag (None if there is no build log index).
+        """
+        index_key: str = self.get_build_log_index_key(document_id)
+
+        deadline: float = time.monotonic() + timeout
+        document, etag = self.objects.retrieve_document(index_key)
+        published: Optional[str] = etag
+
+        while document is not None and document.get('live', False) and time.monotonic() < deadline:
+            time.sleep(poll_interval)
+            document, etag = self.objects.retrieve_document(index_key)
+
+        if document is None or (document.get('live', False) and etag == published):
+            return None, etag
+
+        return self.get_build_log_reference(document_id, LogIndex.from_dict(document)), etag
+
+    def purge_live_build_log(self, document_id: str):
+        """Remove parts of the build log followed for the given document.
+
+        The build log index is removed as well unless the build log has been finalized.
+        """
+        # noinspection PyProtectedMember
+        bucket = self.ceph._s3.Bucket(self.ceph.bucket)  # pylint: disable=protected-access
+        bucket.objects.filter(Prefix=f"{self.ceph.prefix}{self.get_build_log_live_key(document_id)}") \
+                      .all() \
+                      .delete()
+
+        index_key: str = self.get_build_log_index_key(document_id)
+
+        try:
+            live: bool = self.ceph.retrieve_document(index_key).get('live', False)
+        except NotFoundError:
+            live = False
+
+        if live:
+            bucket.Object(f"{self.ceph.prefix}{index_key}").delete()
+
+    def reconcile_log_search(self) -> int:
+        """Reconcile the local build log search index with the build logs stored in Ceph.
+
+        Build logs stored (or replaced) after they have been indexed, e.g. by other instances,
+        are indexed again, build logs which are no longer stored are removed from the index
+        and lines of abandoned build logs are pruned.
+
+        :returns: number of the build logs indexed.
+        """
+        if self.log_search is None:
+            return 0
+
+        indexed: Dict[str, float] = self.log_search.indexed()
+        stored: Dict[str, float] = {}
+
+        prefix = f"{self.ceph.prefix}{self.PREFIX}"
+
+        # noinspection PyProtectedMember
+        bucket = self.ceph._s3.Bucket(self.ceph.bucket)  # pylint: disable=protected-access
+
+        for obj in bucket.objects.filter(Prefix=prefix):
+            name: str = obj.key[len(prefix):]
+
+            # the build log index is replaced whenever the build log is stored
+            if name.endswith('.index') and '/' not in name:
+                stored[name[:-len('.index')]] = obj.last_modified.timestamp()
+
+        for document_id in set(indexed) - set(stored):
+            self.log_search.remove(document_id)
+
+        reindexed = 0
+
+        for document_id, stored_at in sorted(stored.items()):
+            if indexed.get(document_id, 0) >= stored_at:
+                continue
+
+            try:
+                build_log_object: dict = self.retrieve_build_log_reference(document_id)
+            except NotFoundError:
+                continue  # removed in the meantime
+
+            if build_log_object.get('live'):
+                continue  # indexed once the follower has finalized it
+
+            lines = LogLineWriter(self.log_search, document_id)
+            decoder = codecs.getincrementaldecoder('utf-8')('replace')
+
+            try:
+                _, chunks = self.iter_build_log(build_log_object)
+
+                for chunk in chunks:
+                    lines.feed(decoder.decode(chunk))
+
+                lines.feed(decoder.decode(b'', final=True))
+            except Exception:
+                lines.abort()
+                raise
+
+            lines.close()
+            reindexed += 1
+
+        self.log_search.prune()
+
+        return reindexed
+
+    def purge_replaced_build_logs(self, ttl: float = DEFAULT_LOG_VERSION_TTL) -> int:
+        """Remove objects of build logs which have been replaced, stored for more than `ttl` seconds.
+
+        Parts left behind by followers which have been taken over are removed as well.
+
+        :returns: number of the removed objects.
+        """
+        prefix = f"{self.ceph.prefix}{self.PREFIX}"
+
+        # noinspection PyProtectedMember
+        bucket = self.ceph._s3.Bucket(self.ceph.bucket)  # pylint: disable=protected-access
+
+        versions: Dict[str, List] = defaultdict(list)
+        parts: Dict[str, List] = defaultdict(list)
+
+        for obj in bucket.objects.filter(Prefix=prefix):
+            name: str = obj.key[len(prefix):]
+
+            if '.live/' in name:
+                parts[name.partition('.live/')[0]].append(obj)
+                continue
+
+            document_id, _, suffix = name.rpartition('.')
+
+            # build log indexes and summaries are kept
+            if suffix in ('index', 'summary'):
+                continue
+
+            if not _VERSION.fullmatch(suffix):
+                document_id = name  # stored before the versions were introduced
+
+            versions[document_id].append(obj)
+
+        expired_at: float = time.time() - ttl
+        removed = 0
+
+        for document_id in sorted(set(versions) | set(parts)):
+            expired: list = [obj for obj in parts[document_id] if obj.last_modified.timestamp() < expired_at]
+
+            if len(versions[document_id]) > 1:
+                expired.extend(obj for obj in versions[document_id] if obj.last_modified.timestamp() < expired_at)
+
+            if not expired:
+                continue
+
+            try:
+                build_log_object: Optional[dict] = self.retrieve_build_log_reference(document_id)
+            except NotFoundError:
+                build_log_object = None  # the first version is being stored, or the follower has been purged
+
+            for obj in expired:
+                key: str = obj.key[len(self.ceph.prefix):]
+
+                if build_log_object is None:
+                    keep: bool = '.live/' not in key
+                elif build_log_object.get('live'):
+                    keep = '.live/' not in key or key.startswith(build_log_object['key'])
+                else:
+                    keep = key == build_log_object['key']
+
+                if not keep:
+                    self.objects.delete_object(key)
+                    removed += 1
+
+        return removed
+
+    def retrieve_build_log_reference(self, document_id: str) -> dict:
+        """Retrieve reference to the build log of the given document from its build log index.
+
+        :raises NotFoundError: In case there is no build log stored for the document.
+        """
+        log_index = LogIndex.from_dict(self.ceph.retrieve_document(self.get_build_log_index_key(document_id)))
+
+        return self.get_build_log_reference(document_id, log_index)
+
+    def store_build_log_summary(self, document_id: str, summary: dict):
+        """Store summary of the build log of the given document (see `osiris.summary`)."""
+        self.ceph.store_document(summary, self.get_build_log_summary_key(document_id))
+
+    def retrieve_build_log_summary(self, document_id: str) -> Optional[dict]:
+        """Retrieve summary of the build log of the given document, None if it has not been stored."""
+        try:
+            return self.ceph.retrieve_document(self.get_build_log_summary_key(document_id))
+        except NotFoundError:
+            return None
+
+    def retrieve_build_log(self, build_log_object: dict) -> str:
+        """Retrieve the build log stored as a separate object in Ceph, build logs of finished builds are cached."""
+        if 'data' not in build_log_object and not build_log_object.get('live'):
+            codec: Codec = get_codec(build_log_object.get('encoding') or Codec.NAME)
+
+            try:
+                data, _ = self.objects.cache.retrieve(
+                    self.objects.object(build_log_object['key']),
+                    lambda blob: b''.join(decompress_chunks([blob], codec)).decode('utf-8'),
+                    weigh=len
+                )
+            except NotFoundError:
+                current: Optional[dict] = self._retrieve_replacing_reference(build_log_object)
+                if current is None:
+                    raise
+
+                return self.retrieve_build_log(current)
+
+            return data
+
+        _, chunks = self.iter_build_log(build_log_object)
+
+        return b''.join(chunks).decode('utf-8')
+
+    def retrieve_build_log_index(self, build_log_object: dict) -> LogIndex:
+        """Retrieve index of the given build log.
+
+        Build logs stored without an index are considered to be a single block.
+        """
+        if 'index_key' in build_log_object:
+            return LogIndex.from_dict(self.ceph.retrieve_document(build_log_object['index_key']))
+
+        return LogIndex(
+            size=build_log_object['size'],
+            stored_size=build_log_object.get('stored_size', build_log_object['size']),
+            encoding=build_log_object.get('encoding') or Codec.NAME
+        )
+
+    def iter_build_log(self,
+                       build_log_object: dict,
+                       start: int = 0,
+                       end: int = None,
+                       encodings: Container[str] = (),
+                       chunk_size: int = DEFAULT_LOG_CHUNK_SIZE,
+                       log_index: LogIndex = None) -> Tuple[str, Iterator[bytes]]:
+        """Iterate over the build log bytes in range [start, end).
+
+        The whole build log stored compressed by one of the given encodings
+        is yielded as it is stored, otherwise the decompressed range is yielded.
+        Only the stored blocks covering the range are retrieved, located
+        by the given build log index (retrieved if not given).
+
+        :returns: encoding of the yielded bytes and iterator over the chunks.
+        """
+        size: int = build_log_object['size']
+        end = size if end is None else min(end, size)
+
+        if 'data' in build_log_object:
+            return Codec.NAME, iter([build_log_object['data'][start:end]])
+
+        if build_log_object.get('live'):
+            return self._iter_live_build_log(build_log_object, start, end, encodings, chunk_size)
+
+        try:
+            return self._iter_stored_build_log(build_log_object, start, end, encodings, chunk_size, log_index)
+        except NotFoundError:
+            current: Optional[dict] = self._retrieve_replacing_reference(build_log_object)
+            if current is None:
+                raise
+
+            return self.iter_build_log(current, start, end, encodings, chunk_size)
+
+    def _iter_stored_build_log(self,
+                               build_log_object: dict,
+                               start: int,
+                               end: int,
+                               encodings: Container[str],
+                               chunk_size: int,
+                               log_index: Optional[LogIndex]) -> Tuple[str, Iterator[bytes]]:
+        """Iterate over the build log bytes in range [start, end) of the finalized build log, see `iter_build_log`."""
+        key: str = build_log_object['key']
+        encoding: str = build_log_object.get('encoding') or Codec.NAME
+
+        whole: bool = start == 0 and end == build_log_object['size']
+
+        if log_index is None and encoding != Codec.NAME and not (whole and encoding in encodings):
+            log_index = self.retrieve_build_log_index(build_log_object)
+
+        if log_index is not None and log_index.key is not None and log_index.key != key:
+            # replaced since referenced, offsets of the index apply to the object it refers to
+            key, encoding = log_index.key, log_index.encoding
+            end = log_index.size if whole else min(end, log_index.size)
+
+        if whole and (encoding == Codec.NAME or encoding in encodings):
+            return encoding, self.objects.iter_object(key, chunk_size)
+
+        if encoding == Codec.NAME:
+            return encoding, self.objects.iter_object(key, chunk_size, start, end)
+
+        if log_index.blocks:
+            stored_start, stored_end, skip = log_index.locate(start, end)
+            chunks = self.objects.iter_object(key, chunk_size, stored_start, stored_end)
+        else:
+            chunks, skip = self.objects.iter_object(key, chunk_size), start
+
+        return Codec.NAME, slice_chunks(decompress_chunks(chunks, get_codec(encoding)), skip, end - start)
+
+    def iter_build_log_lines(self,
+                             build_log_object: dict,
+                             start_line: int = 0,
+                             end_line: int = None,
+                             tail: int = None,
+                             chunk_size: int = DEFAULT_LOG_CHUNK_SIZE) -> Iterator[bytes]:
+        """Iterate over the build log lines [start_line, end_line) numbered from 0, or the last `tail` lines.
+
+        Lines are located using the line offsets from the build log index,
+        so only the byte range covering the lines is retrieved. Build logs
+        stored without line offsets are read as a whole.
+        """
+        log_index: Optional[LogIndex] = None
+        if 'index_key' in build_log_object:
+            log_index = self.retrieve_build_log_index(build_log_object)
+
+        if log_index is None or not log_index.has_lines:
+            _, chunks = self.iter_build_log(build_log_object, chunk_size=chunk_size)
+
+            if tail is not None:
+                return tail_lines(chunks, tail)
+
+            return slice_lines(chunks, start_line, None if end_line is None else end_line - start_line)
+
+        if tail is not None:
+            start_line, end_line = max(log_index.line_count - tail, 0), log_index.line_count
+        elif end_line is None:
+            end_line = log_index.line_count
+
+        start, end, skip = log_index.locate_lines(start_line, end_line)
+        _, chunks = self.iter_build_log(build_log_object, start, end, chunk_size=chunk_size, log_index=log_index)
+
+        return slice_lines(chunks, skip, end_line - start_line)
+
+    def _iter_live_build_log(self,
+                             build_log_object: dict,
+                             start: int,
+                             end: int,
+                             encodings: Container[str],
+                             chunk_size: int) -> Tuple[str, Iterator[bytes]]:
+        """Iterate over the build log bytes in range [start, end) of the build log being followed.
+
+        Only the parts covering the range are retrieved. The build log
+        finalized in the meantime is read from the build log object.
+        """
+        log_index: LogIndex = self.retrieve_build_log_index(build_log_object)
+
+        if not log_index.live:
+            build_log_object = dict(build_log_object, key=log_index.key or build_log_object['key'][:-len('.live/')],
+                                    encoding=log_index.encoding, live=False)
+
+            return self.iter_build_log(build_log_object, start, end, encodings, chunk_size, log_index=log_index)
+
+        if not log_index.blocks or end <= start:
+            return Codec.NAME, iter(())
+
+        first, last, skip = log_index.locate_blocks(start, end)
+
+        # the build log may have been taken over by another follower since referenced
+        live_key: str = log_index.key or build_log_object['key']
+
+        chunks: Iterator[bytes] = itertools.chain.from_iterable(
+            self.objects.iter_object(f"{live_key}{part:08d}", chunk_size)
+            for part in range(first, last)
+        )
+
+        encoding: str = log_index.encoding
+        if start == 0 and end == build_log_object['size'] and encoding in encodings:
+            return encoding, chunks
+
+        return Codec.NAME, slice_chunks(decompress_chunks(chunks, get_codec(encoding)), skip, end - start)
+
+    def _retrieve_replacing_reference(self, build_log_object: dict) -> Optional[dict]:
+        """Retrieve reference to the build log which has replaced the referenced one, if it has been removed.
+
+        :returns: the reference, None if the referenced build log has not been replaced.
+        """
+        index_key: Optional[str] = build_log_object.get('index_key')
+        if index_key is None:
+            return None
+
+        try:
+            log_index = LogIndex.from_dict(self.ceph.retrieve_document(index_key))
+        except NotFoundError:
+            return None
+
+        document_id: str = index_key[len(self.PREFIX):-len('.index')]
+        current: dict = self.get_build_log_reference(document_id, log_index, metadata=build_log_object.get('metadata'))
+
+        return None if current['key'] == build_log_object['key'] else current
@@ -0,0 +1,49 @@
+# Osiris: Build log aggregator.
+
+"""Registry of runtime metrics exposed by the API."""
+
+import threading
+
+from typing import Any, Callable, Dict
+
+
+_METRICS: Dict[str, Callable[[], Any]] = {}
+
+
+def register_metric(name: str, collector: Callable[[], Any]):
+    """Register metric collector under the given name."""
+    _METRICS[name] = collector
+
+
+def collect_metrics() -> Dict[str, Any]:
+    """Collect current values of all registered metrics."""
+    return {name: collector() for name, collector in sorted(_METRICS.items())}
+
+
+class Counter(object):
+    """Thread safe set of named counters."""
+
+    def __init__(self, *names: str):
+        """Initialize Counter."""
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {name: 0 for name in names}
+
+    def inc(self, name: str, value: int = 1):
+        """Increment the named counter."""
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + value
+
+    def get(self, name: str) -> int:
+        """Return value of the named counter."""
+        return self._counts.get(name, 0)
+
+    def ratio(self, name: str, *names: str) -> float:
+        """Return ratio of the named counter to the sum of the given counters."""
+        total = sum(self.get(n) for n in names)
+
+        return self.get(name) / total if total else 0.0
+
+    def to_dict(self) -> Dict[str, int]:
+        """Return values of all counters."""
+        with self._lock:
+            return dict(self._counts)
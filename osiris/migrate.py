@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# Osiris: Build log aggregator.
+
+"""Migration of stored build data.
+
+Usage:
+
+    python -m osiris.migrate split-logs
+    OSIRIS_KEY_LAYOUT=date python -m osiris.migrate partition-keys
+    python -m osiris.migrate summarize-logs
+"""
+
+import argparse
+import sys
+
+from typing import Optional
+
+
+def split_logs(_: argparse.Namespace) -> int:
+    """Split build logs embedded in build information documents."""
+    from osiris.aggregator import build_aggregator
+
+    migrated = 0
+
+    for document_id in build_aggregator.iter_document_ids():
+        build_doc: dict = build_aggregator.retrieve_document(document_id)
+
+        if build_doc.get('build_log') is not None:
+            build_aggregator.store_build_data(build_doc)
+
+            migrated += 1
+
+    print(f"Migrated {migrated} document(s).")
+
+    return 0
+
+
+def partition_keys(_: argparse.Namespace) -> int:
+    """Move build information documents stored in the flat key layout to their date partitions."""
+    from osiris.aggregator import build_aggregator
+
+    if not build_aggregator.layout.partitioned:
+        print("Documents are moved to date partitions only with OSIRIS_KEY_LAYOUT=date.", file=sys.stderr)
+
+        return 1
+
+    migrated = 0
+
+    for document_id in build_aggregator.iter_document_ids():
+        if build_aggregator.layout.get_key(document_id) != document_id:
+            continue  # moved already
+
+        build_aggregator.store_build_data(build_aggregator.retrieve_document(document_id))
+
+        migrated += 1
+
+    print(f"Migrated {migrated} document(s).")
+
+    return 0
+
+
+def summarize_logs(_: argparse.Namespace) -> int:
+    """Extract summaries of build logs stored before the summaries were extracted.
+
+    Summaries kept in build log references by earlier versions are moved next to the build logs.
+    """
+    from osiris.aggregator import build_aggregator
+    from osiris.summary import summarize
+
+    migrated = 0
+
+    for document_id in build_aggregator.iter_document_ids():
+        build_doc: dict = build_aggregator.retrieve_document(document_id)
+        build_log_object: Optional[dict] = build_doc.get('build_log_object')
+
+        if build_log_object is not None:
+            if build_log_object.get('live'):
+                continue
+
+            embedded: Optional[dict] = build_log_object.pop('summary', None)
+
+            if embedded is None:
+                if build_aggregator.logs.retrieve_build_log_summary(document_id) is not None:
+                    continue
+
+                _, chunks = build_aggregator.logs.iter_build_log(build_log_object)
+                build_aggregator.logs.store_build_log_summary(document_id, summarize(chunks))
+
+                migrated += 1
+                continue
+
+            build_aggregator.logs.store_build_log_summary(document_id, embedded)
+
+        elif build_doc.get('build_log') is None:
+            continue
+
+        # embedded build logs are split and summarized by the way, moved summaries dropped
+        build_aggregator.store_build_data(build_doc)
+
+        migrated += 1
+
+    print(f"Migrated {migrated} document(s).")
+
+    return 0
+
+
+def main(argv: list = None) -> int:
+    """Run the requested migration."""
+    parser = argparse.ArgumentParser(prog='osiris.migrate', description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='migration')
+    subparsers.required = True
+
+    split_logs_parser = subparsers.add_parser(
+        'split-logs', help="Store embedded build logs as separate objects.")
+    split_logs_parser.set_defaults(func=split_logs)
+
+    partition_keys_parser = subparsers.add_parser(
+        'partition-keys', help="Move build information documents to date partitioned keys.")
+    partition_keys_parser.set_defaults(func=partition_keys)
+
+    summarize_logs_parser = subparsers.add_parser(
+        'summarize-logs', help="Extract summaries of build logs stored without them.")
+    summarize_logs_parser.set_defaults(func=summarize_logs)
+
+    args = parser.parse_args(argv)
+
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+# Osiris: Build log aggregator.
+
+"""Access to raw objects stored in Ceph.
+
+Objects shared by multiple instances (e.g. the build information index) are updated
+by conditional writes: the object is stored only if it still has the ETag it has been
+read with (`If-Match`), or only if it does not exist yet (`If-None-Match: *`), and the
+update is retried on conflict. The conditions are sent as request headers, as the S3
+client does not expose them for PUT requests.
+"""
+
+import json
+import random
+import threading
+import time
+
+from functools import partial
+
+from botocore.exceptions import ClientError
+
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Tuple, Union
+
+from thoth.storages.ceph import CephStore
+from thoth.storages.exceptions import NotFoundError
+
+from osiris import DEFAULT_CONDITIONAL_WRITE_ATTEMPTS
+
+from osiris.cache import ObjectCache
+from osiris.compression import Codec
+from osiris.upload import MultipartWriter
+
+
+class PreconditionFailed(Exception):
+    """Conditional write has failed, the object has been changed (or created) in the meantime."""
+
+
+# conditions of the write being made by the current thread, see `_add_conditions`
+_CONDITIONS = threading.local()
+
+
+def _add_conditions(request, **_):
+    """Add conditions of the write made by the current thread to the request headers."""
+    conditions: Optional[Dict[str, str]] = getattr(_CONDITIONS, 'headers', None)
+
+    for name, value in (conditions or {}).items():
+        # the request is signed again on retries
+        del request.headers[name]
+        request.headers[name] = value
+
+
+class ObjectStore(object):
+    """Objects stored under the Ceph prefix, writes invalidate the cached objects."""
+
+    def __init__(self, ceph: CephStore, cache: ObjectCache,
+                 conditional_write_attempts: int = DEFAULT_CONDITIONAL_WRITE_ATTEMPTS):
+        """Initialize ObjectStore."""
+        self.ceph = ceph
+        self.cache = cache
+        self.conditional_write_attempts = conditional_write_attempts
+
+    def object(self, key: str):
+        """Get boto3 Object resource of the given key."""
+        # noinspection PyProtectedMember
+        return self.ceph._s3.Object(self.ceph.bucket, f"{self.ceph.prefix}{key}")  # pylint: disable=protected-access
+
+    def iter_object(self, key: str, chunk_size: int, start: int = 0, end: int = None) -> Iterator[bytes]:
+        """Retrieve object bytes in range [start, end) from Ceph, return iterator over the chunks.
+
+        :raises NotFoundError: In case the object does not exist.
+        """
+        kwargs = {}
+
+        if start or end is not None:
+            if end is not None and end <= start:
+                return iter(())
+
+            kwargs['Range'] = f"bytes={start}-{'' if end is None else end - 1}"
+
+        try:
+            body = self.object(key).get(**kwargs)['Body']
+        except ClientError as exc:
+            if exc.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                raise NotFoundError(f"Failed to retrieve object, object {key!r} does not exist") from exc
+            raise
+
+        return iter(partial(body.read, chunk_size), b'')
+
+    def put_object(self, key: str, blob: Union[bytes, BinaryIO], encoding: str = Codec.NAME,
+                   content_type: str = 'text/plain; charset=utf-8',
+                   if_match: str = None, if_none_match: str = None, **kwargs) -> dict:
+        """Store a blob in Ceph along with its content type and encoding.
+
+        :param if_match: ETag the stored object has to have for the blob to be stored.
+        :param if_none_match: `*` to store the blob only if the object does not exist.
+        :raises PreconditionFailed: In case the condition is not met.
+        """
+        if encoding != Codec.NAME:
+            kwargs['ContentEncoding'] = encoding
+
+        conditions: Dict[str, str] = {}
+        if if_match:
+            conditions['If-Match'] = if_match
+        if if_none_match:
+            conditions['If-None-Match'] = if_none_match
+
+        obj = self.object(key)
+
+        if conditions:
+            obj.meta.client.meta.events.register(
+                'before-sign.s3.PutObject', _add_conditions, unique_id='osiris-conditions')
+
+        _CONDITIONS.headers = conditions
+
+        try:
+            response: dict = obj.put(Body=blob, ContentType=content_type, **kwargs)
+        except ClientError as exc:
+            if exc.response['Error']['Code'] in ('412', 'PreconditionFailed', '409', 'ConditionalRequestConflict'):
+                raise PreconditionFailed(f"Object {key!r} has been changed in the meantime") from exc
+            raise
+        finally:
+            _CONDITIONS.headers = None
+            self.cache.invalidate(f"{self.ceph.prefix}{key}")
+
+        return response
+
+    def retrieve_document(self, key: str) -> Tuple[Optional[dict], Optional[str]]:
+        """Retrieve JSON document along with its ETag, (None, None) if it does not exist."""
+        try:
+            response: dict = self.object(key).get()
+        except ClientError as exc:
+            if exc.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None, None
+            raise
+
+        return json.loads(response['Body'].read().decode('utf-8')), response['ETag']
+
+    def store_document(self, document: dict, key: str, if_match: str = None, if_none_match: str = None,
+                       metadata: Dict[str, str] = None) -> str:
+        """Store JSON document along with its metadata, see `put_object` for the conditions.
+
+        :raises PreconditionFailed: In case the condition is not met.
+        :returns: ETag of the stored document.
+        """
+        kwargs = {'Metadata': metadata} if metadata is not None else {}
+
+        response: dict = self.put_object(key, self.ceph.dict2blob(document), content_type='application/json',
+                                         if_match=if_match, if_none_match=if_none_match, **kwargs)
+
+        return response['ETag']
+
+    def update_document(self, key: str, update: Callable[[Optional[dict]], Optional[dict]],
+                        get_metadata: Callable[[dict], Dict[str, str]] = None) -> Optional[dict]:
+        """Update JSON document by a conditional write, retried if the document has been changed concurrently.
+
+        `update` is given the stored document (None if it does not exist), it returns
+        the document to be stored or None to leave the stored one as it is. It is called
+        again with the current document on each retry. Metadata of the stored document
+        are given by `get_metadata`, if any.
+
+        :raises PreconditionFailed: In case the document has been changed concurrently by each of the attempts.
+        :returns: the stored document, None if it has been left as it is.
+        """
+        for attempt in range(self.conditional_write_attempts):
+            document, etag = self.retrieve_document(key)
+
+            document = update(document)
+            if document is None:
+                return None
+
+            try:
+                self.store_document(document, key, if_match=etag, if_none_match=None if etag else '*',
+                                    metadata=get_metadata(document) if get_metadata is not None else None)
+            except PreconditionFailed:
+                # back off so that the concurrent writers do not collide again
+                time.sleep(random.uniform(0, min(0.01 * 2 ** attempt, 1)))
+                continue
+
+            return document
+
+        raise PreconditionFailed(f"Object {key!r} has been changed concurrently by each of "
+                                 f"{self.conditional_write_attempts} attempts to update it")
+
+    def delete_object(self, key: str):
+        """Delete object from Ceph."""
+        try:
+            self.object(key).delete()
+        finally:
+            self.cache.invalidate(f"{self.ceph.prefix}{key}")
+
+    def object_writer(self, key: str, encoding: str = Codec.NAME,
+                      content_type: str = 'text/plain; charset=utf-8') -> MultipartWriter:
+        """Open writer streaming an object to Ceph along with its content type and encoding."""
+        kwargs = {'ContentType': content_type}
+
+        if encoding != Codec.NAME:
+            kwargs['ContentEncoding'] = encoding
+
+        return MultipartWriter(self.object(key), **kwargs)
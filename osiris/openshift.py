@@ -0,0 +1,51 @@
+# Osiris: Build log aggregator.
+
+"""Retrieval of build logs from OpenShift."""
+
+from typing import Iterator
+
+import requests
+
+from osiris import DEFAULT_OC_LOG_LEVEL
+from osiris import get_oc_client
+
+
+def get_build_log(build_id: str,
+                  namespace: str,
+                  log_level: int = DEFAULT_OC_LOG_LEVEL) -> str:
+    """Curl OCP for build log for the given build.
+
+    :raises OCError: In case of OC CLI failure.
+    """
+    client = get_oc_client()
+
+    logs = client.get_build_log(  # TODO: can log level be modified?
+        build_id=build_id,
+        namespace=namespace
+    )
+
+    return logs
+
+
+def follow_build_log(build_id: str,
+                     namespace: str,
+                     chunk_size: int = None) -> Iterator[bytes]:
+    """Stream build log of the given build from OCP as it is being produced.
+
+    The stream ends once the build finishes (or the connection is closed).
+    """
+    client = get_oc_client()
+
+    endpoint = f"{client.openshift_api_url}/apis/build.openshift.io/v1/namespaces/{namespace}/builds/{build_id}/log"
+
+    response = requests.get(
+        endpoint,
+        params={'follow': 'true'},
+        headers={'Authorization': f"Bearer {client.token}"},
+        verify=client.kubernetes_verify_tls,
+        stream=True
+    )
+    response.raise_for_status()
+
+    # chunks are yielded as they arrive if no chunk size is given
+    return response.iter_content(chunk_size=chunk_size)
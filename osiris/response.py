@@ -108,6 +108,15 @@ def bad_request(payload=None, errors=None, **kwargs) -> tuple:  # pragma: no cov
     return payload, errors, kwargs
 
 
+@status(HTTPStatus.NOT_FOUND)
+def request_not_found(payload=None, errors=None, **kwargs) -> tuple:  # pragma: no cover
+    """Return API response for put_request of a missing resource.
+
+    Nothing matches the given URI.
+    """
+    return payload, errors, kwargs
+
+
 @status(HTTPStatus.SERVICE_UNAVAILABLE)
 def request_unavailable(payload=None, errors=None, **kwargs) -> tuple:  # pragma: no cover
     """Return API response for bad put_request.
@@ -5,13 +5,15 @@
 import re
 
 from datetime import datetime
-from typing import List, Union
+from typing import Callable, List, Union
 
 from marshmallow import fields
 from marshmallow import post_load
 from marshmallow import Schema
 
 from osiris import DEFAULT_OC_LOG_LEVEL
+from osiris import DEFAULT_MAX_RESULTS_PER_PAGE
+from osiris import DEFAULT_RESULTS_PER_PAGE
 from osiris.schema.ocp import OCP, OCPSchema
 
 from kubernetes.client.models.v1_event import V1Event as Event
@@ -103,6 +105,25 @@ class BuildLog(object):
         self.metadata = metadata
 
 
+class LazyBuildLog(BuildLog):
+    """BuildLog model with data loaded on first access."""
+
+    def __init__(self, loader: Callable[[], str], metadata: dict = None):
+        """Initialize LazyBuildLog model."""
+        self._loader = loader
+        self._data = None
+
+        self.metadata = metadata
+
+    @property
+    def data(self) -> str:
+        """Return build log data, load them if they have not been loaded yet."""
+        if self._data is None:
+            self._data = self._loader()
+
+        return self._data
+
+
 class BuildInfoSchema(Schema):
     """BuildInfo model schema."""
 
@@ -128,13 +149,19 @@ class BuildInfoSchema(Schema):
 class BuildInfoPagination(object):
     """BuildInfoPagination model."""
 
-    RESULTS_PER_PAGE = 20
+    RESULTS_PER_PAGE = DEFAULT_RESULTS_PER_PAGE
+    MAX_RESULTS_PER_PAGE = DEFAULT_MAX_RESULTS_PER_PAGE
 
     def __init__(self,
                  build_info_list: List[BuildInfo] = None,
                  total: int = None,
                  has_next: bool = None,
-                 has_prev: bool = None):
+                 has_prev: bool = None,
+                 errors: dict = None,
+                 page: int = None,
+                 per_page: int = None,
+                 next_cursor: str = None,
+                 prev_cursor: str = None):
         """Initialize BuildInfoPagination model."""
         self.build_info = build_info_list
 
@@ -142,6 +169,14 @@ class BuildInfoPagination(object):
         self.has_next = has_next
         self.has_prev = has_prev
 
+        self.errors = errors or {}
+
+        self.page = page
+        self.per_page = per_page
+
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
 
 class BuildInfoPaginationSchema(Schema):
     """BuildInfoPagination model schema."""
@@ -152,6 +187,14 @@ class BuildInfoPaginationSchema(Schema):
     has_next = fields.Bool(required=False, default=False)
     has_prev = fields.Bool(required=False, default=False)
 
+    errors = fields.Dict(required=False)
+
+    page = fields.Integer(required=False)
+    per_page = fields.Integer(required=False)
+
+    next_cursor = fields.String(required=False, allow_none=True)
+    prev_cursor = fields.String(required=False, allow_none=True)
+
 
 class BuildLogSchema(Schema):
     """BuildLog model schema."""
@@ -0,0 +1,174 @@
+# Osiris: Build log aggregator.
+
+"""Local index of build information queryable by namespace, status and time.
+
+The index is kept in a local SQLite database. It is updated by each build information
+write of this process and rebuilt from the build information index stored in Ceph
+by the periodic reconciliation, so that builds stored by other instances are found, too.
+Each instance has its own copy, so results of replicas may differ until the next
+reconciliation; the build information index in Ceph is the source of truth.
+"""
+
+import json
+import time
+
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from thoth.common.helpers import _DATETIME_FORMAT_STRING  # noqa
+
+from osiris.sqlite import SQLiteDatabase
+
+
+SORT_FIELDS = ('build_id', 'build_status', 'namespace', 'first_timestamp', 'last_timestamp')
+TIME_FIELDS = ('first_timestamp', 'last_timestamp')
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """Parse stored build timestamp into seconds since the epoch, None if it can not be parsed."""
+    if not value:
+        return None
+
+    try:
+        return datetime.strptime(value, _DATETIME_FORMAT_STRING).replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class BuildSearchIndex(SQLiteDatabase):
+    """Local index of build information entries."""
+
+    def __init__(self, path: str):
+        """Initialize BuildSearchIndex."""
+        super().__init__(path)
+
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS builds (
+                    document_id TEXT PRIMARY KEY,
+                    build_id TEXT NOT NULL,
+                    build_status TEXT COLLATE NOCASE,
+                    namespace TEXT,
+                    first_timestamp REAL,
+                    last_timestamp REAL,
+                    entry TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS builds_namespace ON builds (namespace, last_timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS builds_status ON builds (build_status, last_timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS builds_first ON builds (first_timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS builds_last ON builds (last_timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS builds_build_id ON builds (build_id)")
+
+    @staticmethod
+    def _row(document_id: str, entry: dict, updated_at: float) -> tuple:
+        return (
+            document_id,
+            entry.get('build_id') or '',
+            entry.get('build_status'),
+            (entry.get('ocp_info') or {}).get('namespace'),
+            parse_timestamp(entry.get('first_timestamp')),
+            parse_timestamp(entry.get('last_timestamp')),
+            json.dumps(entry),
+            updated_at,
+        )
+
+    def update(self, document_id: str, entry: dict):
+        """Insert or replace entry of the given document."""
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO builds VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         self._row(document_id, entry, time.time()))
+
+    def rebuild(self, entries: Iterable[Tuple[str, dict]], started_at: float) -> int:
+        """Replace content of the index with the given entries.
+
+        Entries updated since `started_at`, when the given entries started to be read,
+        are kept, as they are at least as recent as the given ones.
+
+        :returns: number of entries in the index.
+        """
+        rows: List[tuple] = [self._row(document_id, entry, started_at) for document_id, entry in entries]
+
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM builds WHERE updated_at < ?", (started_at, ))
+            conn.executemany("INSERT OR IGNORE INTO builds VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+            count, = conn.execute("SELECT COUNT(*) FROM builds").fetchone()
+
+        return count
+
+    def clear(self):
+        """Remove all of the entries, they are restored by the next rebuild."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM builds")
+
+    def get_build_ids(self, document_ids: Sequence[str]) -> Dict[str, str]:
+        """Get build ids of the given documents, documents not indexed yet are left out."""
+        rows = self._conn.execute(
+            f"SELECT document_id, build_id FROM builds WHERE document_id IN ({', '.join('?' * len(document_ids))})",
+            list(document_ids)
+        ).fetchall()
+
+        return dict(rows)
+
+    def count(self) -> int:
+        """Return number of indexed entries."""
+        count, = self._conn.execute("SELECT COUNT(*) FROM builds").fetchone()
+
+        return count
+
+    def search(self,
+               namespace: str = None,
+               statuses: Sequence[str] = (),
+               since: float = None,
+               until: float = None,
+               time_field: str = 'last_timestamp',
+               sort: str = 'last_timestamp',
+               descending: bool = True,
+               limit: int = 100,
+               offset: int = 0) -> Tuple[int, List[dict]]:
+        """Search build information entries, all of the given filters have to match.
+
+        :param statuses: build statuses to match (case insensitive), any of them.
+        :param since: the time field has to be at least this timestamp (seconds since the epoch).
+        :param until: the time field has to be less than this timestamp.
+        :raises ValueError: In case of unsupported time or sort field.
+        :returns: total number of matching entries and the requested window of them.
+        """
+        if time_field not in TIME_FIELDS:
+            raise ValueError(f"Unsupported time field {time_field!r}, expected one of {', '.join(TIME_FIELDS)}")
+
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Unsupported sort field {sort!r}, expected one of {', '.join(SORT_FIELDS)}")
+
+        conditions: List[str] = []
+        params: list = []
+
+        if namespace is not None:
+            conditions.append("namespace = ?")
+            params.append(namespace)
+
+        if statuses:
+            conditions.append(f"build_status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+
+        if since is not None:
+            conditions.append(f"{time_field} >= ?")
+            params.append(since)
+
+        if until is not None:
+            conditions.append(f"{time_field} < ?")
+            params.append(until)
+
+        where: str = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order: str = "DESC" if descending else "ASC"
+
+        total, = self._conn.execute(f"SELECT COUNT(*) FROM builds {where}", params).fetchone()
+
+        rows = self._conn.execute(
+            f"SELECT entry FROM builds {where} ORDER BY {sort} {order}, document_id {order} LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+
+        return total, [json.loads(entry) for entry, in rows]
@@ -0,0 +1,79 @@
+# Osiris: Build log aggregator.
+
+"""Coalescing of concurrent calls for the same key."""
+
+import logging
+import threading
+
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from osiris import DEFAULT_SINGLE_FLIGHT_TIMEOUT
+
+from osiris.metrics import Counter
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _Call(object):
+    """Call in flight, its result is shared by all of the callers."""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight(object):
+    """Concurrent calls for the same key share a single call in flight and its result (or exception).
+
+    Callers waiting longer than the timeout make the call on their own instead.
+    """
+
+    def __init__(self, timeout: float = DEFAULT_SINGLE_FLIGHT_TIMEOUT):
+        """Initialize SingleFlight."""
+        self.timeout = timeout
+
+        self.stats = Counter('calls', 'coalesced', 'timeouts')
+
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fun: Callable[[], Any]) -> Any:
+        """Call `fun` unless a call for the same key is in flight already, return its result."""
+        with self._lock:
+            call: Optional[_Call] = self._calls.get(key)
+
+            leader: bool = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            self.stats.inc('calls')
+
+            try:
+                call.result = fun()
+            except BaseException as exc:
+                call.error = exc
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+
+                call.done.set()
+
+            return call.result
+
+        self.stats.inc('coalesced')
+
+        if not call.done.wait(self.timeout):
+            _LOGGER.debug("Call for %r has not finished in %ss, calling on its own", key, self.timeout)
+            self.stats.inc('timeouts')
+
+            return fun()
+
+        if call.error is not None:
+            raise call.error
+
+        return call.result
@@ -0,0 +1,56 @@
+# Osiris: Build log aggregator.
+
+"""Local SQLite databases."""
+
+import os
+import sqlite3
+import threading
+
+from typing import Optional
+
+
+class SQLiteDatabase(object):
+    """SQLite database with a connection per thread, can be shared by multiple processes."""
+
+    def __init__(self, path: str):
+        """Initialize SQLiteDatabase, the directory of the database file is created if needed."""
+        self.path = path
+
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Return SQLite connection of the current thread."""
+        conn: Optional[sqlite3.Connection] = getattr(self._local, 'conn', None)
+
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+
+            self._local.conn = conn
+
+        return conn
+
+    def _transaction(self):
+        """Return context manager running the block in an immediate transaction."""
+        return Transaction(self._conn)
+
+
+class Transaction(object):
+    """Immediate SQLite transaction context manager."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        """Initialize Transaction."""
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        """Begin the transaction, return the connection to run the statements by."""
+        self.conn.execute("BEGIN IMMEDIATE")
+
+        return self.conn
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Commit the transaction, roll it back if the block has raised."""
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
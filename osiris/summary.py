@@ -0,0 +1,153 @@
+# Osiris: Build log aggregator.
+
+"""Structured summary of build logs.
+
+The summary is extracted once, as the build log is stored, and kept next to the build
+log, so that the common questions about a build (the steps run, packages installed
+and downloaded, the image pushed and the error the build has failed with) are answered
+without retrieving the build log itself. It is not kept in the build information
+document, which is retrieved by status and information requests.
+"""
+
+import codecs
+import hashlib
+import re
+
+from typing import Dict, Iterable, List, Optional
+
+# bumped whenever the extracted fields change
+SUMMARY_VERSION = 1
+
+MAX_ENTRIES = 1000
+MAX_ERRORS = 10
+MAX_LINE_LENGTH = 4096
+
+_STEP = re.compile(r'^--->\s+(?P<name>.+?)(?:\s*\.\.\.)?\s*$')
+_DOWNLOAD = re.compile(r'^\s*Downloading\s+(?P<url>\S+)(?:\s+\((?P<size>[\d.]+)\s*(?P<unit>[kMG]?B)\))?')
+_INSTALLED = re.compile(r'^\s*Successfully installed\s+(?P<packages>.+?)\s*$')
+_PUSHING = re.compile(r'^\s*Pushing image\s+(?P<image>\S+)')
+_PUSHED = re.compile(r'^\s*Push successful\s*$')
+_ERROR = re.compile(
+    r'^\s*(?:error:|ERROR:|FATAL:|fatal:|An error occurred|[A-Za-z_][\w.]*(?:Error|Exception)(?::|$))'
+)
+
+_UNITS = {'B': 1, 'kB': 1000, 'MB': 1000 ** 2, 'GB': 1000 ** 3}
+
+
+class LogSummary(object):
+    """Incremental extractor of the build log summary, fed by the build log chunks as they arrive."""
+
+    def __init__(self):
+        """Initialize LogSummary."""
+        self.size = 0
+        self.line_count = 0
+
+        self.steps: List[dict] = []
+        self.packages: Dict[str, str] = {}
+        self.downloads: List[dict] = []
+        self.download_count = 0
+        self.download_size = 0
+        self.image: Optional[str] = None
+        self.pushed = False
+        self.errors: List[dict] = []
+
+        self._checksum = hashlib.sha256()
+        self._partial = ''
+
+    def feed(self, chunk: bytes, text: str):
+        """Extract the summary from the next chunk of the build log and its decoded text."""
+        self.size += len(chunk)
+        self._checksum.update(chunk)
+
+        if not text:
+            return
+
+        lines: List[str] = (self._partial + text).split('\n')
+        self._partial = lines.pop()[:MAX_LINE_LENGTH]
+
+        for line in lines:
+            self._extract(line)
+
+    def to_dict(self) -> dict:
+        """Finish the extraction and return the summary."""
+        if self._partial:
+            self._extract(self._partial)
+            self._partial = ''
+
+        return {
+            'version': SUMMARY_VERSION,
+            'size': self.size,
+            'line_count': self.line_count,
+            'checksum': f"sha256:{self._checksum.hexdigest()}",
+            'steps': self.steps,
+            'packages': self.packages,
+            'downloads': self.downloads,
+            'download_count': self.download_count,
+            'download_size': self.download_size,
+            'image': self.image,
+            'pushed': self.pushed,
+            'errors': self.errors,
+            'error': self.errors[-1] if self.errors else None,
+        }
+
+    def _extract(self, line: str):
+        self.line_count += 1
+
+        line = line[:MAX_LINE_LENGTH].rstrip('\r')
+
+        match = _STEP.match(line)
+        if match:
+            if len(self.steps) < MAX_ENTRIES:
+                self.steps.append({'name': match.group('name'), 'line': self.line_count})
+            return
+
+        match = _DOWNLOAD.match(line)
+        if match:
+            size: Optional[int] = None
+            if match.group('size'):
+                size = int(float(match.group('size')) * _UNITS[match.group('unit')])
+
+            self.download_count += 1
+            self.download_size += size or 0
+
+            if len(self.downloads) < MAX_ENTRIES:
+                self.downloads.append({
+                    'file': match.group('url').rsplit('/', 1)[-1],
+                    'size': size,
+                    'line': self.line_count,
+                })
+            return
+
+        match = _INSTALLED.match(line)
+        if match:
+            for package in match.group('packages').split():
+                name, _, version = package.rpartition('-')
+                if name and (name in self.packages or len(self.packages) < MAX_ENTRIES):
+                    self.packages[name] = version
+            return
+
+        match = _PUSHING.match(line)
+        if match:
+            self.image = match.group('image')
+            return
+
+        if _PUSHED.match(line):
+            self.pushed = True
+            return
+
+        if _ERROR.match(line):
+            self.errors.append({'message': line.strip(), 'line': self.line_count})
+            del self.errors[:-MAX_ERRORS]
+
+
+def summarize(chunks: Iterable[bytes]) -> dict:
+    """Extract summary of the build log given by its chunks."""
+    summary = LogSummary()
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+
+    for chunk in chunks:
+        summary.feed(chunk, decoder.decode(chunk))
+
+    summary.feed(b'', decoder.decode(b'', final=True))
+
+    return summary.to_dict()
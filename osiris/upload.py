@@ -0,0 +1,289 @@
+# Osiris: Build log aggregator.
+
+"""Streaming uploads of objects to Ceph."""
+
+import uuid
+
+from datetime import datetime, timedelta, timezone
+from functools import partial
+
+from botocore.exceptions import ClientError
+from botocore.paginate import Paginator
+
+from typing import BinaryIO, Callable, Iterable, List, Optional, Tuple, Union
+
+from thoth.storages.ceph import CephStore
+from thoth.storages.exceptions import NotFoundError
+
+from osiris import DEFAULT_LOG_CHUNK_SIZE
+from osiris import DEFAULT_UPLOAD_PART_SIZE
+from osiris import DEFAULT_UPLOAD_SESSION_TTL
+
+
+class MultipartWriter(object):
+    """Writer streaming an object to Ceph in parts of a fixed size.
+
+    At most one part is buffered at a time. Objects smaller than a part
+    are stored by a single request once the writer is closed. The upload
+    is aborted if the writer is left due to an exception, the previously
+    stored object (if any) is kept intact in that case.
+    """
+
+    def __init__(self, s3_object, part_size: int = DEFAULT_UPLOAD_PART_SIZE, **put_kwargs):
+        """Initialize MultipartWriter."""
+        self.object = s3_object
+        self.part_size = part_size
+        self.put_kwargs = put_kwargs
+
+        self.size = 0
+
+        self._buffer = bytearray()
+
+        self._upload = None
+        self._parts: List[dict] = []
+
+    def write(self, data: bytes):
+        """Write the data, upload parts filled so far."""
+        self._buffer += data
+        self.size += len(data)
+
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+
+            del self._buffer[:self.part_size]
+
+    def close(self):
+        """Upload the remaining data and complete the upload."""
+        if self._upload is None:
+            self.object.put(Body=bytes(self._buffer), **self.put_kwargs)
+        else:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+
+            self._upload.complete(MultipartUpload={'Parts': self._parts})
+
+        self._buffer.clear()
+
+    def abort(self):
+        """Abort the upload, uploaded parts are discarded."""
+        if self._upload is not None:
+            self._upload.abort()
+
+        self._buffer.clear()
+
+    def _upload_part(self, data: bytes):
+        if self._upload is None:
+            self._upload = self.object.initiate_multipart_upload(**self.put_kwargs)
+
+        part_number = len(self._parts) + 1
+        response: dict = self._upload.Part(part_number).upload(Body=data)
+
+        self._parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+
+    def __enter__(self) -> "MultipartWriter":
+        """Return the writer itself."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> Optional[bool]:
+        """Complete the upload, abort it if the block has raised."""
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+        return None
+
+
+class UploadSessions(object):
+    """Build log upload sessions backed by S3 multipart uploads.
+
+    The state of a session is kept by Ceph only, so that any API instance can serve
+    parts of any session and sessions survive restarts. Parts can be uploaded in parallel
+    and re-uploaded if they fail, the build log is assembled, validated, indexed and
+    compressed once the session is completed. Sessions older than the TTL are aborted
+    by `collect_garbage`.
+    """
+
+    PREFIX = 'uploads/'
+    MAX_PARTS = 10000
+
+    def __init__(self, ceph: CephStore, ttl: int = DEFAULT_UPLOAD_SESSION_TTL):
+        """Initialize UploadSessions."""
+        self.ceph = ceph
+        self.ttl = ttl
+
+    def _key(self, document_id: str, session_id: str) -> Tuple[str, str]:
+        """Get key of the assembled build log and id of the multipart upload of the session."""
+        # each session has its own key, so that concurrent sessions of a build do not interfere
+        nonce, _, upload_id = session_id.partition('.')
+        if not nonce or not upload_id:
+            raise NotFoundError(f"Upload session {session_id!r} does not exist")
+
+        return f"{self.ceph.prefix}{self.PREFIX}{document_id}/{nonce}", upload_id
+
+    def initiate(self, document_id: str) -> str:
+        """Initiate upload session of build log of the given document.
+
+        :returns: id of the upload session.
+        """
+        nonce: str = uuid.uuid4().hex
+
+        # noinspection PyProtectedMember
+        upload = self.ceph._s3.Object(  # pylint: disable=protected-access
+            self.ceph.bucket, f"{self.ceph.prefix}{self.PREFIX}{document_id}/{nonce}"
+        ).initiate_multipart_upload(ContentType='text/plain; charset=utf-8')
+
+        return f"{nonce}.{upload.id}"
+
+    def upload_part(self, document_id: str, session_id: str, part_number: int, body: Union[bytes, BinaryIO]) -> str:
+        """Upload part of the build log, replacing the part of the same number uploaded before.
+
+        All the parts except for the last one have to be at least 5 MiB large.
+
+        :raises NotFoundError: In case there is no such session.
+        :raises ValueError: In case the part number is out of the range.
+        :returns: ETag of the part.
+        """
+        if not 1 <= part_number <= self.MAX_PARTS:
+            raise ValueError(f"Part number has to be in range from 1 to {self.MAX_PARTS}")
+
+        key, upload_id = self._key(document_id, session_id)
+
+        try:
+            # noinspection PyProtectedMember
+            response: dict = self.ceph._s3.MultipartUploadPart(  # pylint: disable=protected-access
+                self.ceph.bucket, key, upload_id, part_number
+            ).upload(Body=body)
+        except ClientError as exc:
+            _raise_not_found(exc, session_id)
+            raise
+
+        return response['ETag']
+
+    def list_parts(self, document_id: str, session_id: str) -> List[dict]:
+        """List parts uploaded so far, parts missing in the list are to be (re-)uploaded.
+
+        :raises NotFoundError: In case there is no such session.
+        """
+        key, upload_id = self._key(document_id, session_id)
+
+        # noinspection PyProtectedMember
+        paginator: Paginator = self.ceph._s3.meta.client.get_paginator(  # pylint: disable=protected-access
+            'list_parts')
+
+        parts: List[dict] = []
+
+        try:
+            for page in paginator.paginate(Bucket=self.ceph.bucket, Key=key, UploadId=upload_id):
+                parts.extend(
+                    {'part_number': part['PartNumber'], 'size': part['Size'], 'etag': part['ETag']}
+                    for part in page.get('Parts', [])
+                )
+        except ClientError as exc:
+            _raise_not_found(exc, session_id)
+            raise
+
+        return parts
+
+    def complete(self, document_id: str, session_id: str, store: Callable[[Iterable[bytes]], dict]) -> dict:
+        """Complete the upload session, the assembled build log is streamed into `store`.
+
+        The assembled build log is removed afterwards, whether it has been stored or not.
+
+        :raises NotFoundError: In case there is no such session.
+        :raises ValueError: In case no parts have been uploaded or some of them are too small.
+        :returns: what `store` returns.
+        """
+        parts: List[dict] = self.list_parts(document_id, session_id)
+        if not parts:
+            raise ValueError("No parts of the build log have been uploaded")
+
+        key, upload_id = self._key(document_id, session_id)
+
+        # noinspection PyProtectedMember
+        s3 = self.ceph._s3  # pylint: disable=protected-access
+
+        try:
+            s3.MultipartUpload(self.ceph.bucket, key, upload_id).complete(MultipartUpload={'Parts': [
+                {'ETag': part['etag'], 'PartNumber': part['part_number']} for part in parts
+            ]})
+        except ClientError as exc:
+            _raise_not_found(exc, session_id)
+
+            if exc.response['Error']['Code'] in ('EntityTooSmall', 'InvalidPart', 'InvalidPartOrder'):
+                raise ValueError(f"Parts of the build log could not be assembled: {exc}") from exc
+            raise
+
+        obj = s3.Object(self.ceph.bucket, key)
+
+        try:
+            body = obj.get()['Body']
+
+            return store(iter(partial(body.read, DEFAULT_LOG_CHUNK_SIZE), b''))
+        finally:
+            obj.delete()
+
+    def abort(self, document_id: str, session_id: str):
+        """Abort the upload session, the uploaded parts are discarded.
+
+        :raises NotFoundError: In case there is no such session.
+        """
+        key, upload_id = self._key(document_id, session_id)
+
+        try:
+            # noinspection PyProtectedMember
+            self.ceph._s3.MultipartUpload(  # pylint: disable=protected-access
+                self.ceph.bucket, key, upload_id
+            ).abort()
+        except ClientError as exc:
+            _raise_not_found(exc, session_id)
+            raise
+
+    def collect_garbage(self) -> int:
+        """Abort sessions and remove assembled build logs older than the TTL.
+
+        :returns: number of the sessions and build logs removed.
+        """
+        deadline: datetime = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+        prefix = f"{self.ceph.prefix}{self.PREFIX}"
+
+        # noinspection PyProtectedMember
+        bucket = self.ceph._s3.Bucket(self.ceph.bucket)  # pylint: disable=protected-access
+
+        removed: int = self.abort_stale_uploads(self.PREFIX)
+
+        # left behind by sessions whose completion has been interrupted
+        for obj in bucket.objects.filter(Prefix=prefix):
+            if obj.last_modified < deadline:
+                obj.delete()
+                removed += 1
+
+        return removed
+
+    def abort_stale_uploads(self, prefix: str) -> int:
+        """Abort multipart uploads under the given key prefix initiated before the TTL.
+
+        Besides upload sessions, multipart uploads are left behind by `MultipartWriter`
+        interrupted before it could complete or abort the upload (e.g. by a restart).
+
+        :returns: number of the uploads aborted.
+        """
+        deadline: datetime = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+
+        # noinspection PyProtectedMember
+        bucket = self.ceph._s3.Bucket(self.ceph.bucket)  # pylint: disable=protected-access
+
+        aborted = 0
+
+        for upload in bucket.multipart_uploads.filter(Prefix=f"{self.ceph.prefix}{prefix}"):
+            if upload.initiated < deadline:
+                upload.abort()
+                aborted += 1
+
+        return aborted
+
+
+def _raise_not_found(exc: ClientError, session_id: str):
+    """Raise NotFoundError if the client error is caused by a missing upload session."""
+    if exc.response['Error']['Code'] in ('404', 'NoSuchUpload', 'NoSuchKey'):
+        raise NotFoundError(f"Upload session {session_id!r} does not exist") from exc
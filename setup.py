@@ -41,5 +41,9 @@ setup(
     ],
     packages=find_packages(exclude=["tests"]),
 
-    install_requires=REQUIREMENTS
+    install_requires=REQUIREMENTS,
+    extras_require={
+        # zstd compression of stored build logs (OSIRIS_LOG_CODEC=zstd)
+        'zstd': ['zstandard'],
+    },
 )
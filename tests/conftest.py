@@ -0,0 +1,14 @@
+# Osiris: Build log aggregator.
+
+"""Configuration of the test suite."""
+
+import os
+
+# configuration is read at import time, the API never reaches Ceph or the cluster in the tests
+os.environ.setdefault('THOTH_DEPLOYMENT_NAME', 'test')
+os.environ.setdefault('THOTH_CEPH_BUCKET_PREFIX', 'test')
+os.environ.setdefault('THOTH_CEPH_BUCKET', 'test')
+os.environ.setdefault('THOTH_CEPH_KEY_ID', 'test')
+os.environ.setdefault('THOTH_CEPH_SECRET_KEY', 'test')
+os.environ.setdefault('THOTH_S3_ENDPOINT_URL', 'http://localhost:1')
+os.environ.setdefault('OSIRIS_RECONCILIATION_INTERVAL', '0')
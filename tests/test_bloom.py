@@ -0,0 +1,57 @@
+# Osiris: Build log aggregator.
+
+"""Tests of the Bloom filter of stored build information documents."""
+
+import hashlib
+
+from osiris.bloom import BloomFilter
+
+
+def document_id(i: int) -> str:
+    """Return document id of the i-th build."""
+    return hashlib.sha256(f"build-{i}".encode('utf-8')).hexdigest()
+
+
+def test_no_false_negatives():
+    """Test that every added id is reported as present."""
+    bloom = BloomFilter(capacity=1000)
+    bloom.populate(document_id(i) for i in range(500))
+
+    for i in range(500, 1000):
+        bloom.add(document_id(i))
+
+    assert all(document_id(i) in bloom for i in range(1000))
+
+
+def test_false_positive_rate():
+    """Test that the false positive rate stays around the configured one."""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    bloom.populate(document_id(i) for i in range(1000))
+
+    false_positives = sum(document_id(i) in bloom for i in range(1000, 11000))
+
+    assert false_positives < 300
+
+
+def test_unpopulated_filter_contains_everything():
+    """Test that negative answers are given only once the filter has been populated."""
+    bloom = BloomFilter(capacity=100)
+
+    assert document_id(0) in bloom
+
+    bloom.populate([])
+
+    assert document_id(0) not in bloom
+
+
+def test_ids_added_while_populating_kept():
+    """Test that ids added while the filter is being populated are not lost."""
+    bloom = BloomFilter(capacity=100)
+
+    def stored_ids():
+        yield document_id(0)
+        bloom.add(document_id(1))
+
+    bloom.populate(stored_ids())
+
+    assert document_id(0) in bloom and document_id(1) in bloom
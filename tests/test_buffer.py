@@ -0,0 +1,166 @@
+# Osiris: Build log aggregator.
+
+"""Tests of merging and writing behind of build information updates."""
+
+import pytest
+
+from osiris.buffer import WriteBehindBuffer
+from osiris.buffer import get_status_rank, merge_build_docs, merge_stored_build_doc
+
+
+@pytest.mark.parametrize('build_status,rank', [
+    (None, 0),
+    ('', 0),
+    ('New', 0),
+    ('Unknown', 0),
+    ('Pending', 1),
+    ('BuildStarted', 2),
+    ('Running', 2),
+    ('Complete', 3),
+    ('BuildCompleted', 3),
+    ('Failed', 3),
+    ('Error', 3),
+    ('Cancelled', 3),
+])
+def test_status_rank(build_status, rank):
+    """Test that statuses of later build phases are ranked higher."""
+    assert get_status_rank(build_status) == rank
+
+
+def test_merge_later_phase_wins():
+    """Test that an update of an earlier phase does not overwrite the status of a later one."""
+    current = {'build_id': 'a', 'build_status': 'Complete', 'last_timestamp': 't2'}
+    update = {'build_id': 'a', 'build_status': 'Running', 'last_timestamp': 't1', 'build_url': 'url'}
+
+    assert merge_build_docs(current, update) == {
+        'build_id': 'a', 'build_status': 'Complete', 'last_timestamp': 't2', 'build_url': 'url',
+    }
+
+
+def test_merge_same_phase_update_wins():
+    """Test that an update of the same phase takes precedence, missing fields are kept."""
+    current = {'build_id': 'a', 'build_status': 'Running', 'build_url': 'url', 'last_timestamp': 't1'}
+    update = {'build_id': 'a', 'build_status': 'Running', 'build_url': None, 'last_timestamp': 't2'}
+
+    assert merge_build_docs(current, update) == {
+        'build_id': 'a', 'build_status': 'Running', 'build_url': 'url', 'last_timestamp': 't2',
+    }
+
+
+def test_merge_stored_none():
+    """Test that the update is stored as it is if there is no stored document."""
+    assert merge_stored_build_doc(None, {'build_id': 'a', 'build_status': 'Running'}) == {
+        'build_id': 'a', 'build_status': 'Running',
+    }
+
+
+def test_merge_stored_none_without_status():
+    """Test that documents created by build logs attached before the build information have Unknown status."""
+    assert merge_stored_build_doc(None, {'build_id': 'a', 'build_log_object': {'key': 'k'}}) == {
+        'build_id': 'a', 'build_status': 'Unknown', 'build_log_object': {'key': 'k'},
+    }
+
+
+def test_merge_stored_build_log_reference():
+    """Test that the referenced build log replaces the stored one whatever the phase is."""
+    stored = {'build_id': 'a', 'build_status': 'Complete', 'build_log': {'data': 'log'}}
+    update = {'build_id': 'a', 'build_status': 'Running', 'build_log_object': {'key': 'k'}}
+
+    assert merge_stored_build_doc(stored, update) == {
+        'build_id': 'a', 'build_status': 'Complete', 'build_log_object': {'key': 'k'},
+    }
+
+
+def test_buffer_coalesces_updates():
+    """Test that updates submitted within the window are written at once."""
+    written = []
+    buffer = WriteBehindBuffer(written.append, window=60)
+
+    first = buffer.submit({'build_id': 'a', 'build_status': 'Pending', 'build_url': 'url'})
+    second = buffer.submit({'build_id': 'a', 'build_status': 'Running'})
+
+    assert not written and not first.done()
+
+    buffer.flush_due(force=True)
+
+    assert written == [{'build_id': 'a', 'build_status': 'Running', 'build_url': 'url'}]
+    assert first.result() is None and second.result() is None
+    assert buffer.stats.to_dict()['coalesced'] == 1
+
+
+def test_buffer_writes_terminal_status_immediately():
+    """Test that updates of finished builds are not held back."""
+    written = []
+    buffer = WriteBehindBuffer(written.append, window=60)
+
+    future = buffer.submit({'build_id': 'a', 'build_status': 'Complete'})
+
+    assert written == [{'build_id': 'a', 'build_status': 'Complete'}]
+    assert future.result() is None
+
+
+def test_buffer_log_attached_before_running():
+    """Test that a build log attached before the build information does not hold back later statuses."""
+    stored = {}
+
+    def write(build_doc: dict):
+        stored[build_doc['build_id']] = merge_stored_build_doc(stored.get(build_doc['build_id']), build_doc)
+
+    buffer = WriteBehindBuffer(write, window=60)
+
+    buffer.submit({'build_id': 'a', 'build_log_object': {'key': 'k'}})
+    buffer.flush_due(force=True)
+
+    assert stored['a']['build_status'] == 'Unknown'
+
+    buffer.submit({'build_id': 'a', 'build_status': 'Running', 'build_url': 'url'})
+    buffer.flush_due(force=True)
+
+    assert stored['a'] == {
+        'build_id': 'a', 'build_status': 'Running', 'build_url': 'url', 'build_log_object': {'key': 'k'},
+    }
+
+
+def test_buffer_keeps_failed_write_pending():
+    """Test that futures of a failed write fail, the update is written by the next flush."""
+    written = []
+
+    def write(build_doc: dict):
+        if not written:
+            written.append(None)
+            raise RuntimeError("Ceph is not available")
+
+        written.append(build_doc)
+
+    buffer = WriteBehindBuffer(write, window=60)
+
+    failed = buffer.submit({'build_id': 'a', 'build_status': 'Running', 'build_url': 'url'})
+    buffer.flush_due(force=True)
+
+    assert isinstance(failed.exception(), RuntimeError)
+
+    retried = buffer.submit({'build_id': 'a', 'build_status': 'Pending'})
+    buffer.flush_due(force=True)
+
+    assert retried.result() is None
+    assert written[-1] == {'build_id': 'a', 'build_status': 'Running', 'build_url': 'url'}
+
+
+def test_buffer_completes_batched_writes():
+    """Test that writes batched by the writer are completed by each flush, failures are retried by the next one."""
+    written = []
+    completed = []
+
+    def after_flush():
+        completed.append(list(written))
+
+        if len(completed) == 1:
+            raise RuntimeError("Ceph is not available")
+
+    buffer = WriteBehindBuffer(written.append, window=60, after_flush=after_flush)
+
+    buffer.submit({'build_id': 'a', 'build_status': 'Running'})
+    buffer.flush_due(force=True)
+    buffer.flush_due(force=True)
+
+    assert completed == [[{'build_id': 'a', 'build_status': 'Running'}]] * 2
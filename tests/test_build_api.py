@@ -0,0 +1,70 @@
+# Osiris: Build log aggregator.
+
+"""Tests of the build hooks and build information endpoints."""
+
+import pytest
+
+from osiris.aggregator import build_aggregator
+from osiris.ingestion import ingestion_pool
+from osiris.schema.build import BuildInfo
+
+
+@pytest.fixture
+def client():
+    """Return test client of the API, the OpenShift configuration check is skipped."""
+    from app import app
+
+    app.before_first_request_funcs = []
+    app.testing = True
+
+    return app.test_client()
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    """Capture ingestion jobs submitted by the hooks instead of ingesting them."""
+    jobs = []
+
+    def submit(kind: str, payload: dict):
+        jobs.append((kind, payload))
+
+        return len(jobs)
+
+    monkeypatch.setattr(ingestion_pool, 'submit', submit)
+
+    return jobs
+
+
+def test_build_completed_without_ocp_info(client, submitted):
+    """Test that a completion hook without OpenShift information is accepted."""
+    resp = client.put('/build/completed/build_schema/osiris-1-build', json={'build_status': 'Complete'})
+
+    assert resp.status_code == 202
+    assert resp.get_json()['data']['payload'] == {'job_id': 1, 'duplicate': False}
+
+    [(kind, payload)] = submitted
+
+    assert kind == 'build_completed'
+    assert payload['build_doc']['build_id'] == 'osiris-1-build'
+    assert payload['get_build_log'] is False
+    assert 'namespace' not in payload
+
+
+@pytest.mark.parametrize('if_none_match,status_code', [
+    (None, 200),
+    ('"v1"', 304),
+])
+def test_build_info_not_modified(client, monkeypatch, if_none_match, status_code):
+    """Test that build information is marshalled into the response, responses to matching versions have no body."""
+    monkeypatch.setattr(build_aggregator, 'retrieve_build_info', lambda build_id, if_none_match=None: (
+        BuildInfo(build_id=build_id, build_status='Complete'), 'v1'))
+
+    resp = client.get('/build/info/osiris-1-build', headers={'If-None-Match': if_none_match} if if_none_match else {})
+
+    assert resp.status_code == status_code
+    assert resp.headers['ETag'] == '"v1"'
+
+    if status_code == 304:
+        assert resp.get_data() == b''
+    else:
+        assert resp.get_json()['payload']['build_status'] == 'Complete'
@@ -0,0 +1,62 @@
+# Osiris: Build log aggregator.
+
+"""Tests of the compression codecs of stored build logs."""
+
+import pytest
+
+from osiris.compression import get_codec
+
+DATA = b''.join(f"Collecting package-{i}\n".encode('utf-8') for i in range(1000))
+
+
+def available_codecs():
+    """Return names of the codecs available in this environment."""
+    names = ['identity', 'gzip']
+
+    try:
+        get_codec('zstd')
+    except ValueError:
+        pass
+    else:
+        names.append('zstd')
+
+    return names
+
+
+@pytest.mark.parametrize('name', available_codecs())
+def test_round_trip(name):
+    """Test that compressed data are decompressed as they were."""
+    codec = get_codec(name)
+
+    assert codec.decompress(codec.compress(DATA)) == DATA
+
+
+@pytest.mark.parametrize('name', available_codecs())
+def test_concatenated_members(name):
+    """Test that independently compressed blocks are decompressed as a single stream."""
+    codec = get_codec(name)
+    blob = b''.join(codec.compress(DATA[i:i + 1000]) for i in range(0, len(DATA), 1000))
+
+    assert codec.decompress(blob) == DATA
+
+
+@pytest.mark.parametrize('name', available_codecs())
+def test_incremental_decompression(name):
+    """Test that the stream is decompressed whatever the chunks are."""
+    codec = get_codec(name)
+    blob = codec.compress(DATA[:5000]) + codec.compress(DATA[5000:])
+
+    decompressor = codec.decompressor()
+
+    assert b''.join(decompressor.decompress(blob[i:i + 7]) for i in range(0, len(blob), 7)) == DATA
+
+
+def test_default_codec():
+    """Test that the identity codec is used if no codec is given."""
+    assert get_codec().NAME == 'identity'
+
+
+def test_unknown_codec():
+    """Test that unknown codecs are rejected."""
+    with pytest.raises(ValueError):
+        get_codec('brotli')
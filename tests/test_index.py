@@ -0,0 +1,139 @@
+# Osiris: Build log aggregator.
+
+"""Tests of the build information index and its pagination cursors."""
+
+import base64
+import json
+
+from typing import Callable, Dict, Optional, Tuple
+
+import pytest
+
+from marshmallow import ValidationError
+
+from osiris.index import BuildInfoIndex, decode_cursor, encode_cursor
+
+
+class _Object(object):
+    """In-memory stand-in of the boto3 Object resource."""
+
+    def __init__(self, store: '_ObjectStore', key: str):
+        self.store = store
+        self.key = key
+
+    def delete(self):
+        self.store.documents.pop(self.key, None)
+
+
+class _ObjectStore(object):
+    """In-memory stand-in of ObjectStore counting the writes of each document."""
+
+    def __init__(self):
+        self.documents: Dict[str, dict] = {}
+        self.writes: Dict[str, int] = {}
+
+    def object(self, key: str) -> _Object:
+        return _Object(self, key)
+
+    def retrieve_document(self, key: str) -> Tuple[Optional[dict], Optional[str]]:
+        document: Optional[dict] = self.documents.get(key)
+
+        return (json.loads(json.dumps(document)), 'etag') if document is not None else (None, None)
+
+    def store_document(self, document: dict, key: str) -> str:
+        self.documents[key] = document
+        self.writes[key] = self.writes.get(key, 0) + 1
+
+        return 'etag'
+
+    def update_document(self, key: str, update: Callable[[Optional[dict]], Optional[dict]]) -> Optional[dict]:
+        document: Optional[dict] = update(self.retrieve_document(key)[0])
+
+        if document is not None:
+            self.store_document(document, key)
+
+        return document
+
+
+@pytest.fixture
+def index() -> BuildInfoIndex:
+    """Provide index reconciled with no documents."""
+    index = BuildInfoIndex(_ObjectStore(), segment_key_length=2)
+    index.reconcile(set(), lambda document_ids: {})
+
+    return index
+
+
+def test_manifest_updated_once_per_flush(index: BuildInfoIndex):
+    """Test that changes of the segment sizes are written to the manifest by a single update."""
+    writes: int = index.objects.writes[index.manifest_key]
+
+    for document_id in ('aa01', 'aa02', 'bb01'):
+        index.update(document_id, {'build_status': 'Running'})
+
+    index.remove('aa02')
+
+    assert index.objects.writes[index.manifest_key] == writes
+    assert index.count() == 0
+
+    index.flush_manifest()
+
+    assert index.objects.writes[index.manifest_key] == writes + 1
+    assert index.retrieve_manifest()['segments'] == {'aa': 1, 'bb': 1}
+
+
+def test_reconcile_failed_retrieval(index: BuildInfoIndex):
+    """Test that entries failed to be retrieved are left for the next reconciliation."""
+    index.objects.documents.clear()
+    index.update('aa01', {'build_status': 'Running'})
+
+    # stale entry failed to be retrieved is kept, the missing one is not created
+    manifest: dict = index.reconcile({'bb01'}, lambda document_ids: {})
+
+    assert not manifest['complete'] and not index.exists()
+    assert set(index.retrieve_segment('aa')) == {'aa01'} and not index.retrieve_segment('bb')
+
+    manifest = index.reconcile({'bb01'}, lambda document_ids: {
+        document_id: {'build_status': 'Complete'} if document_id == 'bb01' else None
+        for document_id in document_ids
+    })
+
+    assert manifest['complete'] and index.exists()
+    assert manifest['segments'] == {'bb': 1}
+
+
+@pytest.mark.parametrize('position', [
+    {'after': 'b3d1f0c2e4'},
+    {'before': '0000000000'},
+    {'after': ''},
+])
+def test_cursor_round_trip(position):
+    """Test that decoded cursors give the encoded position."""
+    assert decode_cursor(encode_cursor(**position)) == position
+
+
+def test_cursor_is_url_safe():
+    """Test that cursors can be passed in query strings as they are."""
+    cursor = encode_cursor(after='\xff' * 32)
+
+    assert all(c.isalnum() or c in '-_=' for c in cursor)
+
+
+def test_cursor_unknown_keys_ignored():
+    """Test that keys other than the position are dropped."""
+    cursor = base64.urlsafe_b64encode(json.dumps({'after': 'x', 'limit': 10}).encode('utf-8')).decode('ascii')
+
+    assert decode_cursor(cursor) == {'after': 'x'}
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor',
+    base64.urlsafe_b64encode(b'[1, 2]').decode('ascii'),
+    base64.urlsafe_b64encode(b'{"after": 1}').decode('ascii'),
+    base64.urlsafe_b64encode(b'{"after": "a", "before": "b"}').decode('ascii'),
+    base64.urlsafe_b64encode(b'\xff\xfe').decode('ascii'),
+])
+def test_cursor_malformed(cursor):
+    """Test that malformed cursors are rejected."""
+    with pytest.raises(ValidationError):
+        decode_cursor(cursor)
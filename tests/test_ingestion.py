@@ -0,0 +1,64 @@
+# Osiris: Build log aggregator.
+
+"""Tests of the ingestion of build hooks."""
+
+from concurrent.futures import Future
+
+import pytest
+
+from osiris.ingestion import IngestionWorkerPool
+from osiris.ingestion import start_ingestion
+
+
+def _stored(error: Exception = None) -> Future:
+    future = Future()
+
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+
+    return future
+
+
+def test_submit_before_start():
+    """Test that jobs cannot be submitted before the pool has been started."""
+    pool = IngestionWorkerPool(handlers={})
+
+    with pytest.raises(RuntimeError):
+        pool.submit('build_started', {'build_doc': {'build_id': 'a'}})
+
+
+def test_ingest_without_queue():
+    """Test that a pool started without a queue ingests the jobs within the submission."""
+    ingested = []
+
+    def handler(payload: dict) -> Future:
+        ingested.append(payload['build_doc']['build_id'])
+
+        return _stored()
+
+    pool = IngestionWorkerPool(handlers={'build_started': handler})
+    pool.start()
+
+    assert pool.is_started()
+    assert pool.submit_many([
+        ('build_started', {'build_doc': {'build_id': 'a'}}),
+        ('build_started', {'build_doc': {'build_id': 'b'}}),
+    ]) == [1, 2]
+    assert ingested == ['a', 'b']
+
+
+def test_ingest_without_queue_failed():
+    """Test that a job failed to store its build data fails the submission."""
+    pool = IngestionWorkerPool(handlers={'build_started': lambda payload: _stored(IOError('boom'))})
+    pool.start()
+
+    with pytest.raises(IOError):
+        pool.submit('build_started', {'build_doc': {'build_id': 'a'}})
+
+
+def test_start_ingestion_requires_data_dir():
+    """Test that the queue can not be enabled without a data directory."""
+    with pytest.raises(RuntimeError):
+        start_ingestion(data_dir=None, queue=True)
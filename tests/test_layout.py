@@ -0,0 +1,137 @@
+# Osiris: Build log aggregator.
+
+"""Tests of the date partitioned key layout of build information documents."""
+
+import io
+import json
+
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+from botocore.exceptions import ClientError
+
+from osiris.layout import KeyLayout
+from osiris.objects import PreconditionFailed
+
+
+class _Object(object):
+    """In-memory stand-in of the boto3 Object resource."""
+
+    def __init__(self, store: '_ObjectStore', key: str):
+        self.store = store
+        self.key = key
+        self.metadata: Optional[Dict[str, str]] = None
+
+    def _stored(self) -> Tuple[dict, str, Dict[str, str]]:
+        if self.key not in self.store.objects:
+            raise ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+
+        return self.store.objects[self.key]
+
+    def load(self):
+        _, _, self.metadata = self._stored()
+
+    def get(self) -> dict:
+        document, etag, metadata = self._stored()
+
+        return {'Body': io.BytesIO(json.dumps(document).encode('utf-8')), 'ETag': etag, 'Metadata': metadata}
+
+    def delete(self):
+        self.store.objects.pop(self.key, None)
+
+
+class _ObjectStore(object):
+    """In-memory stand-in of ObjectStore, honouring the write conditions."""
+
+    conditional_write_attempts = 3
+
+    def __init__(self):
+        self.objects: Dict[str, Tuple[dict, str, Dict[str, str]]] = {}
+        self.writes = 0
+
+    def object(self, key: str) -> _Object:
+        return _Object(self, key)
+
+    def store_document(self, document: dict, key: str, if_match: str = None, if_none_match: str = None,
+                       metadata: Dict[str, str] = None) -> str:
+        _, etag, _ = self.objects.get(key, (None, None, None))
+
+        if (if_match and if_match != etag) or (if_none_match == '*' and etag is not None):
+            raise PreconditionFailed(key)
+
+        self.writes += 1
+        self.objects[key] = (document, f'"{self.writes}"', metadata or {})
+
+        return self.objects[key][1]
+
+    def delete_object(self, key: str):
+        self.objects.pop(key, None)
+
+
+def _put(objects: _ObjectStore, update: dict, keys: List[str]):
+    """Return `put` callback merging the update into the stored document, keys are recorded."""
+    def put(key: str):
+        keys.append(key)
+
+        stored, _, _ = objects.objects.get(key, ({}, None, None))
+        objects.store_document(dict(stored, **update), key)
+
+    return put
+
+
+@pytest.fixture
+def objects():
+    """Return empty in-memory object store."""
+    return _ObjectStore()
+
+
+def test_partition_kept_by_later_updates(objects):
+    """Test that updates without (or with later) timestamps are stored in the partition of the first write."""
+    keys = []
+
+    update = {'build_id': 'a', 'build_status': 'Running', 'first_timestamp': '2026-10-17T23:59:00.000000'}
+    KeyLayout(objects, name='date').store('id', update, _put(objects, update, keys))
+
+    # another instance, nothing is cached
+    update = {'build_id': 'a', 'build_status': 'Complete'}
+    KeyLayout(objects, name='date').store('id', update, _put(objects, update, keys))
+
+    assert keys == ['2026/10/17/id', '2026/10/17/id']
+    assert sorted(objects.objects) == ['2026/10/17/id', 'id']
+    assert objects.objects['2026/10/17/id'][0]['build_status'] == 'Complete'
+
+
+def test_flat_document_moved_by_its_timestamp(objects):
+    """Test that documents stored in the flat layout are moved to the partition of their own timestamps."""
+    objects.store_document({'build_id': 'a', 'first_timestamp': '2026-09-01T10:00:00.000000'}, 'id')
+
+    keys = []
+    update = {'build_id': 'a', 'build_status': 'Complete'}
+    KeyLayout(objects, name='date').store('id', update, _put(objects, update, keys))
+
+    assert keys == ['2026/09/01/id']
+    assert objects.objects['id'][2] == {'partition': '2026/09/01'}
+
+
+def test_concurrent_partition_assignment(objects):
+    """Test that a writer losing the pointer to a concurrent one stores the update in the partition of the winner."""
+    keys = []
+    update = {'build_id': 'a', 'build_status': 'Complete'}
+    put = _put(objects, update, keys)
+
+    def racing_put(key: str):
+        if not keys:
+            # the concurrent writer has stored the document and its pointer in the meantime
+            objects.store_document({'build_id': 'a', 'build_status': 'Running'}, '2026/10/16/id')
+            objects.store_document({'build_id': 'a', 'key': '2026/10/16/id'}, 'id',
+                                   metadata={'partition': '2026/10/16'})
+
+        put(key)
+
+    KeyLayout(objects, name='date').store('id', dict(update, first_timestamp='2026-10-17T10:00:00.000000'),
+                                          racing_put)
+
+    assert keys == ['2026/10/17/id', '2026/10/16/id']
+    assert sorted(objects.objects) == ['2026/10/16/id', 'id']
+    assert objects.objects['2026/10/16/id'][0]['build_status'] == 'Complete'
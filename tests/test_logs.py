@@ -0,0 +1,100 @@
+# Osiris: Build log aggregator.
+
+"""Tests of the build log storage format."""
+
+import pytest
+
+from osiris.compression import get_codec
+from osiris.logs import BlockCompressor, LineIndexer, LogIndex
+from osiris.logs import decompress_chunks, slice_chunks, slice_lines, tail_lines
+
+LINES = [f"line {i} {'x' * (i % 7)}\n".encode('utf-8') for i in range(100)]
+LOG = b''.join(LINES)
+
+
+def chunked(data: bytes, size: int):
+    """Split data into chunks of the given size."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def index_lines(data: bytes, chunk_size: int, interval: int) -> LineIndexer:
+    """Index the data fed in chunks of the given size."""
+    indexer = LineIndexer(interval=interval)
+
+    for chunk in chunked(data, chunk_size):
+        indexer.feed(chunk)
+
+    return indexer
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, len(LOG)])
+def test_line_offsets(chunk_size):
+    """Test that offsets of every Nth line are indexed whatever the chunks are."""
+    indexer = index_lines(LOG, chunk_size, interval=10)
+
+    assert indexer.line_count == len(LINES)
+    assert list(indexer.offsets) == [sum(len(line) for line in LINES[:i]) for i in range(0, len(LINES) + 1, 10)]
+
+
+def test_line_count_unterminated():
+    """Test that the unterminated last line is counted."""
+    assert index_lines(b'a\nb', 1, interval=10).line_count == 2
+    assert index_lines(b'', 1, interval=10).line_count == 0
+
+
+@pytest.mark.parametrize('first,last', [(0, 1), (0, 100), (9, 11), (10, 20), (35, 36), (95, 120), (100, 110)])
+def test_locate_lines(first, last):
+    """Test that located byte ranges cover the lines, skipping the lines before them."""
+    indexer = index_lines(LOG, 13, interval=10)
+    index = LogIndex(size=len(LOG), stored_size=len(LOG), line_count=indexer.line_count,
+                     line_interval=indexer.interval, lines=indexer.offsets)
+
+    start, end, skip = index.locate_lines(first, last)
+
+    lines = b''.join(slice_lines([LOG[start:end]], skip=skip, count=last - first))
+
+    assert lines == b''.join(LINES[first:last])
+
+
+@pytest.mark.parametrize('codec', ['identity', 'gzip'])
+def test_locate_blocks(codec):
+    """Test that byte ranges are read by decompressing the covering blocks only."""
+    compressor = BlockCompressor(get_codec(codec), block_size=100)
+    stored = b''.join(compressor.compress(chunk) for chunk in chunked(LOG, 33)) + compressor.flush()
+
+    index = LogIndex.from_compressor(compressor)
+
+    for start, end in [(0, 10), (95, 205), (250, len(LOG))]:
+        stored_start, stored_end, skip = index.locate(start, end)
+
+        chunks = [stored[stored_start:stored_end]]
+        if index.encoding != 'identity':
+            chunks = decompress_chunks(chunks, get_codec(index.encoding))
+
+        assert b''.join(slice_chunks(chunks, skip=skip, length=end - start)) == LOG[start:end]
+
+
+@pytest.mark.parametrize('skip,length', [(0, None), (0, 0), (5, 10), (30, 100), (len(LOG), 10)])
+def test_slice_chunks(skip, length):
+    """Test that byte ranges are sliced out of chunked streams."""
+    end = None if length is None else skip + length
+
+    assert b''.join(slice_chunks(chunked(LOG, 33), skip=skip, length=length)) == LOG[skip:end]
+
+
+@pytest.mark.parametrize('count', [0, 1, 10, 100, 150])
+def test_tail_lines(count):
+    """Test that the last lines are taken from chunked streams."""
+    assert b''.join(tail_lines(chunked(LOG, 33), count)) == b''.join(LINES[max(len(LINES) - count, 0):])
+
+
+def test_index_round_trip():
+    """Test that the index survives its dictionary representation."""
+    indexer = index_lines(LOG, 64, interval=10)
+    compressor = BlockCompressor(get_codec('gzip'), block_size=100)
+    compressor.compress(LOG)
+    compressor.flush()
+
+    index = LogIndex.from_compressor(compressor, indexer)
+
+    assert LogIndex.from_dict(index.to_dict()).to_dict() == index.to_dict()
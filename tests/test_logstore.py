@@ -0,0 +1,77 @@
+# Osiris: Build log aggregator.
+
+"""Tests of the ownership of build logs stored by the followers and the completion hooks."""
+
+from typing import Dict, Optional, Tuple
+
+import pytest
+
+from osiris.logs import LogIndex
+from osiris.logstore import BuildLogStore
+from osiris.objects import PreconditionFailed
+
+
+class _ObjectStore(object):
+    """In-memory stand-in of ObjectStore holding JSON documents, honouring the write conditions."""
+
+    ceph = None
+
+    def __init__(self):
+        self.documents: Dict[str, Tuple[dict, str]] = {}
+
+    def retrieve_document(self, key: str) -> Tuple[Optional[dict], Optional[str]]:
+        return self.documents.get(key, (None, None))
+
+    def store_document(self, document: dict, key: str, if_match: str = None, if_none_match: str = None) -> str:
+        _, etag = self.documents.get(key, (None, None))
+
+        if (if_match and if_match != etag) or (if_none_match == '*' and etag is not None):
+            raise PreconditionFailed(key)
+
+        etag = f'"{len(self.documents)}-{id(document)}"'
+        self.documents[key] = document, etag
+
+        return etag
+
+
+@pytest.fixture
+def objects() -> _ObjectStore:
+    """Provide empty object store."""
+    return _ObjectStore()
+
+
+def _store_index(objects: _ObjectStore, live: bool) -> str:
+    log_index = LogIndex(size=3, stored_size=3, encoding='identity', live=live,
+                         key='logs/doc.live/v/' if live else 'logs/doc.v')
+
+    return objects.store_document(log_index.to_dict(), BuildLogStore.get_build_log_index_key('doc'))
+
+
+def test_wait_build_log_not_stored(objects: _ObjectStore):
+    """Test that build log not stored by any follower is to be gathered."""
+    assert BuildLogStore(objects).wait_build_log('doc', timeout=0) == (None, None)
+
+
+def test_wait_build_log_finalized(objects: _ObjectStore):
+    """Test that build log finalized by a follower is not gathered again."""
+    etag: str = _store_index(objects, live=False)
+
+    build_log_object, stored_etag = BuildLogStore(objects).wait_build_log('doc', timeout=0)
+
+    assert build_log_object['key'] == 'logs/doc.v' and not build_log_object.get('live')
+    assert stored_etag == etag
+
+
+def test_wait_build_log_stalled(objects: _ObjectStore):
+    """Test that build log of a stalled follower is taken over by a write conditioned on its index."""
+    etag: str = _store_index(objects, live=True)
+
+    assert BuildLogStore(objects).wait_build_log('doc', timeout=0.05, poll_interval=0.01) == (None, etag)
+
+
+def test_follow_finalized_build_log(objects: _ObjectStore):
+    """Test that build log finalized already is not followed again."""
+    _store_index(objects, live=False)
+
+    with pytest.raises(PreconditionFailed):
+        BuildLogStore(objects).store_live_build_log('doc', iter([b'line\n']))
@@ -0,0 +1,100 @@
+# Osiris: Build log aggregator.
+
+"""Tests of coalescing of concurrent calls."""
+
+import threading
+
+import pytest
+
+from osiris.singleflight import SingleFlight
+
+
+def call_concurrently(flight: SingleFlight, fun, callers: int = 8):
+    """Call `fun` by the given number of threads at once, return their results (or exceptions)."""
+    results = [None] * callers
+
+    def call(i: int):
+        try:
+            results[i] = flight.do('key', fun)
+        except Exception as exc:
+            results[i] = exc
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+
+    return threads, results
+
+
+def test_concurrent_calls_coalesced():
+    """Test that concurrent callers share a single call."""
+    flight = SingleFlight(timeout=10)
+    release = threading.Event()
+    calls = []
+
+    def fun():
+        calls.append(None)
+        release.wait(10)
+        return 'result'
+
+    threads, results = call_concurrently(flight, fun)
+    release.set()
+
+    for thread in threads:
+        thread.join()
+
+    assert results == ['result'] * len(threads)
+    assert len(calls) == flight.stats.to_dict()['calls']
+    assert flight.stats.to_dict()['calls'] + flight.stats.to_dict()['coalesced'] == len(threads)
+
+
+def test_exception_shared():
+    """Test that the exception of the call is raised to the waiting callers as well."""
+    flight = SingleFlight(timeout=10)
+    release = threading.Event()
+
+    def fun():
+        release.wait(10)
+        raise KeyError('missing')
+
+    threads, results = call_concurrently(flight, fun)
+    release.set()
+
+    for thread in threads:
+        thread.join()
+
+    assert all(isinstance(result, KeyError) for result in results)
+
+
+def test_sequential_calls_not_coalesced():
+    """Test that the result is not kept once the call has finished."""
+    flight = SingleFlight(timeout=10)
+    values = iter([1, 2])
+
+    assert flight.do('key', lambda: next(values)) == 1
+    assert flight.do('key', lambda: next(values)) == 2
+
+
+def test_timeout_calls_on_its_own():
+    """Test that a caller waiting too long makes the call on its own."""
+    flight = SingleFlight(timeout=0.01)
+    release = threading.Event()
+
+    leader = threading.Thread(target=flight.do, args=('key', lambda: release.wait(10)))
+    leader.start()
+
+    try:
+        assert flight.do('key', lambda: 'own') == 'own'
+        assert flight.stats.to_dict()['timeouts'] == 1
+    finally:
+        release.set()
+        leader.join()
+
+
+@pytest.mark.parametrize('keys', [['a', 'b']])
+def test_different_keys_not_coalesced(keys):
+    """Test that calls for different keys do not wait for each other."""
+    flight = SingleFlight(timeout=10)
+
+    assert [flight.do(key, lambda key=key: key) for key in keys] == keys
+    assert flight.stats.to_dict()['coalesced'] == 0
@@ -0,0 +1,58 @@
+# Osiris: Build log aggregator.
+
+"""Tests of the build log summary extraction."""
+
+import hashlib
+
+from osiris.summary import summarize
+
+LOG = """\
+---> Installing application source ...
+---> Installing dependencies ...
+Downloading https://files.example.com/numpy-1.16.2.whl (17.3MB)
+Downloading https://files.example.com/six-1.12.0.whl
+Successfully installed numpy-1.16.2 six-1.12.0
+ERROR: Could not find a version that satisfies the requirement tensorflow==9.9
+Pushing image registry.example.com/thoth/app:latest ...
+Push successful
+""".encode('utf-8')
+
+
+def test_summary():
+    """Test that the summary is extracted whatever the chunks are."""
+    for chunk_size in (1, 5, len(LOG)):
+        summary = summarize(LOG[i:i + chunk_size] for i in range(0, len(LOG), chunk_size))
+
+        assert summary['size'] == len(LOG)
+        assert summary['line_count'] == 8
+        assert summary['checksum'] == f"sha256:{hashlib.sha256(LOG).hexdigest()}"
+        assert [step['name'] for step in summary['steps']] == [
+            'Installing application source', 'Installing dependencies',
+        ]
+        assert summary['packages'] == {'numpy': '1.16.2', 'six': '1.12.0'}
+        assert summary['downloads'] == [
+            {'file': 'numpy-1.16.2.whl', 'size': 17300000, 'line': 3},
+            {'file': 'six-1.12.0.whl', 'size': None, 'line': 4},
+        ]
+        assert summary['download_size'] == 17300000
+        assert summary['image'] == 'registry.example.com/thoth/app:latest'
+        assert summary['pushed'] is True
+        assert summary['error'] == {
+            'message': 'ERROR: Could not find a version that satisfies the requirement tensorflow==9.9', 'line': 6,
+        }
+
+
+def test_summary_multibyte_split():
+    """Test that characters split between chunks are decoded."""
+    log = 'error: Ünïcödé\n'.encode('utf-8')
+
+    summary = summarize(log[i:i + 1] for i in range(len(log)))
+
+    assert summary['errors'] == [{'message': 'error: Ünïcödé', 'line': 1}]
+
+
+def test_summary_empty():
+    """Test the summary of an empty build log."""
+    summary = summarize([])
+
+    assert summary['line_count'] == 0 and summary['error'] is None and summary['steps'] == []